@@ -0,0 +1,214 @@
+#async read path - GET /api/stock, /api/dashboard and /api/sales on SQLAlchemy's async engine, served as an ASGI app
+#
+# Runs next to the WSGI app: point the proxy's GET routes for these three paths at
+#     uvicorn asgi:create_asgi_app --factory --workers 2
+# and everything else at the Flask app as before. A worker waiting on the database
+# here holds a coroutine, not a thread, so a couple of workers serve many dashboards.
+#
+# Responses are the Flask routes' responses: same SQL (utilities/reports.py), JSON
+# bytes, ETags/304s and JWT checks. Each request runs inside a Flask request context
+# of the wrapped app for config, jsonify and flask-jwt-extended; only the queries
+# are awaited, product names/prices come from the same catalog cache. Postgres needs
+# asyncpg, SQLite aiosqlite.
+import io
+import asyncio
+import contextvars
+from urllib.parse import quote
+from flask import g, request, jsonify
+from flask_jwt_extended import verify_jwt_in_request
+from werkzeug.http import is_resource_modified
+from utilities.database import init_async_engine
+from utilities.pagination import parse_limit, parse_date, decode_cursor, add_next_page_headers
+from utilities.reports import (
+    stock_query, stock_payload, dashboard_query, dashboard_payload, sales_page_query, sales_page_product_ids, sales_page_payload
+)
+from utilities.versions import versions_query, versions_from_rows, fingerprint_from_rows
+from utilities.catalog import LOAD_BATCH, catalog_query, all_products_query, products_version_query
+
+
+class ReportingApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.engine = init_async_engine(flask_app.config)
+        # path -> (view, needs a JWT)
+        self.routes = {
+            "/api/stock": (self.stock, False),
+            "/api/dashboard": (self.dashboard, True),
+            "/api/sales": (self.sales, True),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        with self.flask_app.request_context(_environ(scope)):
+            # after_request hooks (CORS headers) run as they do for the Flask routes
+            response = self.flask_app.process_response(await self._dispatch(scope))
+            body = b"" if scope["method"] == "HEAD" else response.get_data()
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()]
+            })
+            await send({"type": "http.response.body", "body": body})
+
+    async def _dispatch(self, scope):
+        route = self.routes.get(scope["path"])
+        if route is None:
+            return self.flask_app.make_response((jsonify({"error": "Not found"}), 404))
+        if scope["method"] not in ("GET", "HEAD"):
+            return self.flask_app.make_response((jsonify({"error": "Method not allowed"}), 405))
+        view, protected = route
+        try:
+            if protected:
+                # the same check as @jwt_required(), blocklist included. The blocklist's
+                # periodic sync is a blocking query, so it runs on a thread (in this
+                # request's context) instead of holding up the event loop
+                blocklist = self.flask_app.extensions["token_blocklist"]
+                if blocklist.maintenance_due():
+                    await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, blocklist.maintain)
+                verify_jwt_in_request()
+            return self.flask_app.make_response(await view())
+        except Exception as e:
+            # flask-jwt-extended's handlers answer 401/422 for bad tokens, like the Flask routes
+            return self.flask_app.make_response(self.flask_app.handle_user_exception(e))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # Async @conditional: sets g.etag and returns the 304 response while the client is current, else None.
+    # Reads the table versions only when the app's snapshot is stale; nothing writes here, so
+    # writes made by the Flask workers show up within TABLE_VERSIONS_SYNC_SECONDS, and
+    # counters a failed bump left behind wait for the Flask side (meanwhile no 304s).
+    async def _conditional(self, tag, tables):
+        snapshot = self.flask_app.extensions["table_versions"]
+        rows, generation = snapshot.lookup()
+        if rows is None:
+            async with self.engine.connect() as conn:
+                rows = snapshot.store((await conn.execute(versions_query())).all(), generation)
+        etag, last_modified = fingerprint_from_rows(tag, tables, rows, snapshot.unbumped)
+        g.etag = etag
+        g.last_modified = last_modified
+        g.table_versions = versions_from_rows(tables, rows)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return _tagged(self.flask_app.response_class(status=304))
+        return None
+
+    # utilities/catalog.py's products_by_id / all_products, awaiting the loads;
+    # the catalog itself is the Flask app's, shared with its routes
+    async def _catalog(self, conn):
+        catalog = self.flask_app.extensions["product_catalog"]
+        version = g.get("table_versions", {}).get("products")
+        if version is None and catalog.sync_due():
+            version = (await conn.execute(products_version_query())).scalar() or 0
+        if version is not None:
+            catalog.sync(version)
+        return catalog
+
+    async def _products_by_id(self, conn, ids):
+        catalog = await self._catalog(conn)
+        found, missing, generation = catalog.lookup(ids)
+        for start in range(0, len(missing), LOAD_BATCH):
+            rows = (await conn.execute(catalog_query(missing[start:start + LOAD_BATCH]))).all()
+            found.update(catalog.store(rows, generation))
+        return found
+
+    async def _all_products(self, conn):
+        catalog = await self._catalog(conn)
+        products, generation = catalog.all()
+        if products is None:
+            products = catalog.store_all((await conn.execute(all_products_query())).all(), generation)
+        return products
+
+    async def stock(self):
+        not_modified = await self._conditional("stock", ("products", "stock"))
+        if not_modified is not None:
+            return not_modified
+        async with self.engine.connect() as conn:
+            products = await self._all_products(conn)
+            rows = (await conn.execute(stock_query())).all()
+        return _tagged(jsonify(stock_payload(products, rows)))
+
+    async def dashboard(self):
+        cache = self.flask_app.extensions["dashboard_cache"]
+        not_modified = await self._conditional("dashboard", ("products", "stock", "sales"))
+        if not_modified is not None:
+            return not_modified
+        # keyed by the ETag like the Flask route, shared with it when both run in one process;
+        # a hit needs no connection
+        payload = cache.get(g.etag)
+        if payload is None:
+            async with self.engine.connect() as conn:
+                payload = dashboard_payload((await conn.execute(dashboard_query())).all())
+            cache.set(g.etag, payload)
+        return _tagged(jsonify(payload))
+
+    async def sales(self):
+        # ?limit=100&cursor=<X-Next-Cursor of previous page>&from=2025-01-01&to=2025-01-31
+        try:
+            limit = parse_limit(request.args.get("limit"))
+            cursor = decode_cursor(request.args.get("cursor"))
+            date_from = parse_date(request.args.get("from"), "from")
+            date_to = parse_date(request.args.get("to"), "to", end=True)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        async with self.engine.connect() as conn:
+            rows = (await conn.execute(sales_page_query(limit, cursor, date_from, date_to))).all()
+            products = await self._products_by_id(conn, sales_page_product_ids(rows))
+        sales, next_cursor = sales_page_payload(rows, limit, products)
+        return add_next_page_headers(jsonify(sales), request, next_cursor), 200
+
+
+# ETag / Last-Modified / no-cache headers from g, as @conditional sets them
+def _tagged(response):
+    response.set_etag(g.etag)
+    response.last_modified = g.last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+# Minimal WSGI environ for an ASGI http scope (no body, the routes are GETs)
+def _environ(scope):
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": quote(scope["path"]),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = f"HTTP_{key}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+# ASGI app for `flask_app` (default: main.create_app() with its usual config)
+def create_asgi_app(flask_app=None):
+    if flask_app is None:
+        from main import create_app
+        flask_app = create_app()
+    return ReportingApp(flask_app)
+
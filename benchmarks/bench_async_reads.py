@@ -0,0 +1,127 @@
+"""Reporting reads: the Flask routes on threads vs the async app (asgi.py) on one event loop.
+
+    python benchmarks/bench_async_reads.py [--concurrency 1,8,32,128] [--requests 800] [--products 500] [--sales 20000]
+
+Fires --requests GETs at /api/stock, /api/dashboard and /api/sales with
+--concurrency clients in flight: through the Flask test client on that many
+threads (one sync worker thread per client), and through the ASGI app with that
+many coroutines on a single thread. The dashboard cache is off so every request
+reaches the database. Prints requests/s and p95 latency for both.
+
+Against a local SQLite file the queries barely wait on I/O, so the threads do
+well; point DATABASE_URL at a networked Postgres to see what the async path is
+for: one thread keeping many slow queries in flight.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from main import app
+from asgi import create_asgi_app
+from models import db, Product, Purchase, Sale, SalesDetails, Stock
+
+PATHS = ["/api/stock", "/api/dashboard", "/api/sales"]
+
+
+def seed(products, sales):
+    db.drop_all()
+    db.create_all()
+    now = datetime.now()
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "buying_price": 10, "selling_price": 15} for i in range(products)
+    ])
+    db.session.execute(insert(Purchase), [{"product_id": i + 1, "quantity": 1000} for i in range(products)])
+    db.session.execute(insert(Stock), [{"product_id": i + 1, "quantity": 1000} for i in range(products)])
+    db.session.execute(insert(Sale), [{"id": i + 1, "created_at": now - timedelta(minutes=i)} for i in range(sales)])
+    db.session.execute(insert(SalesDetails), [
+        {"sale_id": i + 1, "product_id": i % products + 1, "quantity": 1} for i in range(sales)
+    ])
+    db.session.commit()
+
+
+def p95(latencies):
+    latencies = sorted(latencies)
+    return latencies[int(len(latencies) * 0.95) - 1] * 1000
+
+
+def run_sync(requests, concurrency, headers):
+    client = app.test_client()
+
+    def get(i):
+        start = time.perf_counter()
+        response = client.get(PATHS[i % len(PATHS)], headers=headers)
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(get, range(requests)))
+    return requests / (time.perf_counter() - start), p95(latencies)
+
+
+def run_async(asgi_app, requests, concurrency, headers):
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+
+    async def get(i, slots):
+        async with slots:
+            start = time.perf_counter()
+            scope = {
+                "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+                "path": PATHS[i % len(PATHS)], "root_path": "", "query_string": b"",
+                "headers": raw_headers, "server": ("localhost", 80)
+            }
+            status = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+            await asgi_app(scope, receive, send)
+            assert status == [200], status
+            return time.perf_counter() - start
+
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+        try:
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(get(i, slots) for i in range(requests)))
+            return requests / (time.perf_counter() - start), p95(latencies)
+        finally:
+            await asgi_app.engine.dispose()
+    return asyncio.run(main())
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", default="1,8,32,128")
+    parser.add_argument("--requests", type=int, default=800)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--sales", type=int, default=20000)
+    args = parser.parse_args()
+
+    app.extensions["dashboard_cache"].ttl = 0
+    with app.app_context():
+        seed(args.products, args.sales)
+        headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+
+    print(f"{'clients':>7} {'sync req/s':>11} {'sync p95 ms':>12} {'async req/s':>12} {'async p95 ms':>13}")
+    for concurrency in [int(n) for n in args.concurrency.split(",")]:
+        sync_rate, sync_p95 = run_sync(args.requests, concurrency, headers)
+        async_rate, async_p95 = run_async(create_asgi_app(app), args.requests, concurrency, headers)
+        print(f"{concurrency:>7} {sync_rate:>11.0f} {sync_p95:>12.1f} {async_rate:>12.0f} {async_p95:>13.1f}")
+
+
+if __name__ == "__main__":
+    run()
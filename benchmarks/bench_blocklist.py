@@ -0,0 +1,69 @@
+"""Cost of the JWT revocation check on protected routes.
+
+    python benchmarks/bench_blocklist.py [--requests 2000] [--revoked 0,1000,100000]
+
+Times a protected route that does no other work with the blocklist loader
+switched off and on (with N revoked tokens in memory), plus the raw cost of
+TokenBlocklist.is_revoked(). Runs against DATABASE_URL, defaulting to a
+throwaway SQLite file.
+"""
+import os
+import sys
+import time
+import uuid
+import timeit
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from main import app, jwt
+from flask import jsonify
+from flask_jwt_extended import jwt_required, create_access_token
+from models import db
+
+
+@app.route("/bench/protected")
+@jwt_required()
+def bench_protected():
+    return jsonify({}), 200
+
+
+def time_requests(client, headers, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get("/bench/protected", headers=headers)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--revoked", default="0,1000,100000")
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+    client = app.test_client()
+    blocklist = app.extensions["token_blocklist"]
+    loader = jwt._token_in_blocklist_callback
+    far_future = time.time() + 3600
+
+    jwt._token_in_blocklist_callback = lambda jwt_header, jwt_payload: False
+    baseline = time_requests(client, headers, args.requests)
+    jwt._token_in_blocklist_callback = loader
+    print(f"{'revoked':>8} {'us/request':>11} {'overhead us':>12} {'is_revoked ns':>14}")
+    print(f"{'off':>8} {baseline:>11.1f} {'-':>12} {'-':>14}")
+
+    for revoked in [int(n) for n in args.revoked.split(",")]:
+        blocklist._revoked = {uuid.uuid4().hex: far_future for _ in range(revoked)}
+        with app.app_context():
+            per_request = time_requests(client, headers, args.requests)
+            check_ns = min(timeit.repeat(lambda: blocklist.is_revoked("not-revoked"), number=100000, repeat=3)) / 100000 * 1e9
+        print(f"{revoked:>8} {per_request:>11.1f} {per_request - baseline:>12.1f} {check_ns:>14.0f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,80 @@
+"""Product catalog cache: GET /api/stock, /api/sales and /api/products with and without it.
+
+    python benchmarks/bench_catalog_cache.py [--products 500,5000] [--sales 20000] [--requests 300]
+
+For each --products it seeds that many products and --sales sales, then times
+--requests GETs per route twice: with the catalog cleared before every request
+(products loaded each time, as when the routes joined products) and with it warm.
+Conditional GET is bypassed (no If-None-Match) so every request builds its body.
+Prints ms per request, the speedup and the cache hit rate.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from main import app
+from models import db, Product, Sale, SalesDetails, Stock
+
+PATHS = ["/api/stock", "/api/sales?limit=100", "/api/products"]
+
+
+def seed(products, sales):
+    db.drop_all()
+    db.create_all()
+    now = datetime.now()
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "buying_price": 10, "selling_price": 15} for i in range(products)
+    ])
+    db.session.execute(insert(Stock), [{"product_id": i + 1, "quantity": 1000} for i in range(products)])
+    db.session.execute(insert(Sale), [{"id": i + 1, "created_at": now - timedelta(minutes=i)} for i in range(sales)])
+    db.session.execute(insert(SalesDetails), [
+        {"sale_id": i + 1, "product_id": (i * 7) % products + 1, "quantity": 1} for i in range(sales)
+    ])
+    db.session.commit()
+
+
+def timed(client, path, headers, requests, cold):
+    catalog = app.extensions["product_catalog"]
+    start = time.perf_counter()
+    for _ in range(requests):
+        if cold:
+            catalog.clear()
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.status_code
+    return (time.perf_counter() - start) / requests * 1000
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", default="500,5000")
+    parser.add_argument("--sales", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print(f"{'products':>8} {'route':<22} {'cold ms':>8} {'warm ms':>8} {'speedup':>8} {'hit rate':>9}")
+    for products in [int(n) for n in args.products.split(",")]:
+        with app.app_context():
+            seed(products, args.sales)
+            headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+        catalog = app.extensions["product_catalog"]
+        for path in PATHS:
+            cold = timed(client, path, headers, args.requests, cold=True)
+            client.get(path, headers=headers)
+            hits, misses = catalog.hits, catalog.misses
+            warm = timed(client, path, headers, args.requests, cold=False)
+            looked_up = catalog.hits - hits + catalog.misses - misses
+            hit_rate = (catalog.hits - hits) / looked_up if looked_up else 0
+            print(f"{products:>8} {path:<22} {cold:>8.2f} {warm:>8.2f} {cold / warm:>7.1f}x {hit_rate:>9.1%}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,92 @@
+"""Checkout throughput with parallel tills, and an oversell check.
+
+    python benchmarks/bench_checkout.py [--tills 1,4,8,16] [--baskets 200] [--products 50] [--stock 100000]
+
+Each till (a thread with its own test client) posts --baskets sales of 1-3
+products. In "disjoint" mode every till sells its own products, so no two
+baskets compete for a stock row; in "shared" mode all tills pick from the same
+5 products. Prints sales/second per mode and till count, then checks that the
+stock ledger matches purchases minus sales and nothing went below zero.
+SQLite serializes all writers, so run it against Postgres (DATABASE_URL) to see
+disjoint baskets scale with tills: in disjoint mode the sales share no row
+until their commits (the table_versions counters are bumped afterwards, in a
+transaction of their own).
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert, select, func
+from main import app
+from models import db, Product, Purchase, Stock
+from utilities.stock import verify_stock
+
+
+def seed(products, stock):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "buying_price": 1, "selling_price": 2} for i in range(products)
+    ])
+    db.session.execute(insert(Purchase), [{"product_id": i + 1, "quantity": stock} for i in range(products)])
+    db.session.execute(insert(Stock), [{"product_id": i + 1, "quantity": stock} for i in range(products)])
+    db.session.commit()
+
+
+def till(number, tills, baskets, products, mode, headers):
+    rng = random.Random(number)
+    if mode == "disjoint":
+        own = list(range(number + 1, products + 1, tills))
+    else:
+        own = list(range(1, 6))
+    client = app.test_client()
+    statuses = []
+    for _ in range(baskets):
+        picked = rng.sample(own, min(len(own), rng.randint(1, 3)))
+        items = [{"product_id": p, "quantity": 1} for p in picked]
+        statuses.append(client.post("/api/sales", json={"items": items}, headers=headers).status_code)
+    return statuses
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tills", default="1,4,8,16")
+    parser.add_argument("--baskets", type=int, default=200)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--stock", type=float, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'tills':>5} {'sales':>6} {'rejected':>8} {'errors':>6} {'ms':>7} {'sales/s':>8}")
+    for mode in ("disjoint", "shared"):
+        for tills in [int(n) for n in args.tills.split(",")]:
+            with app.app_context():
+                seed(args.products, args.stock)
+                headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(tills) as pool:
+                statuses = [s for till_statuses in pool.map(
+                    lambda n: till(n, tills, args.baskets, args.products, mode, headers), range(tills)
+                ) for s in till_statuses]
+            elapsed = time.perf_counter() - start
+
+            ok = statuses.count(201)
+            rejected = statuses.count(400)
+            print(f"{mode:<9} {tills:>5} {ok:>6} {rejected:>8} {len(statuses) - ok - rejected:>6} {elapsed * 1000:>7.0f} {ok / elapsed:>8.0f}")
+
+            with app.app_context():
+                lowest = db.session.execute(select(func.min(Stock.quantity))).scalar()
+                assert lowest >= 0, f"oversold: stock went down to {lowest}"
+                assert verify_stock() == [], "stock ledger out of step with purchases and sales"
+
+
+if __name__ == "__main__":
+    run()
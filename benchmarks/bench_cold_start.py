@@ -0,0 +1,89 @@
+"""Cold start: import time of main, create_app() time and time to the first request.
+
+    python benchmarks/bench_cold_start.py [--runs 10] [--blueprints all,payments]
+
+Each run is a fresh interpreter (nothing cached in sys.modules) that times
+`import main`, `create_app()` and a first GET /api/stock (or, for apps without
+the reporting blueprint, the M-Pesa callback) against a migrated SQLite
+file, and counts the modules loaded. Prints the median of --runs per
+--blueprints set ("all" = every blueprint, otherwise "+"-joined names such as
+"sales+purchases").
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the fresh interpreter; prints one JSON object
+CHILD = r"""
+import sys, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+blueprints = sys.argv[1]
+config = {
+    "SECRET_KEY": "bench",
+    "JWT_SECRET_KEY": "bench-jwt-secret-key-that-is-long-enough",
+    "SQLALCHEMY_DATABASE_URI": sys.argv[2],
+    "JWT_BLOCKLIST_SHARED": False,
+}
+if blueprints != "all":
+    config["BLUEPRINTS"] = tuple(blueprints.split("+"))
+app = main.create_app(config)
+created = time.perf_counter()
+
+path = "/api/stock" if "reporting" in app.config["BLUEPRINTS"] else "/api/mpesa/callback"
+response = app.test_client().get(path)
+first = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_ms": (created - imported) * 1000,
+    "first_request_ms": (first - created) * 1000,
+    "total_ms": (first - started) * 1000,
+    "status": response.status_code,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+# Schema for the children, built here (this process's imports don't reach them)
+def migrate(uri):
+    sys.path.insert(0, ROOT)
+    from main import create_app
+    from models import db
+    from utilities.migrations import upgrade
+    app = create_app({"SQLALCHEMY_DATABASE_URI": uri, "JWT_SECRET_KEY": "x" * 32, "JWT_BLOCKLIST_SHARED": False})
+    with app.app_context():
+        upgrade(db.engine)
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--blueprints", default="all,payments")
+    args = parser.parse_args()
+
+    uri = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    migrate(uri)
+
+    print(f"{'blueprints':<22} {'import ms':>9} {'create ms':>9} {'1st req ms':>10} {'total ms':>9} {'modules':>8}")
+    for blueprints in args.blueprints.split(","):
+        results = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, "-c", CHILD, blueprints, uri], cwd=ROOT, check=True, capture_output=True, text=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            assert result["status"] < 500, result
+            results.append(result)
+        median = {key: statistics.median(r[key] for r in results) for key in results[0]}
+        print(f"{blueprints:<22} {median['import_ms']:>9.1f} {median['create_ms']:>9.1f} {median['first_request_ms']:>10.1f} "
+              f"{median['total_ms']:>9.1f} {median['modules']:>8.0f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,76 @@
+"""Streaming exports: time to first byte, throughput and peak memory.
+
+    python benchmarks/bench_exports.py [--sales 100000,400000] [--format csv|ndjson] [--gzip]
+
+Seeds --sales one-line sales, then reads GET /api/sales/export chunk by chunk
+and reports the time to the first chunk, the total time, bytes sent and the peak
+Python memory (tracemalloc) while streaming. Peak memory should stay about the
+same whatever the row count. Runs against DATABASE_URL, defaulting to a
+throwaway SQLite file.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from main import app
+from models import db, Product, Sale, SalesDetails
+
+
+def seed(sales):
+    db.drop_all()
+    db.create_all()
+    start = datetime.now() - timedelta(minutes=sales)
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "buying_price": 10 + i, "selling_price": 15 + i} for i in range(100)
+    ])
+    db.session.execute(insert(Sale), [{"id": i + 1, "created_at": start + timedelta(minutes=i)} for i in range(sales)])
+    db.session.execute(insert(SalesDetails), [
+        {"sale_id": i + 1, "product_id": i % 100 + 1, "quantity": 1 + i % 3} for i in range(sales)
+    ])
+    db.session.commit()
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sales", default="100000,400000")
+    parser.add_argument("--format", default="csv", choices=["csv", "ndjson"])
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'sales':>8} {'first byte ms':>14} {'total ms':>9} {'MB sent':>8} {'rows/s':>9} {'peak MB':>8}")
+    for sales in [int(n) for n in args.sales.split(",")]:
+        with app.app_context():
+            seed(sales)
+            headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+        if args.gzip:
+            headers["Accept-Encoding"] = "gzip"
+        client = app.test_client()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get(f"/api/sales/export?format={args.format}", headers=headers, buffered=False)
+        first_byte = None
+        sent = 0
+        for chunk in response.response:
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            sent += len(chunk)
+        response.close()
+        total = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{sales:>8} {first_byte * 1000:>14.1f} {total * 1000:>9.0f} {sent / 1e6:>8.1f} {sales / total:>9.0f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    run()
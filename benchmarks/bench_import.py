@@ -0,0 +1,68 @@
+"""Purchase ingestion: one POST /api/purchases per row vs POST /api/purchases/import.
+
+    python benchmarks/bench_import.py [--rows 1000,10000,100000] [--products 500] [--single-rows 1000]
+
+For each --rows it uploads a CSV of that many purchase lines to the import
+endpoint and prints rows/second, next to the rate of posting --single-rows rows
+one request (and one commit) at a time. Runs against DATABASE_URL, defaulting
+to a throwaway SQLite file; on Postgres the import goes through COPY.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from main import app
+from models import db, Product
+
+
+def seed(products):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "buying_price": 10, "selling_price": 15} for i in range(products)
+    ])
+    db.session.commit()
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="1000,10000,100000")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--single-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(19)
+    with app.app_context():
+        seed(args.products)
+        headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+    client = app.test_client()
+
+    start = time.perf_counter()
+    for _ in range(args.single_rows):
+        response = client.post("/api/purchases", json={"product_id": rng.randint(1, args.products), "quantity": 5}, headers=headers)
+        assert response.status_code == 201, response.get_json()
+    single_rate = args.single_rows / (time.perf_counter() - start)
+    print(f"POST /api/purchases, one row per request: {single_rate:,.0f} rows/s")
+
+    print(f"{'rows':>8} {'upload KB':>10} {'import ms':>10} {'rows/s':>10} {'vs single':>10}")
+    for rows in [int(n) for n in args.rows.split(",")]:
+        body = "product_id,quantity\n" + "".join(
+            f"{rng.randint(1, args.products)},{rng.randint(1, 50)}\n" for _ in range(rows)
+        )
+        start = time.perf_counter()
+        response = client.post("/api/purchases/import", data=body.encode(), headers={**headers, "Content-Type": "text/csv"})
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 201, response.get_json()
+        print(f"{rows:>8} {len(body) / 1024:>10.0f} {elapsed * 1000:>10.0f} {rows / elapsed:>10,.0f} {rows / elapsed / single_rate:>9.0f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,59 @@
+"""Login throughput (POST /api/login) at different password hashing costs.
+
+    python benchmarks/bench_login.py [--iterations 100000,300000,600000] [--concurrency 8] [--logins 64]
+
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file so it needs no server.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from main import app
+from models import db, User
+from utilities.passwords import PasswordHasher
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", default="100000,300000,600000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=app.config["PASSWORD_HASH_WORKERS"])
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+    print(f"{'iterations':>10} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for iterations in [int(i) for i in args.iterations.split(",")]:
+        hasher = PasswordHasher(iterations=iterations, workers=args.workers, max_pending=args.logins)
+        app.extensions["password_hasher"] = hasher
+        with app.app_context():
+            User.query.delete()
+            db.session.add(User(username="bench", email="bench@bench.local", password=hasher.hash("bench")))
+            db.session.commit()
+
+        def login(_):
+            start = time.perf_counter()
+            response = app.test_client().post("/api/login", json={"email": "bench@bench.local", "password": "bench"})
+            assert response.status_code == 200, response.get_json()
+            return (time.perf_counter() - start) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            timings = sorted(pool.map(login, range(args.logins)))
+        elapsed = time.perf_counter() - started
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{iterations:>10} {args.logins / elapsed:>9.1f} {statistics.median(timings):>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    run()
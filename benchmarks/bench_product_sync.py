@@ -0,0 +1,55 @@
+"""Catalog sync: POST /api/products/bulk with a large catalog, first as inserts then as repricing.
+
+    python benchmarks/bench_product_sync.py [--items 10000,50000]
+
+For each --items it syncs a fresh catalog of that many products (all inserts),
+syncs it again with every price changed (all updates), and prints the time of
+each request and items/second. Runs against DATABASE_URL, defaulting to a
+throwaway SQLite file.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from flask_jwt_extended import create_access_token
+from main import app
+from models import db
+
+
+def catalog(items, markup):
+    return [
+        {"sku": f"SKU-{i:06d}", "name": f"Product {i}", "buying_price": 10 + i % 90, "selling_price": 10 + i % 90 + markup}
+        for i in range(items)
+    ]
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", default="10000,50000")
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print(f"{'items':>7} {'pass':>8} {'inserted':>9} {'updated':>8} {'ms':>8} {'items/s':>9}")
+    for items in [int(n) for n in args.items.split(",")]:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+
+        for name, markup in (("insert", 5), ("reprice", 7)):
+            body = {"products": catalog(items, markup)}
+            start = time.perf_counter()
+            response = client.post("/api/products/bulk", json=body, headers=headers)
+            elapsed = time.perf_counter() - start
+            data = response.get_json()
+            assert response.status_code == 200, data
+            print(f"{items:>7} {name:>8} {data['inserted']:>9} {data['updated']:>8} {elapsed * 1000:>8.0f} {items / elapsed:>9,.0f}")
+
+
+if __name__ == "__main__":
+    run()
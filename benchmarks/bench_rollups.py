@@ -0,0 +1,110 @@
+"""Time-bucketed sales report: scanning sales_details vs reading the rollups.
+
+    python benchmarks/bench_rollups.py [--sales 200000] [--products 200] [--days 365] [--repeat 5]
+
+Seeds --sales sales spread over the last --days days, runs `analytics rebuild`
+(rebuild_rollups) and then times GET /api/analytics/sales for a few ranges and
+granularities against the same report computed from sales_details joined to
+products. Checks both give the same totals and prints the best of --repeat runs.
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert, select
+from main import app
+from models import db, Product, Sale, SalesDetails
+from utilities.migrations import upgrade as upgrade_schema
+from utilities.rollups import rebuild_rollups, bucket_start
+
+
+def seed(sales, products, days):
+    db.drop_all()
+    upgrade_schema(db.engine)
+    rng = random.Random(17)
+    now = datetime.now().replace(microsecond=0)
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "buying_price": 10 + i % 40, "selling_price": 15 + i % 40} for i in range(products)
+    ])
+    moments = [now - timedelta(seconds=rng.randrange(days * 86400)) for _ in range(sales)]
+    db.session.execute(insert(Sale), [{"id": i + 1, "created_at": m} for i, m in enumerate(moments)])
+    db.session.execute(insert(SalesDetails), [
+        {"sale_id": i + 1, "product_id": rng.randrange(products) + 1, "quantity": rng.randint(1, 5), "created_at": m}
+        for i, m in enumerate(moments)
+    ])
+    db.session.commit()
+    return now
+
+
+# the same report without rollups: every matching sales_details row, bucketed in Python
+def scan(date_from, date_to, granularity):
+    query = (
+        select(Sale.created_at, SalesDetails.quantity, Product.selling_price, Product.buying_price)
+        .join(Sale, Sale.id == SalesDetails.sale_id)
+        .join(Product, Product.id == SalesDetails.product_id)
+        .where(Sale.created_at >= date_from, Sale.created_at < date_to)
+    )
+    buckets = {}
+    for created_at, quantity, selling, buying in db.session.execute(query):
+        entry = buckets.setdefault(bucket_start(created_at, granularity), [0, 0, 0])
+        entry[0] += quantity
+        entry[1] += quantity * selling
+        entry[2] += quantity * (selling - buying)
+    return buckets
+
+
+def best(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sales", type=int, default=200000)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        now = seed(args.sales, args.products, args.days)
+        start = time.perf_counter()
+        written = rebuild_rollups()
+        print(f"rebuild: {written} rollup rows from {args.sales} sales in {(time.perf_counter() - start) * 1000:.0f} ms")
+        headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+    client = app.test_client()
+
+    today = bucket_start(now, "day") + timedelta(days=1)
+    cases = [
+        ("hour", 2), ("hour", 30),
+        ("day", 30), ("day", args.days),
+        ("week", args.days), ("month", args.days),
+    ]
+    print(f"{'granularity':<12} {'days':>5} {'buckets':>8} {'scan ms':>9} {'rollup ms':>10} {'speedup':>8}")
+    for granularity, days in cases:
+        date_from = today - timedelta(days=days)
+        path = f"/api/analytics/sales?granularity={granularity}&from={date_from:%Y-%m-%d}&to={today:%Y-%m-%d}"
+        with app.app_context():
+            scan_ms, expected = best(lambda: scan(date_from, today, granularity), args.repeat)
+        rollup_ms, response = best(lambda: client.get(path, headers=headers), args.repeat)
+        assert response.status_code == 200, response.get_json()
+        buckets = response.get_json()["buckets"]
+        assert sum(b["quantity"] for b in buckets) == sum(v[0] for v in expected.values()), granularity
+        print(f"{granularity:<12} {days:>5} {len(buckets):>8} {scan_ms:>9.1f} {rollup_ms:>10.1f} {scan_ms / rollup_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,71 @@
+"""Latency of POST /api/sales (items branch) as the basket grows.
+
+    python benchmarks/bench_sales_basket.py [--sizes 1,10,50,200] [--repeat 30]
+
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file so it needs no server.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from sqlalchemy import event, insert
+from main import app
+from models import db, Product, Purchase
+from utilities.stock import rebuild_stock
+
+
+def seed(products):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "buying_price": 10, "selling_price": 15} for i in range(products)
+    ])
+    db.session.execute(insert(Purchase), [
+        {"product_id": i + 1, "quantity": 1_000_000} for i in range(products)
+    ])
+    db.session.commit()
+    rebuild_stock()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1,5,10,25,50,100,200")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    with app.app_context():
+        seed(max(sizes))
+
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+        client = app.test_client()
+        client.post("/api/register", json={"username": "bench", "email": "bench@bench.local", "password": "bench"})
+        token = client.post("/api/login", json={"email": "bench@bench.local", "password": "bench"}).get_json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        print(f"{'items':>6} {'median ms':>10} {'p95 ms':>8} {'ms/item':>8} {'SQL/req':>8}")
+        for size in sizes:
+            basket = {"items": [{"product_id": i + 1, "quantity": 1} for i in range(size)]}
+            timings = []
+            statements.clear()
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = client.post("/api/sales", json=basket, headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 201, response.get_json()
+            timings.sort()
+            median = statistics.median(timings)
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{size:>6} {median:>10.2f} {p95:>8.2f} {median / size:>8.3f} {len(statements) / args.repeat:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
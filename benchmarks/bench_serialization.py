@@ -0,0 +1,108 @@
+"""List endpoint serialization: ORM objects + to_dict() + stdlib json vs column rows + orjson.
+
+    python benchmarks/bench_serialization.py [--rows 1000,10000,50000] [--repeat 5]
+
+For products, users and purchases it times the old path (Model.query.all(),
+to_dict() per row, Flask's default JSON provider) against what the routes do
+now (select() of the needed columns, bulk datetime formatting, FastJSONProvider),
+checks both produce the same bytes and prints the best time of --repeat runs.
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+from main import app
+from models import db, Product, Purchase, User
+from utilities.serialization import FastJSONProvider, orjson
+
+
+def seed(rows):
+    db.drop_all()
+    db.create_all()
+    now = datetime.now()
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "buying_price": 10 + i % 90, "selling_price": 15.5 + i % 90} for i in range(rows)
+    ])
+    db.session.execute(insert(User), [
+        {"username": f"user{i}", "email": f"user{i}@bench.local", "password": "x"} for i in range(rows)
+    ])
+    db.session.execute(insert(Purchase), [
+        {"product_id": i % rows + 1, "quantity": 5 + i % 7, "created_at": now - timedelta(minutes=i)} for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def legacy_products():
+    return [p.to_dict() for p in Product.query.all()]
+
+
+def legacy_users():
+    return [u.to_dict() for u in User.query.all()]
+
+
+def legacy_purchases(limit):
+    query = Purchase.query.options(joinedload(Purchase.product)).order_by(Purchase.created_at.desc(), Purchase.id.desc())
+    return [p.to_dict() for p in query.limit(limit).all()]
+
+
+def best(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="1000,10000,50000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    print(f"orjson: {'installed' if orjson else 'not installed (fast path = stdlib)'}")
+    print(f"{'endpoint':<10} {'rows':>7} {'to_dict ms':>11} {'encode ms':>10} {'rows ms':>8} {'encode ms':>10} {'route ms':>9} {'speedup':>8}")
+
+    for rows in [int(n) for n in args.rows.split(",")]:
+        with app.app_context():
+            seed(rows)
+            headers = {"Authorization": f"Bearer {create_access_token(identity='bench@bench.local')}"}
+        client = app.test_client()
+
+        cases = [
+            ("products", legacy_products, "/api/products"),
+            ("users", legacy_users, "/api/users"),
+            ("purchases", lambda: legacy_purchases(500), "/api/purchases?limit=500"),
+        ]
+        for name, legacy, path in cases:
+            with app.test_request_context():
+                old_build, objects = best(legacy, args.repeat)
+                old_encode, old_body = best(lambda: stdlib.response(objects).get_data(), args.repeat)
+
+            route_ms, response = best(lambda: client.get(path, headers=headers), args.repeat)
+            new_body = response.get_data()
+            assert new_body == old_body, f"{name}: payload changed"
+            # split the route time into building rows and encoding them
+            with app.test_request_context():
+                data = fast.loads(new_body)
+                new_encode, _ = best(lambda: fast.response(data).get_data(), args.repeat)
+
+            old_total = old_build + old_encode
+            print(f"{name:<10} {rows:>7} {old_build:>11.1f} {old_encode:>10.1f} {route_ms - new_encode:>8.1f} {new_encode:>10.1f} {route_ms:>9.1f} {old_total / route_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,390 @@
+"""Offline load test: seed a database, drive every route, report latency / throughput / SQL.
+
+    python benchmarks/loadtest.py --sales 100000 --products 2000 --concurrency 1,8 \\
+        --output results/run.json [--compare results/baseline.json]
+
+Seeds DATABASE_URL (or --database-url; a throwaway SQLite file by default) with the
+requested volumes, then sends --requests requests per route at each concurrency level
+through app.test_client() (default) or a local threaded WSGI server (--server).
+For every route it reports p50/p95/p99 latency, requests/s, SQL statements per
+request and error count, and writes everything to --output as JSON.
+Daraja is replaced by an in-process stub that accepts every push, so the STK
+routes measure the API and the job queue, not Safaricom.
+With --compare, routes whose p95 grew by more than --threshold over the baseline
+file are listed and the script exits with status 1.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_EMAIL = "loadtest@bench.local"
+BENCH_PASSWORD = "loadtest"
+CHUNK = 10000
+FRESH_TOKEN = "fresh"  # auth mode for routes that use up their token (logout)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to $DATABASE_URL, then a temporary SQLite file")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--sales", type=int, default=10000)
+    parser.add_argument("--items-per-sale", type=int, default=3)
+    parser.add_argument("--purchases", type=int, default=None, help="defaults to --products * 5")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365, help="spread seeded rows over this many days")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and concurrency level")
+    parser.add_argument("--concurrency", default="1,8")
+    parser.add_argument("--routes", help="comma separated route names to run (default: all)")
+    parser.add_argument("--server", action="store_true", help="go through a local threaded WSGI server instead of test_client()")
+    parser.add_argument("--output", default="loadtest-results.json")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 growth before a route counts as regressed")
+    return parser.parse_args()
+
+
+# ----------------------------
+# Seeding
+# ----------------------------
+def seed(args, db, models, rebuild_stock, rebuild_rollups, hasher):
+    from sqlalchemy import insert
+    Product, Purchase, Sale, SalesDetails, User = models
+    rng = random.Random(42)
+    now = datetime.now()
+    start = now - timedelta(days=args.days)
+    span = args.days * 86400
+    purchases = args.purchases if args.purchases is not None else args.products * 5
+
+    def when():
+        return start + timedelta(seconds=rng.randrange(span))
+
+    def chunked(total, make_row):
+        for offset in range(0, total, CHUNK):
+            yield [make_row(i) for i in range(offset, min(offset + CHUNK, total))]
+
+    started = time.perf_counter()
+    db.drop_all()
+    db.create_all()
+
+    for rows in chunked(args.products, lambda i: {"name": f"Product {i:06d}", "buying_price": rng.randint(10, 500), "selling_price": 0}):
+        for row in rows:
+            row["selling_price"] = round(row["buying_price"] * rng.uniform(1.1, 1.6), 2)
+        db.session.execute(insert(Product), rows)
+
+    # purchases first, plenty of stock so seeded sales never go negative
+    for rows in chunked(purchases, lambda i: {"product_id": i % args.products + 1, "quantity": rng.randint(500, 5000), "created_at": when()}):
+        db.session.execute(insert(Purchase), rows)
+
+    sale_times = sorted(when() for _ in range(args.sales))
+    for offset in range(0, args.sales, CHUNK):
+        batch = sale_times[offset:offset + CHUNK]
+        sale_ids = db.session.execute(
+            insert(Sale).returning(Sale.id, sort_by_parameter_order=True),
+            [{"created_at": t} for t in batch]
+        ).scalars().all()
+        db.session.execute(insert(SalesDetails), [
+            {"sale_id": sale_id, "product_id": rng.randint(1, args.products), "quantity": rng.randint(1, 3), "created_at": t}
+            for sale_id, t in zip(sale_ids, batch) for _ in range(args.items_per_sale)
+        ])
+        db.session.commit()
+
+    bench_hash = hasher.hash(BENCH_PASSWORD)
+    db.session.execute(insert(User), [
+        {"username": f"user{i}", "email": f"user{i}@bench.local", "password": bench_hash} for i in range(args.users)
+    ] + [{"username": "loadtest", "email": BENCH_EMAIL, "password": bench_hash}])
+    db.session.commit()
+    rebuild_stock()
+    rebuild_rollups()
+    return time.perf_counter() - started
+
+
+# Daraja stand-in for the STK queue: every push is accepted and reported paid
+class OfflineDaraja:
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def make_stk_push(self, payload):
+        return {"ResponseCode": "0", "CheckoutRequestID": f"ws_CO_loadtest_{next(self._ids)}"}
+
+    def query_transaction_status(self, checkout_request_id):
+        return {"ResultCode": "0", "ResultDesc": "The service request is processed successfully."}
+
+
+# Daraja's STK callback for a payment nobody is waiting on
+def stk_callback(n):
+    return {"Body": {"stkCallback": {
+        "CheckoutRequestID": f"ws_CO_callback_{n}",
+        "ResultCode": 0,
+        "ResultDesc": "The service request is processed successfully.",
+        "CallbackMetadata": {"Item": [
+            {"Name": "Amount", "Value": 100},
+            {"Name": "MpesaReceiptNumber", "Value": f"LT{n:08d}"},
+            {"Name": "PhoneNumber", "Value": 254700000000 + n % 1000},
+        ]},
+    }}}
+
+
+# ----------------------------
+# Routes under test: name -> (method, path, body factory or None, auth)
+# A body factory returns a JSON body, or bytes sent as is (CSV uploads).
+# auth is False, True (the shared token) or FRESH_TOKEN (a new token per request).
+# ----------------------------
+def build_routes(products):
+    rng = random.Random(7)
+    ids = itertools.count(1)  # unique emails, skus and receipts across runs
+    month_ago = (datetime.now() - timedelta(days=30)).date().isoformat()
+
+    def restock_csv():
+        return ("product_id,quantity\n" + "".join(f"{rng.randint(1, products)},10\n" for _ in range(100))).encode()
+
+    def new_user():
+        n = next(ids)
+        # time_ns keeps emails unique against users left by a --skip-seed rerun
+        return {"username": f"new{n}", "email": f"new{n}.{time.time_ns()}@bench.local", "password": BENCH_PASSWORD}
+
+    def catalog_sync():
+        return {"products": [
+            {"sku": f"LT-{i:04d}", "name": f"Synced {i}", "buying_price": 10, "selling_price": rng.randint(15, 20)}
+            for i in range(100)
+        ]}
+
+    return {
+        "home": ("GET", "/", None, False),
+        "stock": ("GET", "/api/stock", None, False),
+        "dashboard": ("GET", "/api/dashboard", None, True),
+        "dashboard_uncached": ("GET", "/api/dashboard", None, True),
+        "sales_list": ("GET", "/api/sales?limit=100", None, True),
+        "sales_list_last_month": ("GET", f"/api/sales?limit=100&from={month_ago}", None, True),
+        "products_list": ("GET", "/api/products", None, True),
+        "purchases_list": ("GET", "/api/purchases?limit=100", None, True),
+        "users_list": ("GET", "/api/users", None, False),
+        "analytics_sales": ("GET", "/api/analytics/sales", None, True),
+        "analytics_sales_hourly": ("GET", "/api/analytics/sales?granularity=hour", None, True),
+        "sales_export_last_month": ("GET", f"/api/sales/export?from={month_ago}", None, True),
+        "purchases_export_ndjson": ("GET", "/api/purchases/export?format=ndjson", None, True),
+        "metrics": ("GET", "/api/metrics", None, False),
+        "stk_stats": ("GET", "/api/mpesa/stkpush/stats", None, True),
+        "sale_single": ("POST", "/api/sales", lambda: {"product_id": rng.randint(1, products), "quantity": 1}, True),
+        "sale_basket_10": ("POST", "/api/sales", lambda: {"items": [{"product_id": rng.randint(1, products), "quantity": 1} for _ in range(10)]}, True),
+        "purchase_create": ("POST", "/api/purchases", lambda: {"product_id": rng.randint(1, products), "quantity": 10}, True),
+        "product_create": ("POST", "/api/products", lambda: {"name": f"New {rng.random()}", "buying_price": 10, "selling_price": 15}, True),
+        "products_bulk_100": ("POST", "/api/products/bulk", catalog_sync, True),
+        "purchases_import_100": ("POST", "/api/purchases/import?format=csv", restock_csv, True),
+        "stk_push": ("POST", "/api/mpesa/stkpush", lambda: {"amount": 100, "phone_number": "254700000000"}, True),
+        "mpesa_callback": ("POST", "/api/mpesa/callback", lambda: stk_callback(next(ids)), False),
+        "login": ("POST", "/api/login", lambda: {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}, False),
+        "register": ("POST", "/api/register", new_user, False),
+        "logout": ("POST", "/api/logout", None, FRESH_TOKEN),
+    }
+
+# Password hashing dominates these, so they get fewer requests
+SLOW_ROUTES = {"login": 20, "register": 20}
+
+
+# Test-client transport: requests run in the calling thread
+class TestClientTransport:
+    def __init__(self, app):
+        self.app = app
+
+    def send(self, method, path, body, headers):
+        if isinstance(body, bytes):
+            response = self.app.test_client().open(path, method=method, data=body, headers=headers)
+        else:
+            response = self.app.test_client().open(path, method=method, json=body, headers=headers)
+        data = response.get_data()
+        return response.status_code, len(data)
+
+    def close(self):
+        pass
+
+
+# Real HTTP through werkzeug's threaded dev server on a free local port
+class ServerTransport:
+    def __init__(self, app):
+        import requests
+        from werkzeug.serving import make_server
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.local = threading.local()
+        self.requests = requests
+
+    def send(self, method, path, body, headers):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = self.requests.Session()
+        if isinstance(body, bytes):
+            response = session.request(method, self.base + path, data=body, headers=headers)
+        else:
+            response = session.request(method, self.base + path, json=body, headers=headers)
+        return response.status_code, len(response.content)
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_route(transport, route, token, concurrency, count, statements, before=None, mint_token=None):
+    method, path, body_factory, auth = route
+
+    def one(_):
+        if before:
+            before()
+        body = body_factory() if body_factory else None
+        if auth == FRESH_TOKEN:
+            headers = {"Authorization": f"Bearer {mint_token()}"}
+        else:
+            headers = {"Authorization": f"Bearer {token}"} if auth else {}
+        start = time.perf_counter()
+        status, size = transport.send(method, path, body, headers)
+        return time.perf_counter() - start, status, size
+
+    statements[0] = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    errors = sum(1 for r in results if r[1] >= 400)
+    return {
+        "requests": count,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "throughput_rps": round(count / elapsed, 1),
+        "sql_per_request": round(statements[0] / count, 2),
+        "avg_response_bytes": round(sum(r[2] for r in results) / count),
+        "errors": errors,
+    }
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for key, current in results.items():
+        before = baseline.get(key)
+        if before and before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append((key, before["p95_ms"], current["p95_ms"]))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "loadtest.db"))
+
+    # imported after DATABASE_URL is settled
+    from sqlalchemy import event
+    import main as api
+    from models import db, Product, Purchase, Sale, SalesDetails, User
+    from flask_jwt_extended import create_access_token
+    from utilities.stock import rebuild_stock
+    from utilities.rollups import rebuild_rollups
+
+    app = api.app
+    concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+    routes = build_routes(args.products)
+    if args.routes:
+        routes = {name: routes[name] for name in args.routes.split(",")}
+
+    with app.app_context():
+        seed_seconds = None
+        if not args.skip_seed:
+            print(f"seeding {args.products} products, {args.sales} sales x {args.items_per_sale} items ...")
+            seed_seconds = seed(args, db, (Product, Purchase, Sale, SalesDetails, User), rebuild_stock, rebuild_rollups, app.extensions["password_hasher"])
+            print(f"seeded in {seed_seconds:.1f}s")
+
+        statements = [0]
+        lock = threading.Lock()
+        def count_statement(*_):
+            with lock:
+                statements[0] += 1
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", count_statement)
+        dialect = db.engine.dialect.name
+
+    login = app.test_client().post("/api/login", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    if login.status_code != 200:
+        sys.exit("could not log in as the load test user, seed the database first (drop --skip-seed)")
+    token = login.get_json()["token"]
+    app.extensions["stk_queue"].client = OfflineDaraja()
+
+    # one token per logout, minted before the request's clock starts
+    def mint_token():
+        with app.app_context():
+            return create_access_token(identity=BENCH_EMAIL)
+    transport = ServerTransport(app) if args.server else TestClientTransport(app)
+
+    results = {}
+    print(f"{'route':<24} {'conc':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'SQL/req':>8} {'err':>4}")
+    for name, route in routes.items():
+        before = app.extensions["dashboard_cache"].clear if name == "dashboard_uncached" else None
+        count = min(args.requests, SLOW_ROUTES.get(name, args.requests))
+        for concurrency in concurrency_levels:
+            run_route(transport, route, token, concurrency, min(count, 5), statements, before, mint_token)  # warm up
+            r = run_route(transport, route, token, concurrency, count, statements, before, mint_token)
+            results[f"{name}@{concurrency}"] = r
+            print(f"{name:<24} {concurrency:>4} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                  f"{r['throughput_rps']:>8.1f} {r['sql_per_request']:>8.1f} {r['errors']:>4}")
+    transport.close()
+    app.extensions["stk_queue"].shutdown()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "dialect": dialect,
+            "transport": "server" if args.server else "test_client",
+            "volumes": {"products": args.products, "sales": args.sales, "items_per_sale": args.items_per_sale,
+                        "purchases": args.purchases if args.purchases is not None else args.products * 5, "users": args.users},
+            "seed_seconds": seed_seconds,
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: p95 {before:.2f}ms -> {after:.2f}ms")
+        if regressions:
+            sys.exit(1)
+        print("no regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#0001 - the tables as models.py first created them with db.create_all()
+from sqlalchemy import MetaData, Table, Column, Integer, String, Float, DateTime, ForeignKey
+
+metadata = MetaData()
+
+Table(
+    "products", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(80), nullable=False),
+    Column("buying_price", Float, nullable=False),
+    Column("selling_price", Float, nullable=False)
+)
+
+Table(
+    "sales", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("created_at", DateTime)
+)
+
+Table(
+    "sales_details", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("sale_id", Integer, ForeignKey("sales.id"), nullable=False),
+    Column("product_id", Integer, nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("created_at", DateTime)
+)
+
+Table(
+    "payments", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("mode", String(80), nullable=False),
+    Column("sale_id", Integer, ForeignKey("sales.id"), nullable=False),
+    Column("mpesa_ref", String(120), nullable=True),
+    Column("trans_amount", Integer, nullable=False),
+    Column("trans_name", String(120), nullable=False),
+    Column("created_at", DateTime)
+)
+
+Table(
+    "purchases", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("product_id", Integer, ForeignKey("products.id"), nullable=False),
+    Column("quantity", Float, nullable=False),
+    Column("created_at", DateTime)
+)
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String(80), unique=True, nullable=False),
+    Column("password", String(120), nullable=False),
+    Column("email", String(120), unique=True, nullable=False)
+)
+
+
+def upgrade(conn):
+    # existing production databases already have these, only missing tables are created
+    metadata.create_all(conn, checkfirst=True)
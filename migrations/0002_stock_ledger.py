@@ -0,0 +1,30 @@
+#0002 - per-product stock ledger, backfilled from purchases minus sales
+from sqlalchemy import MetaData, Table, Column, Integer, Float, DateTime, ForeignKey, text
+from utilities.migrations import has_table
+
+metadata = MetaData()
+
+Table("products", metadata, Column("id", Integer, primary_key=True))
+
+stock = Table(
+    "stock", metadata,
+    Column("product_id", Integer, ForeignKey("products.id"), primary_key=True),
+    Column("quantity", Float, nullable=False),
+    Column("updated_at", DateTime)
+)
+
+
+def upgrade(conn):
+    if not has_table(conn, "stock"):
+        stock.create(conn)
+    # also when the table was already there (db.create_all(), an earlier partial run):
+    # every product without a ledger row gets one, rows that exist are left alone
+    conn.execute(text("""
+        INSERT INTO stock (product_id, quantity, updated_at)
+        SELECT p.id,
+               COALESCE((SELECT SUM(quantity) FROM purchases WHERE product_id = p.id), 0)
+             - COALESCE((SELECT SUM(quantity) FROM sales_details WHERE product_id = p.id), 0),
+               CURRENT_TIMESTAMP
+        FROM products p
+        WHERE NOT EXISTS (SELECT 1 FROM stock s WHERE s.product_id = p.id)
+    """))
@@ -0,0 +1,37 @@
+#0003 - payments store STK callbacks: nullable sale_id, result columns, unique M-Pesa references
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, ForeignKey, text
+from utilities.migrations import add_column, has_column, has_unique, rebuild_sqlite_table
+
+metadata = MetaData()
+
+Table("sales", metadata, Column("id", Integer, primary_key=True))
+
+payments = Table(
+    "payments", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("mode", String(80), nullable=False),
+    Column("sale_id", Integer, ForeignKey("sales.id"), nullable=True),
+    Column("mpesa_ref", String(120), nullable=True, unique=True),
+    Column("checkout_request_id", String(120), nullable=True, unique=True),
+    Column("result_code", Integer, nullable=True),
+    Column("result_desc", String(255), nullable=True),
+    Column("phone_number", String(20), nullable=True),
+    Column("trans_amount", Integer, nullable=False),
+    Column("trans_name", String(120), nullable=False),
+    Column("created_at", DateTime)
+)
+
+
+def upgrade(conn):
+    if conn.dialect.name == "sqlite":
+        # SQLite can't drop NOT NULL or add UNIQUE in place
+        if not has_column(conn, "payments", "checkout_request_id"):
+            rebuild_sqlite_table(conn, payments)
+        return
+
+    for name in ("checkout_request_id", "result_code", "result_desc", "phone_number"):
+        add_column(conn, "payments", payments.c[name])
+    conn.execute(text("ALTER TABLE payments ALTER COLUMN sale_id DROP NOT NULL"))
+    for name in ("mpesa_ref", "checkout_request_id"):
+        if not has_unique(conn, "payments", [name]):
+            conn.execute(text(f"ALTER TABLE payments ADD CONSTRAINT payments_{name}_key UNIQUE ({name})"))
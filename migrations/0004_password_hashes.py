@@ -0,0 +1,8 @@
+#0004 - users.password widened to hold werkzeug hashes
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    # SQLite doesn't enforce VARCHAR lengths
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE users ALTER COLUMN password TYPE VARCHAR(255)"))
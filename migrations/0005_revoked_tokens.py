@@ -0,0 +1,16 @@
+#0005 - shared JWT blocklist
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime
+
+metadata = MetaData()
+
+Table(
+    "revoked_tokens", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("jti", String(36), nullable=False, unique=True),
+    Column("expires_at", DateTime, nullable=False, index=True),
+    Column("created_at", DateTime)
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
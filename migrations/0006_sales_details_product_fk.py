@@ -0,0 +1,36 @@
+#0006 - sales_details.product_id references products.id
+from sqlalchemy import MetaData, Table, Column, Integer, DateTime, ForeignKey, inspect, text
+from utilities.migrations import rebuild_sqlite_table
+
+metadata = MetaData()
+
+Table("products", metadata, Column("id", Integer, primary_key=True))
+Table("sales", metadata, Column("id", Integer, primary_key=True))
+
+sales_details = Table(
+    "sales_details", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("sale_id", Integer, ForeignKey("sales.id"), nullable=False),
+    Column("product_id", Integer, ForeignKey("products.id", name="fk_sales_details_product_id"), nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("created_at", DateTime)
+)
+
+
+def upgrade(conn):
+    foreign_keys = inspect(conn).get_foreign_keys("sales_details")
+    if any(fk["referred_table"] == "products" for fk in foreign_keys):
+        return
+
+    if conn.dialect.name == "sqlite":
+        rebuild_sqlite_table(conn, sales_details)
+        return
+
+    # NOT VALID adds the constraint without scanning the table under a write lock;
+    # VALIDATE then checks existing rows while sales keep coming in.
+    # It fails if a sale line points at a deleted product - fix those rows and rerun.
+    conn.execute(text(
+        "ALTER TABLE sales_details ADD CONSTRAINT fk_sales_details_product_id "
+        "FOREIGN KEY (product_id) REFERENCES products (id) NOT VALID"
+    ))
+    conn.execute(text("ALTER TABLE sales_details VALIDATE CONSTRAINT fk_sales_details_product_id"))
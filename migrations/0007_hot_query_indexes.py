@@ -0,0 +1,25 @@
+#0007 - indexes for the hot queries
+#   sales list:      ORDER BY created_at DESC, id DESC + EXISTS on sales_details.sale_id
+#   purchases list:  ORDER BY created_at DESC, id DESC, optional product_id filter
+#   stock sums:      SUM(quantity) ... GROUP BY / WHERE product_id, answered from the
+#                    (product_id, quantity) indexes without touching the tables
+from utilities.migrations import create_index
+
+# one CREATE INDEX CONCURRENTLY per index on Postgres, so tills keep writing meanwhile
+TRANSACTIONAL = False
+
+INDEXES = (
+    ("ix_sales_created_at_id", "sales", ("created_at", "id")),
+    ("ix_sales_details_sale_id", "sales_details", ("sale_id",)),
+    ("ix_sales_details_product_id_quantity", "sales_details", ("product_id", "quantity")),
+    ("ix_purchases_product_id_quantity", "purchases", ("product_id", "quantity")),
+    ("ix_purchases_created_at_id", "purchases", ("created_at", "id")),
+)
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
+    # fresh statistics so the planner picks the new indexes straight away
+    for table in {table for _, table, _ in INDEXES}:
+        conn.exec_driver_sql(f"ANALYZE {table}")
@@ -0,0 +1,16 @@
+#0008 - per-table write counters for ETag / Last-Modified
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime
+
+metadata = MetaData()
+
+Table(
+    "table_versions", metadata,
+    Column("name", String(40), primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime, nullable=False)
+)
+
+
+def upgrade(conn):
+    # rows are created by the first write to each table
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,20 @@
+#0009 - hourly and daily sales rollups (fill them once with: flask --app main analytics rebuild)
+from sqlalchemy import MetaData, Table, Column, Integer, Float, DateTime, ForeignKey
+
+metadata = MetaData()
+
+Table("products", metadata, Column("id", Integer, primary_key=True))
+
+for name in ("sales_hourly", "sales_daily"):
+    Table(
+        name, metadata,
+        Column("bucket", DateTime, primary_key=True),
+        Column("product_id", Integer, ForeignKey("products.id"), primary_key=True),
+        Column("quantity", Float, nullable=False),
+        Column("revenue", Float, nullable=False),
+        Column("profit", Float, nullable=False)
+    )
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True, tables=[metadata.tables["sales_hourly"], metadata.tables["sales_daily"]])
@@ -0,0 +1,9 @@
+#0010 - products.sku, the unique key catalog syncs upsert on
+from sqlalchemy import Column, String
+from utilities.migrations import add_column, create_index
+
+
+def upgrade(conn):
+    # nullable: products created before SKUs existed get one from their first sync
+    add_column(conn, "products", Column("sku", String(64)))
+    create_index(conn, "ux_products_sku", "products", ["sku"], unique=True)
@@ -0,0 +1,34 @@
+#0011 - sales_details.quantity is a Float like purchases, stock and the rollups, so a
+#       fractional sale records what it took from the ledger (Postgres rounded it to an int)
+from sqlalchemy import MetaData, Table, Column, Integer, Float, DateTime, ForeignKey, Index, inspect, text
+from utilities.migrations import rebuild_sqlite_table
+
+metadata = MetaData()
+
+Table("products", metadata, Column("id", Integer, primary_key=True))
+Table("sales", metadata, Column("id", Integer, primary_key=True))
+
+# with the 0007 indexes, which the SQLite rebuild recreates
+sales_details = Table(
+    "sales_details", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("sale_id", Integer, ForeignKey("sales.id"), nullable=False),
+    Column("product_id", Integer, ForeignKey("products.id", name="fk_sales_details_product_id"), nullable=False),
+    Column("quantity", Float, nullable=False),
+    Column("created_at", DateTime),
+    Index("ix_sales_details_sale_id", "sale_id"),
+    Index("ix_sales_details_product_id_quantity", "product_id", "quantity")
+)
+
+
+def upgrade(conn):
+    quantity = next(c for c in inspect(conn).get_columns("sales_details") if c["name"] == "quantity")
+    if isinstance(quantity["type"], Float):
+        return
+
+    if conn.dialect.name == "sqlite":
+        rebuild_sqlite_table(conn, sales_details)
+        return
+
+    # rewrites the table (and its indexes) under a write lock: run it while tills are quiet
+    conn.execute(text("ALTER TABLE sales_details ALTER COLUMN quantity TYPE DOUBLE PRECISION"))
@@ -0,0 +1 @@
+#schema migrations, applied in order by utilities.migrations.upgrade (flask --app main db upgrade)
@@ -3,12 +3,19 @@ from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+# Every schema change here needs a matching file in migrations/ (flask --app main db upgrade)
+
 class Product(db.Model):
     __tablename__ = "products"
+    # catalog syncs (POST /api/products/bulk) upsert on sku
+    __table_args__ = (
+        db.Index("ux_products_sku", "sku", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False)
     buying_price = db.Column(db.Float, nullable=False)
     selling_price = db.Column(db.Float, nullable=False)
+    sku = db.Column(db.String(64))
 
     def to_dict(self):
         return {
@@ -20,6 +27,8 @@ class Product(db.Model):
 
 class Sale(db.Model):
     __tablename__ = 'sales'
+    # GET /api/sales pages newest first on (created_at, id)
+    __table_args__ = (db.Index("ix_sales_created_at_id", "created_at", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -36,11 +45,16 @@ class Sale(db.Model):
 
 class SalesDetails(db.Model):
     __tablename__ = 'sales_details'
+    # (product_id, quantity) answers the per-product SUM(quantity) from the index alone
+    __table_args__ = (
+        db.Index("ix_sales_details_sale_id", "sale_id"),
+        db.Index("ix_sales_details_product_id_quantity", "product_id", "quantity"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False)
-    product_id = db.Column(db.Integer, nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', name="fk_sales_details_product_id"), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
     def to_dict(self):
@@ -55,8 +69,14 @@ class Payment(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     mode = db.Column(db.String(80), nullable=False)
-    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False)
-    mpesa_ref = db.Column(db.String(120), nullable=True)
+    # M-Pesa callbacks can arrive for pushes that were not started from a sale
+    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=True)
+    # MpesaReceiptNumber / CheckoutRequestID are unique so Safaricom retries can't double-record
+    mpesa_ref = db.Column(db.String(120), nullable=True, unique=True)
+    checkout_request_id = db.Column(db.String(120), nullable=True, unique=True)
+    result_code = db.Column(db.Integer, nullable=True)
+    result_desc = db.Column(db.String(255), nullable=True)
+    phone_number = db.Column(db.String(20), nullable=True)
     trans_amount = db.Column(db.Integer, nullable=False)
     trans_name = db.Column(db.String(120), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -69,6 +89,10 @@ class Payment(db.Model):
             "mode": self.mode,
             "sale_id": self.sale_id,
             "mpesa_ref": self.mpesa_ref,
+            "checkout_request_id": self.checkout_request_id,
+            "result_code": self.result_code,
+            "result_desc": self.result_desc,
+            "phone_number": self.phone_number,
             "trans_amount": self.trans_amount,
             "trans_name": self.trans_name,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M") if self.created_at else None
@@ -77,6 +101,10 @@ class Payment(db.Model):
 
 class Purchase(db.Model):
     __tablename__ = "purchases"
+    __table_args__ = (
+        db.Index("ix_purchases_product_id_quantity", "product_id", "quantity"),
+        db.Index("ix_purchases_created_at_id", "created_at", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Float, nullable=False)
@@ -92,11 +120,59 @@ class Purchase(db.Model):
             "product": self.product.to_dict() if self.product else None
         }
 
+class Stock(db.Model):
+    __tablename__ = "stock"
+    # One row per product, kept in step with every Purchase/SalesDetails insert
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        return {
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M") if self.updated_at else None
+        }
+
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
+    # Shared JWT blocklist so every worker learns about a logout
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+class SalesHourly(db.Model):
+    __tablename__ = "sales_hourly"
+    # Sales per product per hour, kept up to date by every sale (utilities/rollups.py)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    profit = db.Column(db.Float, nullable=False, default=0)
+
+class SalesDaily(db.Model):
+    __tablename__ = "sales_daily"
+    # Same as SalesHourly, one row per product per day
+    bucket = db.Column(db.DateTime, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    profit = db.Column(db.Float, nullable=False, default=0)
+
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+    # Write counter per table, behind the ETag / Last-Modified of the polled GET routes
+    name = db.Column(db.String(40), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
 class User(db.Model):
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password = db.Column(db.String(120), nullable=False)
+    # werkzeug hash ("pbkdf2:sha256:<iterations>$salt$hash"), legacy rows may still be plaintext
+    password = db.Column(db.String(255), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
 
     def to_dict(self):
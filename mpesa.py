@@ -1,99 +1,175 @@
+import os
 import time
 import math
 import base64
+import threading
 import requests
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
 
-consumer_key = "owBOAw7NmTdmhWyksamr1Wx0tJH5cIA9qGTgGP2E5na6enpH"
-consumer_secret = "NN0kQ4pzjqqB1INieMQrd8QooM3gG7A4F4CYyY9gSoXPAIgXLcdAi6u7ArOqHcg0"
+consumer_key = os.getenv("MPESA_CONSUMER_KEY", "owBOAw7NmTdmhWyksamr1Wx0tJH5cIA9qGTgGP2E5na6enpH")
+consumer_secret = os.getenv("MPESA_CONSUMER_SECRET", "NN0kQ4pzjqqB1INieMQrd8QooM3gG7A4F4CYyY9gSoXPAIgXLcdAi6u7ArOqHcg0")
 short_code ="174379"
 business_short_code = "174379"
 saf_pass_key="bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919"
-saf_access_token_api="https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
-saf_stk_push_api="https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest"
-saf_stk_push_query_api="https://sandbox.safaricom.co.ke/mpesa/stkpushquery/v1/query"
-app_url="https://dionna-setal-overforwardly.ngrok-free.dev/api/mpesa/callback"
-
+daraja_base_url = os.getenv("DARAJA_BASE_URL", "https://sandbox.safaricom.co.ke")
+saf_access_token_path="/oauth/v1/generate?grant_type=client_credentials"
+saf_stk_push_path="/mpesa/stkpush/v1/processrequest"
+saf_stk_push_query_path="/mpesa/stkpushquery/v1/query"
+app_url=os.getenv("MPESA_CALLBACK_URL", "https://dionna-setal-overforwardly.ngrok-free.dev/api/mpesa/callback")
+
+# (connect, read) seconds for every Daraja call
+request_timeout = (3.05, 30)
+# refresh the token this many seconds before Daraja says it expires
+token_refresh_margin = 60
+
+
+# One keep-alive session per client so calls reuse pooled connections
+def create_session(pool_size=10):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Caches the OAuth access token until shortly before `expires_in`.
+# Only one thread refreshes at a time, the others wait and reuse its token.
+class TokenProvider:
+    def __init__(self, session, token_url, key, secret, timeout=request_timeout, refresh_margin=token_refresh_margin):
+        self.session = session
+        self.token_url = token_url
+        self.auth = HTTPBasicAuth(key, secret)
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def get_token(self):
+        token = self._token
+        if token is not None and time.monotonic() < self._expires_at:
+            return token
+        with self._lock:
+            # another thread may have refreshed while we waited for the lock
+            if self._token is not None and time.monotonic() < self._expires_at:
+                return self._token
+            try:
+                res = self.session.get(self.token_url, auth=self.auth, timeout=self.timeout)
+                res.raise_for_status()
+                body = res.json()
+            except Exception as e:
+                print(str(e), "error getting access token")
+                raise e
+            expires_in = int(body.get("expires_in", 3599))
+            self._token = body["access_token"]
+            self._expires_at = time.monotonic() + max(expires_in - self.refresh_margin, 0)
+            return self._token
+
+    # Drop the cached token, e.g. after Daraja rejects it with a 401
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+
+
+def generate_password(timestamp):
+    password_str = short_code + saf_pass_key + timestamp
+    password_bytes = password_str.encode()
 
-def get_mpesa_access_token():
-    try:
-        res = requests.get(saf_access_token_api,auth=HTTPBasicAuth(consumer_key, consumer_secret))
-        token = res.json()['access_token']
+    return base64.b64encode(password_bytes).decode("utf-8")
 
-        headers = {"Authorization": f"Bearer {token}","Content-Type": "application/json"}
-    except Exception as e:
-        print(str(e), "error getting access token")
-        raise e
 
-    return headers
+# Daraja API client: pooled session + cached token.
+# Point base_url at a local stub server to test without Safaricom.
+class DarajaClient:
+    def __init__(self, base_url=daraja_base_url, key=consumer_key, secret=consumer_secret, timeout=request_timeout, pool_size=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = create_session(pool_size)
+        self.tokens = TokenProvider(self.session, self.base_url + saf_access_token_path, key, secret, timeout=timeout)
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.tokens.get_token()}", "Content-Type": "application/json"}
+
+    # POST to Daraja, fetching a fresh token once if the cached one was rejected
+    def _post(self, path, data):
+        response = self.session.post(self.base_url + path, json=data, headers=self.headers(), timeout=self.timeout)
+        if response.status_code == 401:
+            self.tokens.invalidate()
+            response = self.session.post(self.base_url + path, json=data, headers=self.headers(), timeout=self.timeout)
+        return response.json()
+
+    def make_stk_push(self, payload):
+        amount = payload['amount']
+        phone_number = payload['phone_number']
+        # the password embeds the timestamp, so both are generated per request
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+
+        push_data = {
+            "BusinessShortCode": business_short_code,
+            "Password": generate_password(timestamp),
+            "Timestamp": timestamp,
+            "TransactionType": "CustomerPayBillOnline",
+            "Amount": math.ceil(float(amount)),
+            "PartyA": phone_number,
+            "PartyB": short_code,
+            "PhoneNumber": phone_number,
+            "CallBackURL": app_url,
+            "AccountReference": "Whatever you call your app",
+            "TransactionDesc": "description of the transaction",
+        }
+
+        return self._post(saf_stk_push_path, push_data)
+
+    def query_transaction_status(self, checkout_request_id):
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        query_data = {
+            "BusinessShortCode": business_short_code,
+            "Password": generate_password(timestamp),
+            "Timestamp": timestamp,
+            "CheckoutRequestID": checkout_request_id
+        }
+
+        return self._post(saf_stk_push_query_path, query_data)
+
+
+# Shared client used by the module-level helpers below, created on first use so
+# importing this module opens no sessions and makes no calls
+_client = None
+_client_lock = threading.Lock()
+
+
+def default_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = DarajaClient()
+        return _client
 
-headers = get_mpesa_access_token()
-print(headers)
 
-def generate_password():
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    password_str = short_code + saf_pass_key + timestamp
-    password_bytes = password_str.encode()
-    
-    return base64.b64encode(password_bytes).decode("utf-8")
+def get_mpesa_access_token():
+    return default_client().headers()
 
-password = generate_password()
-print(password)
 
 def make_stk_push(payload):
-    amount = payload['amount']
-    phone_number = payload['phone_number']
-
-    push_data = {
-        "BusinessShortCode": business_short_code,
-        "Password": password,
-        "Timestamp": datetime.now().strftime('%Y%m%d%H%M%S'),
-        "TransactionType": "CustomerPayBillOnline",
-        "Amount": math.ceil(float(amount)),
-        "PartyA": phone_number,
-        "PartyB": short_code,
-        "PhoneNumber": phone_number,
-        "CallBackURL": app_url,
-        "AccountReference": "Whatever you call your app",
-        "TransactionDesc": "description of the transaction",
-    }
-
-    response = requests.post(
-        saf_stk_push_api,
-        json=push_data,
-        headers=headers)
-
-    response_data = response.json()
-    
-    return response_data
-
-stk = make_stk_push({"amount": 10,"phone_number":"254701465128"}) 
-print(stk)
+    return default_client().make_stk_push(payload)
+
 
 def query_transaction_status(checkout_request_id):
-    query_data = {
-        "BusinessShortCode": business_short_code,
-        "Password": password,
-        "Timestamp": datetime.now().strftime('%Y%m%d%H%M%S'),
-        "CheckoutRequestID": checkout_request_id
-    }
-
-    response = requests.post(
-        saf_stk_push_query_api,
-        json=query_data,
-        headers=headers
-        )
-
-    response_data = response.json()
-
-    return response_data
-paps=stk.get("CheckoutRequestID")
-status_push = query_transaction_status(paps)
-print("what is this----------------------------------------------------------------------------",status_push)
+    return default_client().query_transaction_status(checkout_request_id)
+
+
+if __name__ == "__main__":
+    stk = make_stk_push({"amount": 10,"phone_number":"254701465128"})
+    print(stk)
+    paps=stk.get("CheckoutRequestID")
+    status_push = query_transaction_status(paps)
+    print("what is this----------------------------------------------------------------------------",status_push)
 
 #instructions
 #ngrok config + take consume key and consume secret
 #go to daraja c2b; copy short code and app url for register
-#Login Daraja - Go to api - Mpesa Express Simulate (copy pass key)
\ No newline at end of file
+#Login Daraja - Go to api - Mpesa Express Simulate (copy pass key)
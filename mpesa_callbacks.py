@@ -0,0 +1,148 @@
+#M-Pesa STK callbacks -> Payment rows, deduplicated and written in micro-batches
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from models import db, Payment
+from utilities.sql import dialect_insert
+
+
+# Turn a Daraja STK callback body into Payment column values (None if it isn't one,
+# or has a field of the wrong type such as a non-numeric ResultCode)
+def parse_stk_callback(data):
+    try:
+        callback = (data.get("Body") or {}).get("stkCallback") if isinstance(data, dict) else None
+        if not callback or not callback.get("CheckoutRequestID"):
+            return None
+
+        # CallbackMetadata is only present for successful payments
+        items = (callback.get("CallbackMetadata") or {}).get("Item") or []
+        meta = {item.get("Name"): item.get("Value") for item in items}
+        result_code = callback.get("ResultCode")
+
+        return {
+            "mode": "mpesa",
+            "sale_id": None,
+            "checkout_request_id": callback["CheckoutRequestID"],
+            "mpesa_ref": meta.get("MpesaReceiptNumber"),
+            "result_code": int(result_code) if result_code is not None else None,
+            "result_desc": (callback.get("ResultDesc") or "")[:255],
+            "phone_number": str(meta["PhoneNumber"]) if meta.get("PhoneNumber") else None,
+            "trans_amount": int(float(meta.get("Amount") or 0)),
+            "trans_name": "STK Push"
+        }
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return None
+
+
+# Bounded, most-recent-first set of keys. Evicting old keys is safe because the
+# unique constraints on payments still reject a late duplicate.
+class RecentKeys:
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+
+    def get(self, key):
+        return self._keys.get(key)
+
+    def add(self, key, value):
+        self._keys[key] = value
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+
+    def discard(self, key):
+        self._keys.pop(key, None)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+# Collects parsed callbacks and writes them with one INSERT ... ON CONFLICT DO NOTHING
+# and one commit per batch (up to `batch_size` rows or `max_wait` seconds).
+# submit() returns a Future that resolves once the row is committed, so the
+# callback route can acknowledge only after the write is durable.
+class CallbackBatcher:
+    def __init__(self, app, batch_size=100, max_wait=0.05, recent_keys=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.recent = RecentKeys(recent_keys)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.written = 0
+        self.duplicates = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="mpesa-callbacks", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        key = row["checkout_request_id"]
+        with self._lock:
+            self._ensure_started()
+            # a retry of a callback we already have (or are writing) shares its outcome
+            seen = self.recent.get(key)
+            if seen is not None:
+                self.duplicates += 1
+                return seen
+            future = Future()
+            self.recent.add(key, future)
+            self._pending.append((row, future))
+            # wake the writer for the first row of a batch and again when it is full
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._ready.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._ready.wait()
+                # give concurrent callbacks a moment to join this batch
+                if len(self._pending) < self.batch_size:
+                    self._ready.wait(self.max_wait)
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+            self._flush(batch)
+
+    def _flush(self, batch):
+        rows = [row for row, _ in batch]
+        try:
+            with self.app.app_context():
+                db.session.execute(dialect_insert(Payment).on_conflict_do_nothing(), rows)
+                db.session.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                # one bad row (say a sale_id with no sale) fails the whole INSERT:
+                # write them one at a time so only that callback is refused
+                for entry in batch:
+                    self._flush([entry])
+                return
+            with self._lock:
+                for row, future in batch:
+                    self.recent.discard(row["checkout_request_id"])  # let Safaricom's retry through
+                    future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.written += len(rows)
+        for _, future in batch:
+            future.set_result(True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "batches": self.batches,
+                "written": self.written,
+                "duplicates": self.duplicates,
+                "recent_keys": len(self.recent)
+            }
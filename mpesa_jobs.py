@@ -0,0 +1,263 @@
+#background STK push jobs - request handlers enqueue, a bounded worker pool talks to Daraja
+import os
+import time
+import uuid
+import heapq
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    pass
+
+
+# Job states: queued -> pushing -> pending -> success | failed | timeout | error
+FINAL_STATES = ("success", "failed", "timeout", "error")
+
+
+class StkJob:
+    def __init__(self, payload, sale_id=None):
+        self.job_id = uuid.uuid4().hex
+        self.payload = payload
+        self.sale_id = sale_id
+        self.status = "queued"
+        self.checkout_request_id = None
+        self.result_code = None
+        self.result_desc = None
+        self.polls = 0
+        self.created_at = time.time()
+        self.finished_at = None
+        self._started = time.monotonic()
+
+    @property
+    def is_final(self):
+        return self.status in FINAL_STATES
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "sale_id": self.sale_id,
+            "checkout_request_id": self.checkout_request_id,
+            "result_code": self.result_code,
+            "result_desc": self.result_desc,
+            "polls": self.polls
+        }
+
+
+# p50/p95/p99 in milliseconds from a list of seconds
+def _percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+# Runs STK pushes on a bounded thread pool and polls stkpushquery with exponential
+# backoff (first_poll, first_poll*backoff, ... capped at max_poll) until the result
+# is final, the callback arrives or `deadline` seconds pass.
+#
+# Jobs live in this process only and are lost on restart. GET /api/mpesa/stkpush/<job_id>
+# answers only on the worker that took the push, and a callback landing on another
+# worker can't stop its polling (the poll still finishes the job). Serve the payments
+# routes from a single process (e.g. an app with BLUEPRINTS=("payments",) under
+# `gunicorn -w 1 --threads 8`); the other blueprints can run on as many workers as needed.
+class StkPushQueue:
+    def __init__(self, client=None, workers=4, max_queue=100, first_poll=5.0, max_poll=60.0, backoff=2.0, deadline=180.0, retention=3600.0):
+        self.client = client
+        self.workers = workers
+        self.max_queue = max_queue
+        self.first_poll = first_poll
+        self.max_poll = max_poll
+        self.backoff = backoff
+        self.deadline = deadline
+        self.retention = retention
+
+        self._jobs = {}
+        self._by_checkout = {}
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._schedule = []  # heap of (due monotonic time, seq, job_id, delay)
+        self._seq = 0
+        self._wakeup = threading.Condition(self._lock)
+        self._executor = None
+        self._scheduler = None
+        self._stopping = False
+        self._pid = None
+        self._daraja_latency = deque(maxlen=1000)
+        self._completion_latency = deque(maxlen=1000)
+        self._completed = {state: 0 for state in FINAL_STATES}
+
+    # Threads are started on first use so forked workers (gunicorn) each get their own
+    def _ensure_started(self):
+        if self._executor is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopping = False
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stk-worker")
+        self._scheduler = threading.Thread(target=self._run_scheduler, name="stk-scheduler", daemon=True)
+        self._scheduler.start()
+
+    def _client(self):
+        if self.client is not None:
+            return self.client
+        # mpesa (and requests) load with the first push, not with the app
+        from mpesa import default_client
+        return default_client()
+
+    # --- public API ---
+
+    def submit(self, payload, sale_id=None):
+        job = StkJob(payload, sale_id)
+        with self._lock:
+            self._ensure_started()
+            if self._queued >= self.max_queue:
+                raise QueueFull("STK push queue is full, try again shortly")
+            self._prune()
+            self._jobs[job.job_id] = job
+            self._queued += 1
+        try:
+            self._executor.submit(self._push, job)
+        except RuntimeError:
+            # shut down meanwhile: the job never runs, so it doesn't count as queued
+            with self._lock:
+                self._queued -= 1
+                self._jobs.pop(job.job_id, None)
+            raise
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def get_by_checkout(self, checkout_request_id):
+        job_id = self._by_checkout.get(checkout_request_id)
+        return self._jobs.get(job_id) if job_id else None
+
+    # Called by the M-Pesa callback route; stops any further polling of the job
+    def complete_from_callback(self, checkout_request_id, result_code, result_desc=None):
+        with self._lock:
+            job = self.get_by_checkout(checkout_request_id)
+            if job is None or job.is_final:
+                return job
+            self._finish(job, "success" if str(result_code) == "0" else "failed", result_code, result_desc)
+            return job
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "pending_polls": len(self._schedule),
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "completed": dict(self._completed),
+                "daraja_latency_ms": _percentiles(list(self._daraja_latency)),
+                "completion_latency_ms": _percentiles(list(self._completion_latency))
+            }
+
+    # Stop the scheduler (pending polls are dropped), then let running Daraja calls finish
+    def shutdown(self):
+        if self._executor is None:
+            return
+        with self._lock:
+            self._stopping = True
+            self._schedule.clear()
+            self._wakeup.notify()
+        self._scheduler.join()
+        self._executor.shutdown(wait=True)
+
+    # --- internals (worker / scheduler threads) ---
+
+    def _finish(self, job, status, result_code=None, result_desc=None):
+        # caller holds self._lock
+        job.status = status
+        job.result_code = result_code
+        job.result_desc = result_desc
+        job.finished_at = time.time()
+        self._completed[status] += 1
+        self._completion_latency.append(time.monotonic() - job._started)
+
+    # Forget finished jobs older than `retention` seconds (caller holds self._lock)
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        stale = [j for j in self._jobs.values() if j.is_final and j.finished_at < cutoff]
+        for job in stale:
+            self._jobs.pop(job.job_id, None)
+            self._by_checkout.pop(job.checkout_request_id, None)
+
+    def _push(self, job):
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+            job.status = "pushing"
+        started = time.monotonic()
+        try:
+            response = self._client().make_stk_push(job.payload)
+        except Exception as e:
+            with self._lock:
+                self._in_flight -= 1
+                self._finish(job, "error", result_desc=str(e))
+            return
+        with self._lock:
+            self._in_flight -= 1
+            self._daraja_latency.append(time.monotonic() - started)
+            checkout_request_id = response.get("CheckoutRequestID")
+            if str(response.get("ResponseCode")) != "0" or not checkout_request_id:
+                self._finish(job, "failed", response.get("errorCode") or response.get("ResponseCode"),
+                             response.get("errorMessage") or response.get("ResponseDescription"))
+                return
+            job.checkout_request_id = checkout_request_id
+            job.status = "pending"
+            self._by_checkout[checkout_request_id] = job.job_id
+            self._schedule_poll(job, self.first_poll)
+
+    def _schedule_poll(self, job, delay):
+        # caller holds self._lock
+        self._seq += 1
+        heapq.heappush(self._schedule, (time.monotonic() + delay, self._seq, job.job_id, delay))
+        self._wakeup.notify()
+
+    def _run_scheduler(self):
+        while True:
+            with self._lock:
+                while not self._stopping and (not self._schedule or self._schedule[0][0] > time.monotonic()):
+                    timeout = self._schedule[0][0] - time.monotonic() if self._schedule else None
+                    self._wakeup.wait(timeout)
+                if self._stopping:
+                    return
+                _, _, job_id, delay = heapq.heappop(self._schedule)
+                job = self._jobs.get(job_id)
+                if job is None or job.is_final:
+                    continue
+                self._in_flight += 1
+            try:
+                self._executor.submit(self._poll, job, delay)
+            except RuntimeError:
+                # the pool was shut down under us
+                with self._lock:
+                    self._in_flight -= 1
+                return
+
+    def _poll(self, job, delay):
+        started = time.monotonic()
+        try:
+            response = self._client().query_transaction_status(job.checkout_request_id)
+        except Exception:
+            response = {}
+        with self._lock:
+            self._in_flight -= 1
+            self._daraja_latency.append(time.monotonic() - started)
+            job.polls += 1
+            if job.is_final:
+                return  # the callback won the race
+            if "ResultCode" in response:
+                code = response["ResultCode"]
+                self._finish(job, "success" if str(code) == "0" else "failed", code, response.get("ResultDesc"))
+            elif time.monotonic() - job._started >= self.deadline:
+                self._finish(job, "timeout", result_desc="No final status before the polling deadline")
+            else:
+                # still processing (or a transient error): back off and try again
+                self._schedule_poll(job, min(delay * self.backoff, self.max_poll))
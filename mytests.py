@@ -1,19 +1,130 @@
 
 # Import Python's built-in unit testing framework
 import unittest
+import uuid
+import json
+import time
+import asyncio
+import base64
+import random
+import csv
+import gzip
+import io
+import os
+import sys
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections import namedtuple
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event, inspect, text, select, func, Float
+from flask_jwt_extended import decode_token, create_access_token
 
 # Import Flask app instance from main.py
-from main import app
+from main import create_app
+from asgi import create_asgi_app
+from models import db, Payment, Product, Purchase, RevokedToken, Sale, SalesDetails, Stock, TableVersion, User
+import mpesa
+from mpesa_callbacks import CallbackBatcher, parse_stk_callback
+from mpesa_jobs import StkPushQueue, QueueFull
+from utilities.stock import verify_stock, rebuild_stock, _raw_stock
+from utilities.blocklist import TokenBlocklist
+from utilities.cache import TTLCache
+from utilities.passwords import PasswordHasher, HasherBusy
+from utilities.database import engine_options
+from utilities.migrations import upgrade as upgrade_schema, status as schema_status
+from utilities.rollups import rebuild_rollups
+from utilities.schemas import Schema, List, Int, Number, String
+from utilities.catalog import ProductCatalog, CatalogEntry
+
+# Most SQL statements GET /api/purchases may run for one page (purchases + products together)
+PURCHASES_QUERY_BUDGET = 1
+
+
+# ----------------------------
+# Helper: record every SQL statement `app` sends inside a `with` block
+# ----------------------------
+@contextmanager
+def count_queries(app):
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+# ----------------------------
+# Helper: config for an extra app on its own SQLite file(s)
+# ----------------------------
+def make_test_config(**overrides):
+    config = {
+        "SECRET_KEY": "test",
+        "JWT_SECRET_KEY": "test-jwt-secret-key-that-is-long-enough",
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"),
+        "JWT_BLOCKLIST_SHARED": False
+    }
+    config.update(overrides)
+    return config
+
+
+# ----------------------------
+# Base for tests that run against their own app: a migrated SQLite database,
+# a test client and a JWT header, built fresh for every test
+# ----------------------------
+class AppTestCase(unittest.TestCase):
+    # make_test_config() overrides for this class's app
+    CONFIG = {}
+
+    def setUp(self):
+        self.config = make_test_config(**self.CONFIG)
+        self.app = create_app(self.config)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            upgrade_schema(db.engine)
+            self.headers = {"Authorization": f"Bearer {create_access_token(identity='tests@test.local')}"}
+
+    # POST /api/products, then a purchase of `quantity` when one is given; returns the product
+    def add_product(self, name, quantity=None, buying_price=2, selling_price=5):
+        product = self.client.post("/api/products", json={"name": name, "buying_price": buying_price, "selling_price": selling_price}, headers=self.headers).get_json()
+        if quantity is not None:
+            self.client.post("/api/purchases", json={"product_id": product["id"], "quantity": quantity}, headers=self.headers)
+        return product
+
 
 # Create a test class inheriting from unittest.TestCase
 class FlaskAPITest(unittest.TestCase):
 
+    # ----------------------------
+    # Runs once: an app on a fresh database with the test user and product 1 in stock
+    # (logouts go through the shared revoked_tokens table, as in production; no other
+    # worker writes, so the table versions snapshot never needs re-reading)
+    # ----------------------------
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app(make_test_config(JWT_BLOCKLIST_SHARED=True, TABLE_VERSIONS_SYNC_SECONDS=60))
+        with cls.app.app_context():
+            upgrade_schema(db.engine)
+        client = cls.app.test_client()
+        client.post("/api/register", json={"username": "John Doe", "email": "kentatech@cloud.com", "password": "password123"})
+        token = client.post("/api/login", json={"email": "kentatech@cloud.com", "password": "password123"}).get_json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.post("/api/products", json={"name": "Seed Product", "buying_price": 1, "selling_price": 2}, headers=headers)
+        client.post("/api/purchases", json={"product_id": 1, "quantity": 1000}, headers=headers)
+
     # ----------------------------
     # Runs before every test
     # ----------------------------
     def setUp(self):
         # Create a test client to simulate HTTP requests
-        self.client = app.test_client()
+        self.client = self.app.test_client()
         # Enable testing mode for clearer error messages
         self.client.testing = True
 
@@ -65,6 +176,50 @@ class FlaskAPITest(unittest.TestCase):
         # Call helper to verify login works
         self.get_auth_header()
 
+    # ----------------------------
+    # Test: old plaintext passwords still work and are hashed on first login
+    # ----------------------------
+    def test_login_upgrades_plaintext_password(self):
+        email = f"legacy-{uuid.uuid4().hex[:8]}@cloud.com"
+        with self.app.app_context():
+            db.session.add(User(username=email, email=email, password="legacy123"))
+            db.session.commit()
+
+        response = self.client.post("/api/login", json={"email": email, "password": "wrong"})
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post("/api/login", json={"email": email, "password": "legacy123"})
+        self.assertEqual(response.status_code, 200)
+
+        with self.app.app_context():
+            stored = User.query.filter_by(email=email).first().password
+        self.assertTrue(stored.startswith("pbkdf2:sha256:"))
+        self.assertNotIn("legacy123", stored)
+
+        # and the hashed password keeps working
+        response = self.client.post("/api/login", json={"email": email, "password": "legacy123"})
+        self.assertEqual(response.status_code, 200)
+
+    # ----------------------------
+    # Test: a hash that outlives the timeout is a 503, and keeps its slot until it finishes
+    # ----------------------------
+    def test_slow_hash_is_busy_and_holds_its_slot(self):
+        hasher = PasswordHasher(iterations=1000, workers=1, max_pending=0, timeout=0.05)
+        with self.assertRaises(HasherBusy):
+            hasher._run(time.sleep, 0.3)
+        with self.assertRaisesRegex(HasherBusy, "Too many"):
+            hasher.hash("still hashing")  # the sleep still runs and owns the only slot
+        time.sleep(0.4)
+        self.assertTrue(hasher.verify(hasher.hash("free again"), "free again"))
+
+        original = self.app.extensions["password_hasher"]
+        self.app.extensions["password_hasher"] = PasswordHasher(timeout=0)
+        try:
+            response = self.client.post("/api/login", json={"email": "kentatech@cloud.com", "password": "password123"})
+        finally:
+            self.app.extensions["password_hasher"] = original
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("try again", response.get_json()["error"])
+
     # ----------------------------
     # Test: GET /api/products
     # ----------------------------
@@ -74,6 +229,32 @@ class FlaskAPITest(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.get_json(), list)
 
+    # ----------------------------
+    # Test: list endpoints send exactly the bytes the to_dict() + stdlib json path sent
+    # ----------------------------
+    def test_list_payloads_unchanged(self):
+        headers = self.get_auth_header()
+        self.client.post("/api/products", json={"name": "Caf\u00e9 \u2615", "buying_price": 1e16, "selling_price": 2.5}, headers=headers)
+
+        def legacy(objects):
+            return (json.dumps([o.to_dict() for o in objects], sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+        with self.app.app_context():
+            products = legacy(Product.query.all())
+            users = legacy(User.query.all())
+            purchases = legacy(Purchase.query.order_by(Purchase.created_at.desc(), Purchase.id.desc()).limit(20).all())
+
+        self.assertEqual(self.client.get("/api/products", headers=headers).get_data(), products)
+        self.assertEqual(self.client.get("/api/users").get_data(), users)
+        self.assertEqual(self.client.get("/api/purchases?limit=20", headers=headers).get_data(), purchases)
+
+    def test_fast_json_falls_back_to_stdlib(self):
+        # values orjson writes differently must come out exactly as json.dumps writes them
+        for value in [{"b": 1, "a": [1.5, None]}, {"name": "Caf\u00e9"}, [1e16, 1e-05], [float("nan")], [2 ** 70]]:
+            with self.app.app_context():
+                body = self.app.json.response(value).get_data()
+            self.assertEqual(body, (json.dumps(value, sort_keys=True, separators=(",", ":")) + "\n").encode())
+
     # ----------------------------
     # Test: POST /api/products
     # ----------------------------
@@ -97,6 +278,31 @@ class FlaskAPITest(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.get_json(), list)
 
+    # ----------------------------
+    # Test: GET /api/purchases stays within its query budget
+    # ----------------------------
+    def test_purchases_get_query_budget(self):
+        headers = self.get_auth_header()
+
+        # purchases spread over several products, so lazy loading would show up as extra queries
+        for i in range(5):
+            product = self.client.post("/api/products", json={"name": f"Budget Product {i}", "buying_price": 1, "selling_price": 2}, headers=headers).get_json()
+            self.client.post("/api/purchases", json={"product_id": product["id"], "quantity": 2}, headers=headers)
+
+        with count_queries(self.app) as statements:
+            response = self.client.get("/api/purchases?limit=50", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(p["product"] is not None for p in response.get_json()))
+        self.assertLessEqual(len(statements), PURCHASES_QUERY_BUDGET)
+
+        # filter by product and page through with the cursor
+        response = self.client.get(f"/api/purchases?product_id={product['id']}", headers=headers)
+        self.assertEqual([p["product_id"] for p in response.get_json()], [product["id"]])
+        response = self.client.get("/api/purchases?limit=2", headers=headers)
+        cursor = response.headers["X-Next-Cursor"]
+        next_page = self.client.get(f"/api/purchases?limit=2&cursor={cursor}", headers=headers).get_json()
+        self.assertTrue(set(p["id"] for p in next_page).isdisjoint(p["id"] for p in response.get_json()))
+
     # ----------------------------
     # Test: POST /api/purchases
     # ----------------------------
@@ -119,6 +325,39 @@ class FlaskAPITest(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.get_json(), list)
 
+    # ----------------------------
+    # Test: GET /api/sales pages with a cursor
+    # ----------------------------
+    def test_sales_get_paginated(self):
+        headers = self.get_auth_header()
+
+        # Make sure there are a few sales to page through
+        for _ in range(3):
+            self.client.post("/api/sales", json={"product_id": 1, "quantity": 1}, headers=headers)
+
+        # Walk pages of 2 using the X-Next-Cursor header until it disappears
+        seen = []
+        response = self.client.get("/api/sales?limit=2", headers=headers)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.get_json()
+            self.assertLessEqual(len(page), 2)
+            seen.extend(sale["sale_id"] for sale in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            response = self.client.get(f"/api/sales?limit=2&cursor={cursor}", headers=headers)
+
+        # Every sale appears exactly once, newest first, with its total matching its items
+        all_sales = self.client.get("/api/sales?limit=500", headers=headers).get_json()
+        self.assertEqual(seen, [sale["sale_id"] for sale in all_sales])
+        for sale in all_sales:
+            self.assertAlmostEqual(sale["total_sale"], sum(item["subtotal"] for item in sale["items"]))
+
+        # A bad cursor is a client error
+        response = self.client.get("/api/sales?cursor=not-a-cursor", headers=headers)
+        self.assertEqual(response.status_code, 400)
+
     # ----------------------------
     # Test: POST single sale
     # ----------------------------
@@ -173,6 +412,25 @@ class FlaskAPITest(unittest.TestCase):
         # commit() saves all sale details at once.
         # ----------------------------
 
+    # ----------------------------
+    # Test: repeated products in a basket are checked against their combined quantity
+    # ----------------------------
+    def test_sale_post_bulk_merges_duplicates(self):
+        headers = self.get_auth_header()
+        product = self.client.post("/api/products", json={"name": "Basket Product", "buying_price": 1, "selling_price": 2}, headers=headers).get_json()
+        self.client.post("/api/purchases", json={"product_id": product["id"], "quantity": 3}, headers=headers)
+
+        # 2 + 2 is more than the 3 in stock, even though each line fits on its own
+        data = {"items": [{"product_id": product["id"], "quantity": 2}, {"product_id": product["id"], "quantity": 2}]}
+        response = self.client.post("/api/sales", json=data, headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+        # 2 + 1 fits; each line reports the stock left before it was taken
+        data = {"items": [{"product_id": product["id"], "quantity": 2}, {"product_id": product["id"], "quantity": 1}]}
+        response = self.client.post("/api/sales", json=data, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item["available_stock"] for item in response.get_json()["items"]], [3, 1])
+
     # ----------------------------
     # Test: GET /api/stock
     # ----------------------------
@@ -182,6 +440,29 @@ class FlaskAPITest(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.get_json(), list)
 
+    # ----------------------------
+    # Test: stock ledger follows purchases and sales
+    # ----------------------------
+    def test_stock_ledger(self):
+        headers = self.get_auth_header()
+
+        # New product -> buy 10 -> sell 4 -> ledger should say 6 left
+        product = self.client.post("/api/products", json={"name": "Ledger Product", "buying_price": 5, "selling_price": 8}, headers=headers).get_json()
+        self.client.post("/api/purchases", json={"product_id": product["id"], "quantity": 10}, headers=headers)
+        response = self.client.post("/api/sales", json={"product_id": product["id"], "quantity": 4}, headers=headers)
+        self.assertEqual(response.status_code, 201)
+
+        stock = {row["product_id"]: row for row in self.client.get("/api/stock").get_json()}
+        self.assertEqual(stock[product["id"]]["available_quantity"], 6)
+
+        # Selling more than is left must be refused
+        response = self.client.post("/api/sales", json={"product_id": product["id"], "quantity": 7}, headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+        # The ledger must agree with SUM(purchases) - SUM(sales)
+        with self.app.app_context():
+            self.assertEqual(verify_stock(), [])
+
     # ----------------------------
     # Test: GET /api/dashboard
     # ----------------------------
@@ -196,6 +477,138 @@ class FlaskAPITest(unittest.TestCase):
         for key in expected_keys:
             self.assertIn(key, json_data)
 
+    # ----------------------------
+    # Test: dashboard is served from cache until something is written
+    # ----------------------------
+    def test_dashboard_cache(self):
+        headers = self.get_auth_header()
+        self.client.get("/api/dashboard", headers=headers)  # warm the cache
+
+        # A cached dashboard is served without touching the database
+        with count_queries(self.app) as statements:
+            response = self.client.get("/api/dashboard", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(statements, [])
+
+        # A purchase clears the cache, so the new stock shows up straight away
+        name = f"Dashboard Product {uuid.uuid4().hex[:8]}"
+        product = self.client.post("/api/products", json={"name": name, "buying_price": 2, "selling_price": 5}, headers=headers).get_json()
+        self.client.post("/api/purchases", json={"product_id": product["id"], "quantity": 7}, headers=headers)
+        self.client.post("/api/sales", json={"product_id": product["id"], "quantity": 3}, headers=headers)
+        json_data = self.client.get("/api/dashboard", headers=headers).get_json()
+        self.assertEqual(dict(zip(json_data["labels"], json_data["data"]))[name], 4)
+        self.assertEqual(dict(zip(json_data["sales_labels"], json_data["sales_data"]))[name], 3)
+        self.assertEqual(dict(zip(json_data["donut_label"], json_data["donut_data"]))[name], 9)
+
+    # ----------------------------
+    # Test: conditional GET - 304 while nothing changed, without running the route's queries
+    # ----------------------------
+    def test_conditional_get(self):
+        headers = self.get_auth_header()
+        for path in ["/api/products", "/api/stock", "/api/dashboard"]:
+            first = self.client.get(path, headers=headers)
+            self.assertEqual(first.status_code, 200)
+            etag = first.headers["ETag"]
+            self.assertFalse(etag.startswith("W/"))  # strong
+            self.assertIn("Last-Modified", first.headers)
+
+            with count_queries(self.app) as statements:
+                again = self.client.get(path, headers={**headers, "If-None-Match": etag})
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.get_data(), b"")
+            self.assertEqual(again.headers["ETag"], etag)
+            self.assertEqual(statements, [])  # versions come from the worker's snapshot
+
+        # a purchase changes stock and dashboard, not the product list
+        etags = {path: self.client.get(path, headers=headers).headers["ETag"] for path in ["/api/products", "/api/stock", "/api/dashboard"]}
+        self.client.post("/api/purchases", json={"product_id": 1, "quantity": 1}, headers=headers)
+        for path, etag in etags.items():
+            response = self.client.get(path, headers={**headers, "If-None-Match": etag})
+            self.assertEqual(response.status_code, 304 if path == "/api/products" else 200, path)
+
+    # ----------------------------
+    # Test: a sale bumps the table versions after it commits, never inside its transaction
+    # ----------------------------
+    def test_versions_bumped_after_commit(self):
+        headers = self.get_auth_header()
+        events = []
+        def record(conn, cursor, statement, *args):
+            events.append("table_versions" if "table_versions" in statement else "sql")
+        def record_commit(conn):
+            events.append("commit")
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        event.listen(engine, "commit", record_commit)
+        try:
+            response = self.client.post("/api/sales", json={"product_id": 1, "quantity": 1}, headers=headers)
+            self.assertEqual(response.status_code, 201)
+            self.assertNotIn("table_versions", events[:events.index("commit")])
+            # then "sales" and "stock" in a transaction of their own
+            after = events.index("commit") + 1
+            self.assertEqual(events[after:after + 3], ["table_versions", "table_versions", "commit"])
+
+            # a refused sale rolls back and bumps nothing
+            del events[:]
+            response = self.client.post("/api/sales", json={"product_id": 1, "quantity": 10 ** 9}, headers=headers)
+            self.assertEqual(response.status_code, 400)
+            self.assertNotIn("table_versions", events)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+            event.remove(engine, "commit", record_commit)
+
+    # ----------------------------
+    # Test: a failed bump never leaves a 304 for data that changed; the next read bumps
+    # ----------------------------
+    def test_failed_bump_is_retried_and_skips_304(self):
+        headers = self.get_auth_header()
+        old_tag = self.client.get("/api/stock").headers["ETag"]
+        def fail_bumps(conn, cursor, statement, *args):
+            if "table_versions" in statement and statement.lstrip().upper().startswith("INSERT"):
+                raise RuntimeError("table_versions unavailable")
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", fail_bumps)
+        try:
+            response = self.client.post("/api/purchases", json={"product_id": 1, "quantity": 1}, headers=headers)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(self.app.extensions["table_versions"].unbumped, {"purchases", "stock"})
+            response = self.client.get("/api/stock", headers={"If-None-Match": old_tag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(self.client.get("/api/stock").headers["ETag"], response.headers["ETag"])
+        finally:
+            event.remove(engine, "before_cursor_execute", fail_bumps)
+
+        tag = self.client.get("/api/stock").headers["ETag"]
+        self.assertEqual(self.app.extensions["table_versions"].unbumped, set())
+        self.assertNotEqual(tag, old_tag)
+        self.assertEqual(self.client.get("/api/stock", headers={"If-None-Match": tag}).status_code, 304)
+
+    # ----------------------------
+    # Test: /api/metrics reports per-route timings and SQL counts
+    # ----------------------------
+    def test_metrics(self):
+        self.client.get("/api/stock")
+        response = self.client.get("/api/metrics")
+        self.assertEqual(response.status_code, 200)
+        text = response.get_data(as_text=True)
+
+        self.assertIn('http_requests_total{method="GET",route="/api/stock",status="200"}', text)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/api/stock"}', text)
+        # /api/stock is one SELECT on the stock ledger
+        self.assertIn('http_request_sql_statements_bucket{method="GET",route="/api/stock",le="1"}', text)
+        self.assertIn("stk_queue_depth", text)
+
+    def test_slow_request_log(self):
+        self.app.extensions["metrics"].slow_request_ms = 0.000001  # everything counts as slow
+        try:
+            with self.assertLogs("slow_requests", level="WARNING") as logs:
+                self.client.get("/api/stock")
+        finally:
+            self.app.extensions["metrics"].slow_request_ms = 0
+        self.assertIn("/api/stock", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
     # ----------------------------
     # Test: POST /api/logout
     # ----------------------------
@@ -205,6 +618,1093 @@ class FlaskAPITest(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("message", response.get_json())
 
+        # The token is revoked: protected routes now refuse it
+        response = self.client.get("/api/products", headers=headers)
+        self.assertEqual(response.status_code, 401)
+
+    # ----------------------------
+    # Test: a logout on one worker reaches the others through the shared store
+    # ----------------------------
+    def test_logout_shared_between_workers(self):
+        headers = self.get_auth_header()
+        self.client.post("/api/logout", headers=headers)
+
+        # a second worker starts with an empty blocklist and syncs from the database
+        other_worker = TokenBlocklist(shared=True, sync_interval=0)
+        with self.app.app_context():
+            jti = decode_token(headers["Authorization"].split()[1], allow_expired=True)["jti"]
+            self.assertTrue(other_worker.is_revoked(jti))
+            self.assertFalse(other_worker.is_revoked("some-other-jti"))
+
+    # ----------------------------
+    # Test: a logout that commits after a newer one was synced still reaches the other workers
+    # ----------------------------
+    def test_logout_committed_late_is_synced(self):
+        other_worker = TokenBlocklist(shared=True, sync_interval=0)
+        expires_at = datetime.now() + timedelta(minutes=15)
+        with self.app.app_context():
+            # two logouts in flight: the one with the higher id commits first and is synced...
+            db.session.add(RevokedToken(id=1000, jti="committed-first", expires_at=expires_at))
+            db.session.commit()
+            self.assertTrue(other_worker.is_revoked("committed-first"))
+            # ...then the other lands, with a lower id and an older created_at
+            db.session.add(RevokedToken(id=999, jti="committed-late", expires_at=expires_at, created_at=datetime.now() - timedelta(seconds=5)))
+            db.session.commit()
+            self.assertTrue(other_worker.is_revoked("committed-late"))
+
+
+# ----------------------------
+# Stub Daraja (Safaricom) server for M-Pesa tests - runs locally, no network needed
+# ----------------------------
+class StubServer(ThreadingHTTPServer):
+    # the tests open 20+ connections at once; the default listen backlog (5) resets some
+    request_queue_size = 64
+
+
+class StubDaraja:
+    def __init__(self, expires_in=3599, pending_polls=0):
+        self.expires_in = expires_in
+        self.pending_polls = pending_polls  # status queries answered "still processing" per checkout
+        self.polls = {}
+        self.token_calls = 0
+        self.posts = []          # (path, json body) of every STK push / query
+        self.client_ports = set()  # one port per TCP connection the client opened
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.client_ports.add(self.client_address[1])
+                    stub.token_calls += 1
+                    token = f"token-{stub.token_calls}"
+                time.sleep(0.05)  # slow OAuth endpoint makes concurrent refreshes overlap
+                self.reply(200, {"access_token": token, "expires_in": str(stub.expires_in)})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    stub.client_ports.add(self.client_address[1])
+                    stub.posts.append((self.path, body))
+                if not self.headers.get("Authorization", "").startswith("Bearer token-"):
+                    return self.reply(401, {"errorMessage": "Invalid Access Token"})
+                if "stkpushquery" in self.path:
+                    checkout_id = body["CheckoutRequestID"]
+                    with stub.lock:
+                        stub.polls[checkout_id] = stub.polls.get(checkout_id, 0) + 1
+                        still_processing = stub.polls[checkout_id] <= stub.pending_polls
+                    if still_processing:
+                        return self.reply(500, {"errorCode": "500.001.1001", "errorMessage": "The transaction is being processed"})
+                    return self.reply(200, {"CheckoutRequestID": checkout_id, "ResultCode": "0", "ResultDesc": "The service request is processed successfully."})
+                self.reply(200, {"CheckoutRequestID": f"ws_CO_{len(stub.posts)}", "ResponseCode": "0"})
+
+        self.server = StubServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ----------------------------
+# Test: M-Pesa client token cache and pooled session
+# ----------------------------
+class DarajaClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubDaraja()
+        self.daraja = mpesa.DarajaClient(base_url=self.stub.url)
+
+    def tearDown(self):
+        self.daraja.session.close()
+        self.stub.close()
+
+    def test_token_fetched_once_for_concurrent_calls(self):
+        # 20 pushes at once should share a single OAuth request (single-flight)
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(lambda _: self.daraja.make_stk_push({"amount": 10, "phone_number": "254700000000"}), range(20)))
+        self.assertEqual(self.stub.token_calls, 1)
+        self.assertTrue(all("CheckoutRequestID" in r for r in results))
+
+    def test_token_refreshed_before_expiry(self):
+        # expires_in inside the refresh margin -> every call must fetch a new token
+        self.stub.expires_in = mpesa.token_refresh_margin
+        self.daraja.query_transaction_status("ws_CO_1")
+        self.daraja.query_transaction_status("ws_CO_1")
+        self.assertEqual(self.stub.token_calls, 2)
+
+    def test_password_matches_timestamp_and_connection_reused(self):
+        for _ in range(5):
+            self.daraja.make_stk_push({"amount": 10, "phone_number": "254700000000"})
+        for _, body in self.stub.posts:
+            expected = base64.b64encode((mpesa.short_code + mpesa.saf_pass_key + body["Timestamp"]).encode()).decode()
+            self.assertEqual(body["Password"], expected)
+        # token + 5 pushes, all over one keep-alive connection
+        self.assertEqual(len(self.stub.client_ports), 1)
+
+
+# ----------------------------
+# Test: background STK push queue with status polling
+# ----------------------------
+class StkPushQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubDaraja(pending_polls=2)
+        self.daraja = mpesa.DarajaClient(base_url=self.stub.url)
+        # tiny poll delays so the test runs in milliseconds
+        self.queue = StkPushQueue(client=self.daraja, workers=2, max_queue=5, first_poll=0.01, max_poll=0.02)
+
+    def tearDown(self):
+        self.queue.shutdown()
+        self.daraja.session.close()
+        self.stub.close()
+
+    # Wait until the job reaches a final state (or give up after 5 seconds)
+    def wait_final(self, job):
+        deadline = time.time() + 5
+        while not job.is_final and time.time() < deadline:
+            time.sleep(0.01)
+        return job
+
+    def test_push_then_poll_until_final(self):
+        job = self.queue.submit({"amount": 10, "phone_number": "254700000000"})
+        # submit returns straight away, before Daraja has been called
+        self.assertIn(job.status, ["queued", "pushing", "pending"])
+
+        self.wait_final(job)
+        self.assertEqual(job.status, "success")
+        # 2 "still processing" answers, then the final one
+        self.assertEqual(job.polls, 3)
+        stats = self.queue.stats()
+        self.assertEqual(stats["completed"]["success"], 1)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_callback_stops_polling(self):
+        self.queue.first_poll = 60  # polling would take a minute, the callback must finish the job
+        job = self.queue.submit({"amount": 10, "phone_number": "254700000000"})
+        deadline = time.time() + 5
+        while job.checkout_request_id is None and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.queue.complete_from_callback(job.checkout_request_id, 1032, "Request cancelled by user")
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.polls, 0)
+
+    def test_shutdown_stops_scheduler(self):
+        self.queue.first_poll = 60  # leave a poll waiting in the scheduler
+        job = self.queue.submit({"amount": 10, "phone_number": "254700000000"})
+        deadline = time.time() + 5
+        while job.checkout_request_id is None and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.queue.shutdown()
+        self.assertFalse(self.queue._scheduler.is_alive())
+        # a push refused after shutdown leaves nothing counted as queued
+        with self.assertRaises(RuntimeError):
+            self.queue.submit({"amount": 10, "phone_number": "254700000000"})
+        stats = self.queue.stats()
+        self.assertEqual((stats["queue_depth"], stats["in_flight"], stats["pending_polls"]), (0, 0, 0))
+
+    def test_queue_is_bounded(self):
+        self.stub.server.RequestHandlerClass.do_GET = lambda handler: time.sleep(0.5) or handler.reply(200, {"access_token": "token-x", "expires_in": "3599"})
+        with self.assertRaises(QueueFull):
+            for _ in range(20):
+                self.queue.submit({"amount": 10, "phone_number": "254700000000"})
+
+
+# ----------------------------
+# Test: M-Pesa callbacks are saved once each, in batches
+# ----------------------------
+class MpesaCallbackTest(AppTestCase):
+
+    # Build a successful STK callback like the ones Daraja sends
+    def callback(self, checkout_id, receipt, amount=10):
+        return {"Body": {"stkCallback": {
+            "MerchantRequestID": "29115-34620561-1",
+            "CheckoutRequestID": checkout_id,
+            "ResultCode": 0,
+            "ResultDesc": "The service request is processed successfully.",
+            "CallbackMetadata": {"Item": [
+                {"Name": "Amount", "Value": amount},
+                {"Name": "MpesaReceiptNumber", "Value": receipt},
+                {"Name": "TransactionDate", "Value": 20250101120000},
+                {"Name": "PhoneNumber", "Value": 254700000000}
+            ]}
+        }}}
+
+    def test_callbacks_saved_once(self):
+        prefix = uuid.uuid4().hex[:8]
+        bodies = [self.callback(f"ws_CO_{prefix}_{i}", f"R{prefix}{i}") for i in range(20)]
+        # every callback arrives three times, all at once (Safaricom retries)
+        with ThreadPoolExecutor(max_workers=30) as pool:
+            statuses = list(pool.map(lambda body: self.app.test_client().post("/api/mpesa/callback", json=body).status_code, bodies * 3))
+        self.assertEqual(statuses, [200] * 60)
+
+        with self.app.app_context():
+            saved = Payment.query.filter(Payment.checkout_request_id.like(f"ws_CO_{prefix}_%")).all()
+        self.assertEqual(len(saved), 20)
+        self.assertEqual({p.trans_amount for p in saved}, {10})
+
+        # a retry after the recent-keys cache forgot the key is stopped by the unique constraint
+        self.app.extensions["callback_batcher"].recent.discard(f"ws_CO_{prefix}_0")
+        response = self.client.post("/api/mpesa/callback", json=bodies[0])
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(Payment.query.filter_by(checkout_request_id=f"ws_CO_{prefix}_0").count(), 1)
+
+    def test_not_a_callback(self):
+        response = self.client.post("/api/mpesa/callback", json={"hello": "world"})
+        self.assertEqual(response.status_code, 400)
+        bad = self.callback("ws_CO_bad_code", "RBADCODE")
+        bad["Body"]["stkCallback"]["ResultCode"] = "oops"
+        self.assertEqual(self.client.post("/api/mpesa/callback", json=bad).status_code, 400)
+        self.assertEqual(self.client.post("/api/mpesa/callback", json={"Body": ["not", "an", "object"]}).status_code, 400)
+
+    def test_bad_row_fails_only_itself(self):
+        batcher = CallbackBatcher(self.app, max_wait=0.2)
+        prefix = uuid.uuid4().hex[:8]
+        rows = [parse_stk_callback(self.callback(f"ws_CO_{prefix}_{i}", f"R{prefix}{i}")) for i in range(3)]
+        rows[1]["trans_name"] = None  # NOT NULL: fails any INSERT it is part of
+        futures = [batcher.submit(row) for row in rows]  # all in one batch
+
+        self.assertTrue(futures[0].result(timeout=5))
+        self.assertTrue(futures[2].result(timeout=5))
+        with self.assertRaises(Exception):
+            futures[1].result(timeout=5)
+        with self.app.app_context():
+            saved = {p.checkout_request_id for p in Payment.query.filter(Payment.checkout_request_id.like(f"ws_CO_{prefix}_%"))}
+        self.assertEqual(saved, {f"ws_CO_{prefix}_0", f"ws_CO_{prefix}_2"})
+
+
+# ----------------------------
+# Test: read-only routes go to the read bind, writes to the primary
+# (two local SQLite files stand in for the primary and its replica)
+# ----------------------------
+class ReadReplicaTest(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        self.app = create_app(make_test_config(
+            SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.join(folder, "primary.db"),
+            SQLALCHEMY_READ_DATABASE_URI="sqlite:///" + os.path.join(folder, "replica.db"),
+            TABLE_VERSIONS_SYNC_SECONDS=0
+        ))
+        with self.app.app_context():
+            db.create_all()
+            # the models have no bind key, so the replica's tables are created explicitly
+            db.metadata.create_all(db.engines["read"])
+            self.headers = {"Authorization": f"Bearer {create_access_token(identity='replica@test.local')}"}
+        self.client = self.app.test_client()
+
+    def test_reads_use_replica(self):
+        response = self.client.post("/api/products", json={"name": "Written", "buying_price": 1, "selling_price": 2}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        with self.app.app_context():
+            self.assertEqual(Product.query.count(), 1)
+
+        # not replicated yet: the read routes don't see it
+        self.assertEqual(self.client.get("/api/products", headers=self.headers).get_json(), [])
+        self.assertEqual(self.client.get("/api/stock").get_json(), [])
+
+        # "replicate" the row and its version bump, now the read routes return it
+        with self.app.app_context():
+            with db.engines["read"].begin() as conn:
+                conn.execute(Product.__table__.insert(), {"id": 1, "name": "Written", "buying_price": 1, "selling_price": 2})
+                conn.execute(TableVersion.__table__.insert(), [dict(row._mapping) for row in db.session.execute(select(TableVersion.__table__))])
+        names = [p["name"] for p in self.client.get("/api/products", headers=self.headers).get_json()]
+        self.assertEqual(names, ["Written"])
+        self.assertEqual(self.client.get("/api/stock").get_json()[0]["available_quantity"], 0)
+
+    def test_engine_options(self):
+        config = dict(self.app.config, DB_POOL_SIZE=20, DB_STATEMENT_TIMEOUT_MS=5000)
+        options = engine_options("postgresql://user:pw@db/pos", config)
+        self.assertEqual(options["pool_size"], 20)
+        self.assertEqual(options["connect_args"], {"options": "-c statement_timeout=5000"})
+        # SQLite has no pool sizing or statement timeout
+        self.assertEqual(engine_options("sqlite:///pos.db", config), {"pool_pre_ping": True})
+
+
+# ----------------------------
+# Test: versioned migrations build the same schema as models.py, also on old databases
+# ----------------------------
+class MigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(make_test_config())
+
+    # {table: (columns, index names, referenced tables)}
+    def schema(self, app):
+        with app.app_context():
+            inspector = inspect(db.engine)
+            return {
+                table: (
+                    {c["name"] for c in inspector.get_columns(table)},
+                    {i["name"] for i in inspector.get_indexes(table)},
+                    {fk["referred_table"] for fk in inspector.get_foreign_keys(table)}
+                )
+                for table in inspector.get_table_names() if table != "schema_migrations"
+            }
+
+    def test_upgrade_matches_models(self):
+        with self.app.app_context():
+            self.assertEqual(len(upgrade_schema(db.engine)), len(schema_status(db.engine)))
+            # everything is recorded, a second run does nothing
+            self.assertEqual(upgrade_schema(db.engine), [])
+
+        from_models = create_app(make_test_config())
+        with from_models.app_context():
+            db.create_all()
+        self.assertEqual(self.schema(self.app), self.schema(from_models))
+
+    def test_upgrade_existing_database(self):
+        with self.app.app_context():
+            # a database as the first db.create_all() left it, with some history
+            upgrade_schema(db.engine, target="0001")
+            with db.engine.begin() as conn:
+                conn.execute(text("INSERT INTO products (id, name, buying_price, selling_price) VALUES (1, 'Old', 1, 2)"))
+                conn.execute(text("INSERT INTO purchases (product_id, quantity) VALUES (1, 10)"))
+                conn.execute(text("INSERT INTO sales (id) VALUES (1)"))
+                conn.execute(text("INSERT INTO sales_details (sale_id, product_id, quantity) VALUES (1, 1, 3)"))
+                conn.execute(text("INSERT INTO payments (mode, sale_id, mpesa_ref, trans_amount, trans_name) VALUES ('mpesa', 1, 'R1', 6, 'Sale')"))
+
+            upgrade_schema(db.engine)
+            # the stock ledger is backfilled and no rows were lost rebuilding tables
+            self.assertEqual(db.session.get(Stock, 1).quantity, 7)
+            self.assertEqual(SalesDetails.query.count(), 1)
+            self.assertEqual(Payment.query.one().mpesa_ref, "R1")
+            quantity = next(c for c in inspect(db.engine).get_columns("sales_details") if c["name"] == "quantity")
+            self.assertIsInstance(quantity["type"], Float)
+            db.session.add(Payment(mode="mpesa", checkout_request_id="ws_CO_1", trans_amount=1, trans_name="STK Push"))
+            db.session.commit()
+
+    def test_stock_backfilled_when_table_exists(self):
+        with self.app.app_context():
+            # db.create_all() made the stock table empty, history in the raw tables
+            upgrade_schema(db.engine, target="0001")
+            with db.engine.begin() as conn:
+                conn.execute(text("INSERT INTO products (id, name, buying_price, selling_price) VALUES (1, 'Old', 1, 2), (2, 'Kept', 1, 2)"))
+                conn.execute(text("INSERT INTO purchases (product_id, quantity) VALUES (1, 10), (2, 4)"))
+            Stock.__table__.create(db.engine)
+            db.session.add(Stock(product_id=2, quantity=1))
+            db.session.commit()
+
+            upgrade_schema(db.engine)
+            self.assertEqual(db.session.get(Stock, 1).quantity, 10)
+            self.assertEqual(db.session.get(Stock, 2).quantity, 1)  # existing rows untouched
+
+
+# ----------------------------
+# Test: EXPLAIN shows the hot queries reading the indexes from migration 0007
+# ----------------------------
+class QueryPlanTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            db.session.add(Product(id=1, name="Indexed", buying_price=1, selling_price=2))
+            db.session.flush()
+            for _ in range(5):
+                sale = Sale()
+                db.session.add(sale)
+                db.session.flush()
+                db.session.add(SalesDetails(sale_id=sale.id, product_id=1, quantity=1))
+                db.session.add(Purchase(product_id=1, quantity=10))
+            db.session.commit()
+
+    # Run `fn` and return the SQLite query plan of every SELECT it sent
+    def plans(self, fn):
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(("SELECT", "INSERT INTO STOCK")):
+                statements.append((statement, parameters))
+        with self.app.app_context():
+            engine = db.engine
+            event.listen(engine, "before_cursor_execute", record)
+            try:
+                fn()
+            finally:
+                event.remove(engine, "before_cursor_execute", record)
+            with engine.connect() as conn:
+                return [
+                    "\n".join(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+                    for statement, parameters in statements
+                ]
+
+    def test_sales_page_uses_indexes(self):
+        client = self.app.test_client()
+        plan = "\n".join(self.plans(lambda: client.get("/api/sales?limit=2", headers=self.headers)))
+        # pages are read in index order (no sort step) and the EXISTS is an index lookup
+        self.assertIn("ix_sales_created_at_id", plan)
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan.split("ix_sales_created_at_id")[0])
+        self.assertIn("ix_sales_details_sale_id", plan)
+
+    def test_purchases_page_uses_indexes(self):
+        client = self.app.test_client()
+        plan = "\n".join(self.plans(lambda: client.get("/api/purchases?limit=2", headers=self.headers)))
+        self.assertIn("ix_purchases_created_at_id", plan)
+
+    def test_stock_sums_use_covering_indexes(self):
+        def stock_queries():
+            _raw_stock(1)
+            rebuild_stock()
+        plan = "\n".join(self.plans(stock_queries))
+        self.assertIn("COVERING INDEX ix_purchases_product_id_quantity", plan)
+        self.assertIn("COVERING INDEX ix_sales_details_product_id_quantity", plan)
+
+
+# ----------------------------
+# Test: hourly/daily rollups follow every sale and can be rebuilt from history
+# ----------------------------
+class SalesRollupTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name in ["Tea", "Bread"]:
+            self.add_product(name, quantity=100)
+
+    def analytics(self, query=""):
+        response = self.client.get(f"/api/analytics/sales{query}", headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()
+
+    def test_sales_update_rollups(self):
+        self.client.post("/api/sales", json={"product_id": 1, "quantity": 2}, headers=self.headers)
+        self.client.post("/api/sales", json={"items": [{"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 4}]}, headers=self.headers)
+
+        for granularity in ["hour", "day", "week", "month"]:
+            data = self.analytics(f"?granularity={granularity}&from=2000-01-01" if granularity != "hour" else "?granularity=hour")
+            self.assertEqual(len(data["buckets"]), 1, granularity)
+            self.assertEqual(data["buckets"][0]["quantity"], 7)
+            self.assertEqual(data["buckets"][0]["revenue"], 35)
+            self.assertEqual(data["buckets"][0]["profit"], 21)
+        self.assertEqual([(p["product_id"], p["quantity"]) for p in data["products"]], [(1, 3), (2, 4)])
+
+        # a rebuild from the sales tables gives the same numbers
+        before = self.analytics()
+        with self.app.app_context():
+            self.assertEqual(rebuild_rollups(), 4)  # 2 products x (hourly + daily)
+        self.assertEqual(self.analytics(), before)
+        self.assertEqual(self.analytics("?product_id=2")["buckets"][0]["quantity"], 4)
+
+    def test_rebuild_backfills_history(self):
+        with self.app.app_context():
+            for day, quantity in [(datetime(2025, 1, 6, 9, 30), 1), (datetime(2025, 1, 6, 17, 0), 2), (datetime(2025, 2, 3, 12, 0), 5)]:
+                sale = Sale(created_at=day)
+                db.session.add(sale)
+                db.session.flush()
+                db.session.add(SalesDetails(sale_id=sale.id, product_id=1, quantity=quantity, created_at=day))
+            db.session.commit()
+            rebuild_rollups()
+
+        data = self.analytics("?from=2025-01-01&to=2025-02-28&granularity=month")
+        self.assertEqual([(b["bucket"], b["quantity"]) for b in data["buckets"]], [("2025-01-01 00:00", 3), ("2025-02-01 00:00", 5)])
+        data = self.analytics("?from=2025-01-06&to=2025-01-06&granularity=hour")
+        self.assertEqual([(b["bucket"], b["profit"]) for b in data["buckets"]], [("2025-01-06 09:00", 3), ("2025-01-06 17:00", 6)])
+
+    def test_bad_parameters(self):
+        for query in ["?granularity=year", "?from=yesterday", "?from=2025-02-01&to=2025-01-01", "?granularity=hour&from=2024-01-01&to=2025-01-01", "?product_id=x"]:
+            response = self.client.get(f"/api/analytics/sales{query}", headers=self.headers)
+            self.assertEqual(response.status_code, 400, query)
+
+
+# ----------------------------
+# Test: streamed CSV / NDJSON exports of sales and purchases
+# ----------------------------
+class ExportTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name in ["Tea", "Bread, sliced"]:
+            self.add_product(name, quantity=100)
+        self.client.post("/api/sales", json={"product_id": 1, "quantity": 2}, headers=self.headers)
+        self.client.post("/api/sales", json={"items": [{"product_id": 2, "quantity": 1}, {"product_id": 1, "quantity": 3}]}, headers=self.headers)
+
+    def test_sales_csv(self):
+        response = self.client.get("/api/sales/export", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/csv")
+        self.assertIn('filename="sales.csv"', response.headers["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(rows[0], ["sale_id", "created_at", "product_id", "product_name", "quantity", "unit_selling_price", "subtotal"])
+        self.assertEqual([(r[0], r[3], r[6]) for r in rows[1:]], [("1", "Tea", "10.0"), ("2", "Bread, sliced", "5.0"), ("2", "Tea", "15.0")])
+
+    def test_ndjson_matches_list_endpoints(self):
+        response = self.client.get("/api/sales/export?format=ndjson", headers=self.headers)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        exported = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        listed = self.client.get("/api/sales", headers=self.headers).get_json()
+        self.assertEqual(exported, listed[::-1])  # oldest first
+
+        exported = [json.loads(line) for line in self.client.get("/api/purchases/export?format=ndjson&product_id=2", headers=self.headers).get_data(as_text=True).splitlines()]
+        listed = self.client.get("/api/purchases?product_id=2", headers=self.headers).get_json()
+        self.assertEqual(exported, listed[::-1])
+
+    def test_date_range(self):
+        body = self.client.get("/api/purchases/export?from=2000-01-01&to=2000-12-31", headers=self.headers).get_data(as_text=True)
+        self.assertEqual(body.splitlines(), ["id,created_at,product_id,product_name,quantity,buying_price,selling_price"])
+        self.assertEqual(self.client.get("/api/sales/export?format=ndjson&from=2000-01-01", headers=self.headers).get_data(as_text=True).count("\n"), 2)
+
+    def test_gzip(self):
+        plain = self.client.get("/api/sales/export", headers=self.headers).get_data()
+        response = self.client.get("/api/sales/export", headers={**self.headers, "Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.get_data()), plain)
+
+    def test_streams_before_query_runs(self):
+        with self.app.app_context():
+            engine = db.engine
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = self.client.get("/api/sales/export", headers=self.headers, buffered=False)
+            chunks = iter(response.response)
+            # headers and the CSV header line are out, the export query hasn't run yet
+            self.assertEqual(next(chunks), b"sale_id,created_at,product_id,product_name,quantity,unit_selling_price,subtotal\r\n")
+            self.assertFalse([s for s in statements if "JOIN sales_details" in s])
+            self.assertIn(b"Tea", b"".join(chunks))
+            self.assertEqual(len([s for s in statements if "JOIN sales_details" in s]), 1)
+            response.close()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    def test_bad_parameters(self):
+        for path in ["/api/sales/export?format=xml", "/api/sales/export?from=soon", "/api/purchases/export?product_id=x"]:
+            self.assertEqual(self.client.get(path, headers=self.headers).status_code, 400, path)
+
+
+# ----------------------------
+# Test: bulk purchase import from CSV / NDJSON files
+# ----------------------------
+class PurchaseImportTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name in ["Tea", "Bread"]:
+            self.add_product(name)
+        self.client.post("/api/purchases", json={"product_id": 1, "quantity": 1}, headers=self.headers)
+
+    def stock(self):
+        return {p["product_id"]: p["available_quantity"] for p in self.client.get("/api/stock").get_json()}
+
+    def upload(self, body, filename):
+        return self.client.post(
+            "/api/purchases/import", data={"file": (io.BytesIO(body), filename)},
+            headers=self.headers, content_type="multipart/form-data"
+        )
+
+    def test_csv_body(self):
+        body = b"product_id,quantity,supplier\n1,10,Acme\n2,2.5,Acme\n1,4,Acme\n"
+        response = self.client.post("/api/purchases/import", data=body, headers={**self.headers, "Content-Type": "text/csv"})
+        self.assertEqual(response.status_code, 201, response.get_json())
+        self.assertEqual(response.get_json()["imported"], 3)
+        self.assertEqual(self.stock(), {1: 15, 2: 2.5})
+        with self.app.app_context():
+            self.assertEqual(Purchase.query.count(), 4)
+            self.assertEqual(verify_stock(), [])
+
+    def test_ndjson_upload(self):
+        response = self.upload(b'{"product_id": 2, "quantity": "7"}\n\n{"product_id": "1", "quantity": 3}\n', "restock.ndjson")
+        self.assertEqual(response.status_code, 201, response.get_json())
+        self.assertEqual(self.stock(), {1: 4, 2: 7})
+
+    def test_invalid_rows_import_nothing(self):
+        body = b"product_id,quantity\n1,5\nabc,5\n2,lots\n99,1\n2,1\n"
+        response = self.upload(body, "restock.csv")
+        self.assertEqual(response.status_code, 422)
+        data = response.get_json()
+        self.assertEqual(data["error_count"], 3)
+        self.assertEqual(data["errors"], [
+            {"row": 3, "error": "product_id must be an int"},
+            {"row": 4, "error": "quantity must be a number"},
+            {"row": 5, "error": "product 99 does not exist"}
+        ])
+        self.assertEqual(self.stock(), {1: 1, 2: 0})
+
+        response = self.upload(b'{"product_id": 1, "quantity": 1}\n[1, 2]\nnot json\n', "restock.ndjson")
+        self.assertEqual([e["row"] for e in response.get_json()["errors"]], [2, 3])
+
+    def test_bad_files(self):
+        self.assertEqual(self.upload(b"id,qty\n1,5\n", "restock.csv").status_code, 400)
+        self.assertEqual(self.upload(b"product_id,quantity\n", "restock.csv").status_code, 400)
+        self.assertEqual(self.upload(b"\xff\xfe\x00", "restock.csv").status_code, 400)
+        response = self.client.post("/api/purchases/import?format=xml", data=b"", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+# ----------------------------
+# Test: catalog sync upserts products on sku
+# ----------------------------
+class ProductSyncTest(AppTestCase):
+
+    def sync(self, items):
+        return self.client.post("/api/products/bulk", json={"products": items}, headers=self.headers)
+
+    def catalog(self):
+        with self.app.app_context():
+            return {p.sku: (p.id, p.name, p.buying_price, p.selling_price) for p in Product.query.all()}
+
+    def test_insert_then_update(self):
+        response = self.sync([
+            {"sku": "TEA", "name": "Tea", "buying_price": 2, "selling_price": 5},
+            {"sku": "BRD", "name": "Bread", "buying_price": "1.5", "selling_price": 3}
+        ])
+        self.assertEqual(response.status_code, 200, response.get_json())
+        self.assertEqual((response.get_json()["inserted"], response.get_json()["updated"]), (2, 0))
+        before = self.catalog()
+
+        response = self.sync([
+            {"sku": "TEA", "name": "Tea 500g", "buying_price": 2.5, "selling_price": 6},
+            {"sku": "MLK", "name": "Milk", "buying_price": 1, "selling_price": 2},
+            {"sku": "MLK", "name": "Milk 1l", "buying_price": 1, "selling_price": 2.5}  # last one wins
+        ])
+        self.assertEqual((response.get_json()["inserted"], response.get_json()["updated"]), (1, 1))
+        after = self.catalog()
+        self.assertEqual(after["TEA"], (before["TEA"][0], "Tea 500g", 2.5, 6))
+        self.assertEqual(after["BRD"], before["BRD"])
+        self.assertEqual(after["MLK"][1:], ("Milk 1l", 1, 2.5))
+
+        # new products get a stock ledger row and can be bought and sold
+        self.assertEqual({p["product_id"]: p["available_quantity"] for p in self.client.get("/api/stock").get_json()}, {1: 0, 2: 0, 3: 0})
+        self.client.post("/api/purchases", json={"product_id": after["MLK"][0], "quantity": 4}, headers=self.headers)
+        self.assertEqual(self.client.post("/api/sales", json={"product_id": after["MLK"][0], "quantity": 1}, headers=self.headers).status_code, 201)
+
+    def test_adopts_products_without_sku(self):
+        old = self.client.post("/api/products", json={"name": "Tea", "buying_price": 1, "selling_price": 2}, headers=self.headers).get_json()
+        response = self.sync([{"sku": "TEA", "name": "Tea", "buying_price": 2, "selling_price": 5}])
+        self.assertEqual((response.get_json()["inserted"], response.get_json()["updated"]), (0, 1))
+        self.assertEqual(self.catalog(), {"TEA": (old["id"], "Tea", 2, 5)})
+
+    def test_sync_keeps_history_of_products_without_ledger_row(self):
+        with self.app.app_context():
+            # from before the ledger: history in the raw tables, no stock row yet
+            db.session.add(Product(id=1, name="Old", buying_price=1, selling_price=2))
+            db.session.add(Purchase(product_id=1, quantity=10))
+            db.session.commit()
+        self.sync([{"sku": "NEW", "name": "New", "buying_price": 1, "selling_price": 2}])
+
+        # the sale seeds product 1's ledger row from its purchases (10), not from 0
+        self.assertEqual(self.client.post("/api/sales", json={"product_id": 1, "quantity": 3}, headers=self.headers).status_code, 201)
+        with self.app.app_context():
+            self.assertEqual((db.session.get(Stock, 1).quantity, db.session.get(Stock, 2).quantity), (7, 0))
+            self.assertEqual(verify_stock(), [])
+
+    def test_invalid_items_change_nothing(self):
+        self.sync([{"sku": "TEA", "name": "Tea", "buying_price": 2, "selling_price": 5}])
+        response = self.sync([
+            {"sku": "TEA", "name": "Tea", "buying_price": 9, "selling_price": 9},
+            {"sku": "", "name": "No sku", "buying_price": 1, "selling_price": 2},
+            {"sku": "X", "name": "Bad price", "buying_price": "cheap", "selling_price": 2},
+            "not an object"
+        ])
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual([(e["index"], e["sku"]) for e in response.get_json()["errors"]], [(1, ""), (2, "X"), (3, None)])
+        # the messages come from the same schemas as the request bodies
+        self.assertEqual([e["error"] for e in response.get_json()["errors"]], [
+            "sku must be a non-empty string of at most 64 characters",
+            "buying_price must be a number",
+            "item must be a JSON object"
+        ])
+        self.assertEqual(self.catalog()["TEA"][2:], (2, 5))
+        self.assertEqual(self.client.post("/api/products/bulk", json={"products": []}, headers=self.headers).status_code, 400)
+
+    def test_single_post_rejects_taken_sku(self):
+        product = {"name": "Tea", "sku": "TEA", "buying_price": 1, "selling_price": 2}
+        self.assertEqual(self.client.post("/api/products", json=product, headers=self.headers).status_code, 201)
+        self.assertEqual(self.client.post("/api/products", json=product, headers=self.headers).status_code, 409)
+
+
+# ----------------------------
+# Test: parallel tills never sell more than is in stock
+# ----------------------------
+class ConcurrentSalesTest(AppTestCase):
+    PRODUCTS = 4
+    STOCK = 25
+    TILLS = 8
+    BASKETS = 25
+
+    def setUp(self):
+        super().setUp()
+        for i in range(self.PRODUCTS):
+            self.add_product(f"Scarce {i}", quantity=self.STOCK, buying_price=1, selling_price=2)
+
+    def till(self, seed):
+        rng = random.Random(seed)
+        client = self.app.test_client()
+        results = []
+        for _ in range(self.BASKETS):
+            # baskets list products in any order; reserve_stock locks them in id order
+            products = rng.sample(range(1, self.PRODUCTS + 1), rng.randint(1, 3))
+            items = [{"product_id": p, "quantity": rng.randint(1, 2)} for p in products]
+            body = {"items": items} if len(items) > 1 else items[0]
+            response = client.post("/api/sales", json=body, headers=self.headers)
+            results.append((response.status_code, items))
+        return results
+
+    def test_no_overselling(self):
+        with ThreadPoolExecutor(self.TILLS) as pool:
+            results = [r for till in pool.map(self.till, range(self.TILLS)) for r in till]
+
+        statuses = [status for status, _ in results]
+        self.assertEqual(set(statuses) - {201, 400}, set(), statuses)
+        self.assertIn(400, statuses)  # demand was higher than the stock
+
+        sold = {}
+        for status, items in results:
+            if status == 201:
+                for item in items:
+                    sold[item["product_id"]] = sold.get(item["product_id"], 0) + item["quantity"]
+        with self.app.app_context():
+            recorded = dict(db.session.execute(
+                select(SalesDetails.product_id, func.sum(SalesDetails.quantity)).group_by(SalesDetails.product_id)
+            ).all())
+            self.assertEqual(recorded, sold)
+            for product_id in range(1, self.PRODUCTS + 1):
+                self.assertLessEqual(sold.get(product_id, 0), self.STOCK)
+                self.assertEqual(db.session.get(Stock, product_id).quantity, self.STOCK - sold.get(product_id, 0))
+            self.assertEqual(verify_stock(), [])
+
+
+# ----------------------------
+# Helper: GET requests against an ASGI app, all on one event loop
+# ----------------------------
+def asgi_get(asgi_app, requests):
+    async def get(path, headers):
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": path, "root_path": "", "query_string": query.encode(),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+            "server": ("localhost", 80)
+        }
+        messages = []
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+        async def send(message):
+            messages.append(message)
+        await asgi_app(scope, receive, send)
+        return messages[0]["status"], {k.decode(): v.decode() for k, v in messages[0]["headers"]}, messages[1]["body"]
+
+    async def run():
+        try:
+            return [await get(path, headers) for path, headers in requests]
+        finally:
+            await asgi_app.engine.dispose()
+    return asyncio.run(run())
+
+
+# ----------------------------
+# Test: the async read path answers exactly like the Flask routes
+# ----------------------------
+class AsyncReadPathTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name in ["Tea", "Bread"]:
+            self.add_product(name, quantity=50)
+        for quantity in [1, 2, 3]:
+            self.client.post("/api/sales", json={"items": [{"product_id": 1, "quantity": quantity}, {"product_id": 2, "quantity": 1}]}, headers=self.headers)
+        self.asgi = create_asgi_app(self.app)
+
+    def test_same_responses(self):
+        paths = ["/api/stock", "/api/dashboard", "/api/sales", "/api/sales?limit=2", "/api/sales?from=2000-01-01&to=2000-01-02", "/api/sales?limit=x"]
+        request_headers = {**self.headers, "Origin": "http://shop.local"}
+        results = asgi_get(self.asgi, [(path, request_headers) for path in paths])
+        for path, (status, headers, body) in zip(paths, results):
+            expected = self.client.get(path, headers=request_headers)
+            self.assertEqual(status, expected.status_code, path)
+            self.assertEqual(body, expected.get_data(), path)
+            for header in ["Content-Type", "ETag", "Last-Modified", "Cache-Control", "X-Next-Cursor", "Link", "Access-Control-Allow-Origin"]:
+                self.assertEqual(headers.get(header.lower()), expected.headers.get(header), (path, header))
+
+    def test_conditional_get(self):
+        etag = self.client.get("/api/dashboard", headers=self.headers).headers["ETag"]
+        stale = etag.replace('-', '-9', 1)
+        (current, _, body), (changed, _, _) = asgi_get(self.asgi, [
+            ("/api/dashboard", {**self.headers, "If-None-Match": etag}),
+            ("/api/dashboard", {**self.headers, "If-None-Match": stale})
+        ])
+        self.assertEqual((current, body), (304, b""))
+        self.assertEqual(changed, 200)
+
+    def test_dashboard_cache_stays_bounded(self):
+        # a process serving only the async routes never writes, so nothing clears its
+        # dashboard cache: storing a new ETag's payload has to prune it
+        cache = TTLCache(ttl=10, max_size=2)
+        for etag in ["v1", "v2", "v3"]:
+            cache.set(etag, {})
+        self.assertEqual(list(cache._entries), ["v2", "v3"])
+        cache.ttl = 0  # v4 has expired by the time v5 is stored, so it goes instead of v3
+        cache.set("v4", {})
+        cache.set("v5", {})
+        self.assertEqual(list(cache._entries), ["v3", "v5"])
+
+    def test_blocklist_sync_off_the_event_loop(self):
+        blocklist = self.app.extensions["token_blocklist"]
+        blocklist.shared = True
+        blocklist.sync_interval = 60
+        synced_on = []
+        sync = blocklist._sync
+        def record_sync():
+            synced_on.append(threading.current_thread())
+            sync()
+        blocklist._sync = record_sync
+        blocklist._next_maintenance = 0  # due now
+
+        loop_thread = threading.current_thread()  # asyncio.run() runs the loop here
+        [(status, _, _)] = asgi_get(self.asgi, [("/api/dashboard", self.headers)])
+        self.assertEqual(status, 200)
+        self.assertEqual(len(synced_on), 1)
+        self.assertIsNot(synced_on[0], loop_thread)
+
+    def test_auth_and_errors(self):
+        self.client.post("/api/logout", headers=self.headers)  # revokes self.headers' token
+        cases = [
+            ("/api/dashboard", {}),
+            ("/api/sales", self.headers),
+            ("/api/sales", {"Authorization": "Bearer not-a-token"}),
+            ("/api/stock", {}),
+            ("/api/nowhere", {})
+        ]
+        results = asgi_get(self.asgi, cases)
+        self.assertEqual([status for status, _, _ in results], [401, 401, 422, 200, 404])
+        self.assertEqual(json.loads(results[1][2]), self.client.get("/api/sales", headers=self.headers).get_json())
+
+
+# ----------------------------
+# Request body schemas: every error reported at once, values coerced
+# ----------------------------
+class SchemaValidationTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            db.session.add(Product(id=1, name="Validated", buying_price=1, selling_price=2))
+            db.session.add(Stock(product_id=1, quantity=10))
+            db.session.commit()
+
+    def test_schema_coerces_and_collects_errors(self):
+        line = Schema({"product_id": Int(), "quantity": Number(), "note": String(required=False, max_length=3)})
+        basket = Schema({"items": List(line, min_items=1)})
+
+        values, errors = basket.validate({"items": [{"product_id": "2", "quantity": "1.5"}, {"product_id": 3, "quantity": 4}]})
+        self.assertEqual(errors, [])
+        self.assertEqual(values, {"items": [{"product_id": 2, "quantity": 1.5}, {"product_id": 3, "quantity": 4.0}]})
+        self.assertIs(type(values["items"][1]["quantity"]), float)
+
+        _, errors = basket.validate({"items": [{"product_id": 1, "quantity": 1}, {"product_id": "x"}, "nope", {"product_id": 1, "quantity": 1, "note": "long"}]})
+        self.assertEqual(errors, [
+            {"field": "items[1].product_id", "error": "must be an int"},
+            {"field": "items[1].quantity", "error": "is required"},
+            {"field": "items[2]", "error": "must be a JSON object"},
+            {"field": "items[3].note", "error": "must be a string of at most 3 characters"}
+        ])
+        self.assertEqual(basket.validate(None)[1], [{"field": "body", "error": "must be a JSON object"}])
+        self.assertEqual(basket.validate({"items": []})[1], [{"field": "items", "error": "must not be empty"}])
+
+    def test_flat_schema_reports_like_the_full_pass(self):
+        line = Schema({"product_id": Int(), "quantity": Number()})
+        self.assertIsNotNone(line._flat)
+        basket = Schema({"items": List(line)})
+
+        values, errors = basket.validate({"items": [{"product_id": "2", "quantity": 1, "extra": "x"}]})
+        self.assertEqual((values, errors), ({"items": [{"product_id": 2, "quantity": 1.0}]}, []))
+        _, errors = basket.validate({"items": [{"product_id": 1, "quantity": None}, [1, 2], {"product_id": 1e400, "quantity": 1}]})
+        self.assertEqual(errors, [
+            {"field": "items[0].quantity", "error": "is required"},
+            {"field": "items[1]", "error": "must be a JSON object"},
+            {"field": "items[2].product_id", "error": "must be an int"}
+        ])
+        self.assertEqual(line.validate({"product_id": 1})[1], [{"field": "quantity", "error": "is required"}])
+
+    def test_bulk_sale_reports_every_bad_line(self):
+        items = [{"product_id": 1, "quantity": 1}] * 5
+        items[1] = {"product_id": "abc", "quantity": 1}
+        items[3] = {"product_id": 1, "quantity": "lots"}
+        res = self.client.post("/api/sales", json={"items": items}, headers=self.headers)
+        self.assertEqual(res.status_code, 400)
+        body = res.get_json()
+        self.assertEqual(body["error"], "items[1].product_id must be an int")
+        self.assertEqual([e["field"] for e in body["errors"]], ["items[1].product_id", "items[3].quantity"])
+        with self.app.app_context():
+            self.assertEqual(db.session.get(Stock, 1).quantity, 10)  # nothing sold
+
+    def test_fractional_sale_recorded_as_taken(self):
+        with self.app.app_context():
+            db.session.add(Purchase(product_id=1, quantity=10))  # the 10 in the ledger
+            db.session.commit()
+        res = self.client.post("/api/sales", json={"items": [{"product_id": 1, "quantity": 1.5}]}, headers=self.headers)
+        self.assertEqual(res.status_code, 201)
+        with self.app.app_context():
+            self.assertEqual(db.session.scalar(select(SalesDetails.quantity)), 1.5)
+            self.assertEqual(db.session.get(Stock, 1).quantity, 8.5)
+            self.assertEqual(verify_stock(), [])
+
+    def test_handlers_accept_coerced_values(self):
+        res = self.client.post("/api/sales", json={"product_id": "1", "quantity": "2"}, headers=self.headers)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.get_json()["quantity"], 2.0)
+        res = self.client.post("/api/purchases", json={"product_id": 1, "quantity": "3.5"}, headers=self.headers)
+        self.assertEqual(res.status_code, 201)
+
+        res = self.client.post("/api/purchases", json={}, headers=self.headers)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual([e["field"] for e in res.get_json()["errors"]], ["product_id", "quantity"])
+        res = self.client.post("/api/sales", data="not json", headers=self.headers)
+        self.assertEqual(res.get_json()["errors"], [{"field": "body", "error": "must be a JSON object"}])
+
+
+# ----------------------------
+# Test: product catalog cache - reads skip products, writes reach every worker
+# ----------------------------
+class ProductCatalogTest(AppTestCase):
+    CONFIG = {"PRODUCT_CACHE_SYNC_SECONDS": 0, "TABLE_VERSIONS_SYNC_SECONDS": 0}
+
+    def setUp(self):
+        super().setUp()
+        # a second worker on the same database
+        self.other = create_app(self.config)
+        self.product_id = self.add_product("Cached", quantity=10, buying_price=1, selling_price=2)["id"]
+        self.client.post("/api/sales", json={"product_id": self.product_id, "quantity": 1}, headers=self.headers)
+
+    # SQL sent to the products table while running `fn`
+    def product_reads(self, app, fn):
+        statements = []
+        def record(conn, cursor, statement, *args):
+            if "FROM products" in statement:
+                statements.append(statement)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        return statements
+
+    def test_reads_served_from_cache(self):
+        # written through by POST /api/products: not even the first read loads it
+        reads = self.product_reads(self.app, lambda: self.client.get("/api/sales", headers=self.headers))
+        self.assertEqual(reads, [])
+
+        self.client.get("/api/stock")  # loads the whole catalog once
+        def warm():
+            self.assertEqual(self.client.get("/api/stock").get_json()[0]["name"], "Cached")
+            self.assertEqual(self.client.get("/api/sales", headers=self.headers).get_json()[0]["total_sale"], 2)
+            self.assertEqual(len(self.client.get("/api/products", headers=self.headers).get_json()), 1)
+        self.assertEqual(self.product_reads(self.app, warm), [])
+
+        text = self.client.get("/api/metrics").get_data(as_text=True)
+        self.assertIn("product_cache_hits_total", text)
+        self.assertIn("product_cache_misses_total", text)
+        self.assertIn("product_cache_size 1", text)
+
+    def test_other_worker_sees_changes(self):
+        other = self.other.test_client()
+        self.assertEqual(other.get("/api/sales", headers=self.headers).get_json()[0]["items"][0]["unit_selling_price"], 2)
+        self.assertEqual(other.get("/api/stock").get_json()[0]["name"], "Cached")
+
+        # reprice and rename on the first worker; the second drops its entries
+        with self.app.app_context():
+            db.session.execute(Product.__table__.update().values(sku="CACHED-1"))
+            db.session.commit()
+        self.client.post("/api/products/bulk", json={"products": [{"sku": "CACHED-1", "name": "Renamed", "buying_price": 1, "selling_price": 3}]}, headers=self.headers)
+        sale = other.get("/api/sales", headers=self.headers).get_json()[0]
+        self.assertEqual((sale["items"][0]["product_name"], sale["total_sale"]), ("Renamed", 3))
+        self.assertEqual(other.get("/api/stock").get_json()[0]["name"], "Renamed")
+        self.assertGreaterEqual(self.other.extensions["product_catalog"].invalidations, 1)
+
+        # a product added on the second worker shows up on the first
+        other.post("/api/products", json={"name": "Elsewhere", "buying_price": 1, "selling_price": 2}, headers=self.headers)
+        names = [row["name"] for row in self.client.get("/api/stock").get_json()]
+        self.assertEqual(names, ["Elsewhere", "Renamed"])
+
+    def test_sale_totals_across_a_page_boundary(self):
+        tea = self.add_product("Tea", quantity=100, selling_price=2.5)
+        bread = self.add_product("Bread", quantity=100, selling_price=4)
+        baskets = [
+            [(tea, 2), (bread, 1)],
+            [(bread, 3)],
+            [(tea, 1), (bread, 2), (tea, 4)]
+        ]
+        for basket in baskets:
+            items = [{"product_id": product["id"], "quantity": quantity} for product, quantity in basket]
+            self.assertEqual(self.client.post("/api/sales", json={"items": items}, headers=self.headers).status_code, 201)
+
+        first = self.client.get("/api/sales?limit=2", headers=self.headers)
+        second = self.client.get(f"/api/sales?limit=2&cursor={first.headers['X-Next-Cursor']}", headers=self.headers)
+        pages = [[(len(sale["items"]), sale["total_sale"]) for sale in r.get_json()] for r in (first, second)]
+        # newest first (the setUp sale last); a page boundary never splits a basket's lines or total
+        self.assertEqual(pages, [[(3, 20.5), (1, 12)], [(2, 9), (1, 2)]])
+
+        # the same totals as summing the lines against products in SQL
+        with self.app.app_context():
+            in_sql = db.session.execute(
+                select(SalesDetails.sale_id, func.sum(SalesDetails.quantity * Product.selling_price))
+                .join(Product, Product.id == SalesDetails.product_id)
+                .group_by(SalesDetails.sale_id)
+                .order_by(SalesDetails.sale_id.desc())
+            ).all()
+        self.assertEqual([total for _, total in in_sql], [20.5, 12, 9, 2])
+
+    def test_bounded(self):
+        catalog = ProductCatalog(max_size=2)
+        for product_id in (1, 2, 3):
+            catalog.put(product_id, CatalogEntry(f"p{product_id}", 1, 2))
+        found, missing, _ = catalog.lookup([1, 2, 3])
+        self.assertEqual((sorted(found), missing), ([2, 3], [1]))
+        self.assertEqual((catalog.hits, catalog.misses), (2, 1))
+
+        # a load that started before a write doesn't bring back old rows
+        _, _, generation = catalog.lookup([1])
+        catalog.put(1, CatalogEntry("new", 1, 2))
+        Row = namedtuple("Row", "id name buying_price selling_price")
+        catalog.store([Row(1, "old", 1, 2)], generation)
+        self.assertEqual(catalog.lookup([1])[0][1].name, "new")
+
+
+# ----------------------------
+# Test: importing main is side-effect free, blueprints register per config
+# ----------------------------
+class StartupTest(unittest.TestCase):
+
+    def test_import_has_no_side_effects(self):
+        # fresh interpreter: no app, no .env, no config module, no HTTP client loaded
+        script = (
+            "import sys, json, main; "
+            "print(json.dumps({'app': 'app' in vars(main), 'loaded': [m for m in "
+            "('requests', 'mpesa', 'dotenv', 'configs', 'routes.sales') if m in sys.modules]}))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=60
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout), {"app": False, "loaded": []})
+
+    def test_blueprint_subset(self):
+        payments_only = create_app(make_test_config(BLUEPRINTS=("payments",)))
+        rules = {rule.rule for rule in payments_only.url_map.iter_rules()}
+        self.assertIn("/api/mpesa/callback", rules)
+        self.assertNotIn("/api/sales", rules)
+        self.assertEqual(payments_only.test_client().get("/api/stock").status_code, 404)
+        with self.assertRaises(ValueError):
+            create_app(make_test_config(BLUEPRINTS=("nope",)))
+
 
 # ----------------------------
 # Run tests when this file is executed
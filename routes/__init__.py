@@ -0,0 +1,13 @@
+#HTTP routes, one blueprint per area - imported and registered by create_app(), not when main is imported
+from importlib import import_module
+
+# Every blueprint, by module name; create_app registers config["BLUEPRINTS"] (default: all)
+BLUEPRINTS = ("auth", "catalog", "sales", "purchases", "reporting", "payments")
+
+
+# Import routes.<name> for each name and register its `bp` on `app`
+def register_blueprints(app, names=BLUEPRINTS):
+    for name in names:
+        if name not in BLUEPRINTS:
+            raise ValueError(f"unknown blueprint {name!r}, expected one of {', '.join(BLUEPRINTS)}")
+        app.register_blueprint(import_module(f"{__name__}.{name}").bp)
@@ -0,0 +1,79 @@
+#auth routes - register, login, logout and the user list
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt
+from sqlalchemy import select
+from models import db, User
+from utilities.passwords import HasherBusy
+from utilities.serialization import rows_to_dicts
+from utilities.schemas import Schema, String, error_body
+
+bp = Blueprint("auth", __name__)
+
+# Request bodies, compiled once here; each handler validates its whole body in one call
+REGISTER_BODY = Schema({"username": String(), "email": String(), "password": String()})
+LOGIN_BODY = Schema({"email": String(), "password": String()})
+
+
+@bp.route("/api/register", methods=["POST"])
+def register():
+    data, errors = REGISTER_BODY.validate(request.get_json(silent=True))
+    if errors:
+        return jsonify(error_body(errors)), 400
+    elif User.query.filter_by(email=data["email"]).first() is not None:
+        error = {"error": "User with that email already exists"}
+        return jsonify(error), 409
+        #Elif expected to check mail is valid/exists
+    else:
+        try:
+            hashed = current_app.extensions["password_hasher"].hash(data['password'])
+        except HasherBusy as e:
+            return jsonify({"error": str(e)}), 503
+        usrs = User(username=data['username'], email=data['email'], password=hashed)
+        db.session.add(usrs)
+        db.session.commit()
+        #create JWT token
+        token = create_access_token(identity=data["email"])
+        return jsonify({"token": token}), 201
+    
+@bp.route("/api/login", methods=["POST"])
+def login():
+    data, errors = LOGIN_BODY.validate(request.get_json(silent=True))
+    if errors:
+        return jsonify(error_body(errors)), 400
+    else:
+        # look up by email only (unique index), then check the password off-thread
+        usr = User.query.filter_by(email=data["email"]).first()
+        hasher = current_app.extensions["password_hasher"]
+        try:
+            valid = hasher.verify(usr.password if usr else None, data["password"])
+            # plaintext rows (and hashes made with an older cost) are upgraded on login
+            if valid and hasher.needs_rehash(usr.password):
+                usr.password = hasher.hash(data["password"])
+                db.session.commit()
+        except HasherBusy as e:
+            return jsonify({"error": str(e)}), 503
+        if not valid:
+            error = {"error": "Invalid email or password"}
+            return jsonify(error), 401
+        else:
+            token = create_access_token(identity = data["email"])
+            return jsonify({"token": token}), 200
+
+
+@bp.route("/api/users")
+def get_users():
+    if request.method == "GET":
+        rows = db.session.execute(select(User.id, User.username, User.email)).all()
+        return jsonify(rows_to_dicts(("id", "username", "email"), rows)), 200
+    else:
+        error = {"error": "Method not allowed"}
+        return jsonify(error), 405
+
+
+# build logout route that requires jwt token
+@bp.route("/api/logout", methods=["POST"])
+@jwt_required()
+def logout():
+    token = get_jwt()
+    current_app.extensions["token_blocklist"].revoke(token["jti"], token["exp"])
+    return jsonify({"message": "Logout successful"}), 200
@@ -0,0 +1,88 @@
+#catalog routes - product list, single product create and the bulk catalog sync
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required
+from sqlalchemy import select
+from models import db, Product, Stock
+from utilities.schemas import Schema, Number, String, error_body
+from utilities.database import read_session
+from utilities.versions import bump_versions, conditional
+from utilities.catalog import all_products, cache_product
+from utilities.product_sync import validate_catalog, upsert_products
+
+bp = Blueprint("catalog", __name__)
+
+PRODUCT_BODY = Schema({
+    "name": String(max_length=80),
+    "buying_price": Number(),
+    "selling_price": Number(),
+    "sku": String(required=False, max_length=64)
+})
+
+
+@bp.route('/api/products', methods=['GET', 'POST'])
+@jwt_required()
+@conditional("products", "products")
+def products():
+    # add logic to get if get fails redirect user to login
+
+    if request.method == 'GET':
+        # from the catalog cache, same keys as Product.to_dict()
+        products = all_products(read_session())
+        return jsonify([
+            {"id": product_id, "name": p.name, "buying_price": p.buying_price, "selling_price": p.selling_price}
+            for product_id, p in sorted(products.items())
+        ]), 200
+    elif request.method == 'POST':
+        data = request.get_json(silent=True)
+        body, errors = PRODUCT_BODY.validate(data)
+        if errors:
+            return jsonify(error_body(errors)), 400
+        else:
+           # sku is optional here, it must be unique when given
+           sku = body.get("sku")
+           if sku is not None and db.session.execute(select(Product.id).where(Product.sku == sku)).first():
+               return jsonify({"error": f"A product with sku {sku} already exists"}), 409
+           # products_list.append(data) replaced with the below three-four lines
+           prod = Product(name=body['name'], buying_price=body['buying_price'], selling_price=body['selling_price'], sku=sku)
+           db.session.add(prod)
+           db.session.flush()
+           # new products start with an empty stock ledger row
+           db.session.add(Stock(product_id=prod.id, quantity=0))
+           bump_versions("products", "stock")
+           db.session.commit()
+           current_app.extensions["dashboard_cache"].clear()
+           cache_product(db.session, prod)
+           data["id"] = prod.id
+           return jsonify(data),201
+    else:
+        error = {"error": "Method not allowed"}
+        return jsonify(error), 405
+    
+# Catalog sync: { "products": [ { "sku": "TEA-500", "name": "Tea 500g", "buying_price": 2, "selling_price": 5 }, ... ] }
+# New skus are inserted, known ones get the new name and prices. All or nothing:
+# if any item is invalid nothing changes and every bad item is reported.
+@bp.route("/api/products/bulk", methods=["POST"])
+@jwt_required()
+def bulk_upsert_products():
+    data = request.get_json(silent=True)
+    items = data.get("products") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "products must be a non-empty list"}), 400
+
+    rows, error_count, errors = validate_catalog(items)
+    if error_count:
+        return jsonify({
+            "error": f"{error_count} invalid products, nothing changed",
+            "error_count": error_count,
+            "errors": errors
+        }), 422
+
+    try:
+        counts = upsert_products(rows)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    current_app.extensions["dashboard_cache"].clear()
+    current_app.extensions["product_catalog"].clear()
+
+    return jsonify({"message": f"{len(rows)} products synced successfully!", **counts}), 200
@@ -0,0 +1,59 @@
+#payments routes - M-Pesa STK pushes and the Daraja callback
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required
+from utilities.schemas import Schema, Int, Number, String, error_body
+from mpesa_jobs import QueueFull
+from mpesa_callbacks import parse_stk_callback
+
+bp = Blueprint("payments", __name__)
+
+STK_PUSH_BODY = Schema({"amount": Number(), "phone_number": String(numbers=True), "sale_id": Int(required=False)})
+
+
+@bp.route("/api/mpesa/callback", methods=["GET", "POST"])
+def mpesa_callback():
+    row = parse_stk_callback(request.get_json(silent=True))
+    if row is None:
+        return {"error": "Not an STK callback"}, 400
+
+    # Tell the STK job it is done so its status polling stops, and link the sale it was for
+    job = current_app.extensions["stk_queue"].complete_from_callback(row["checkout_request_id"], row["result_code"], row["result_desc"])
+    if job is not None:
+        row["sale_id"] = job.sale_id
+
+    # Acknowledge only once the payment is committed; if it isn't, Safaricom retries
+    try:
+        current_app.extensions["callback_batcher"].submit(row).result(timeout=current_app.config["MPESA_CALLBACK_ACK_TIMEOUT_SECONDS"])
+    except Exception:
+        return {"error": "Callback not saved, retry"}, 500
+
+    return {"message": "Callback received"}, 200
+
+
+@bp.route("/api/mpesa/stkpush", methods=["POST"])
+@jwt_required()
+def stk_push():
+    data, errors = STK_PUSH_BODY.validate(request.get_json(silent=True))
+    if errors:
+        return jsonify(error_body(errors)), 400
+
+    try:
+        job = current_app.extensions["stk_queue"].submit({"amount": data["amount"], "phone_number": data["phone_number"]}, sale_id=data.get("sale_id"))
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify(job.to_dict()), 202
+
+@bp.route("/api/mpesa/stkpush/stats", methods=["GET"])
+@jwt_required()
+def stk_push_stats():
+    stats = current_app.extensions["stk_queue"].stats()
+    stats["callbacks"] = current_app.extensions["callback_batcher"].stats()
+    return jsonify(stats), 200
+
+@bp.route("/api/mpesa/stkpush/<job_id>", methods=["GET"])
+@jwt_required()
+def stk_push_status(job_id):
+    job = current_app.extensions["stk_queue"].get(job_id)
+    if job is None:
+        return jsonify({"error": "STK push job not found"}), 404
+    return jsonify(job.to_dict()), 200
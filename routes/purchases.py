@@ -0,0 +1,157 @@
+#purchases routes - purchase pages, restocking (single and from supplier files) and the purchases export
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required
+from sqlalchemy import select, tuple_
+from models import db, Product, Purchase
+from utilities.validators import is_int
+from utilities.schemas import Schema, Int, Number, error_body
+from utilities.stock import adjust_stock
+from utilities.pagination import parse_limit, parse_date, decode_cursor, encode_cursor, add_next_page_headers
+from utilities.serialization import format_datetimes
+from utilities.versions import bump_versions
+from utilities.bulk_import import IMPORT_FORMATS, detect_format, read_records, validate_records, import_purchases
+from utilities.exports import (
+    PURCHASE_COLUMNS, parse_export_args, stream_rows, purchases_query, purchases_csv_rows, purchases_records, export_response
+)
+
+bp = Blueprint("purchases", __name__)
+
+PURCHASE_BODY = Schema({"product_id": Int(), "quantity": Number()})
+
+
+@bp.route("/api/purchases", methods=["GET", "POST"])
+@jwt_required()
+def purchases():
+    if request.method == "GET":
+        # ?limit=100&cursor=<X-Next-Cursor>&product_id=3&from=2025-01-01&to=2025-01-31
+        try:
+            limit = parse_limit(request.args.get("limit"))
+            cursor = decode_cursor(request.args.get("cursor"))
+            date_from = parse_date(request.args.get("from"), "from")
+            date_to = parse_date(request.args.get("to"), "to", end=True)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        product_id = request.args.get("product_id")
+        if product_id is not None and not is_int(product_id):
+            return jsonify({"error": "product_id must be an int"}), 400
+
+        # purchases and their products in one SELECT, as plain rows (no ORM objects)
+        query = (
+            select(
+                Purchase.id, Purchase.product_id, Purchase.quantity, Purchase.created_at,
+                Product.id.label("p_id"), Product.name, Product.buying_price, Product.selling_price
+            )
+            .outerjoin(Product, Product.id == Purchase.product_id)
+            .order_by(Purchase.created_at.desc(), Purchase.id.desc())
+            .limit(limit)
+        )
+        if product_id is not None:
+            query = query.where(Purchase.product_id == int(product_id))
+        if date_from is not None:
+            query = query.where(Purchase.created_at >= date_from)
+        if date_to is not None:
+            query = query.where(Purchase.created_at < date_to)
+        if cursor is not None:
+            query = query.where(tuple_(Purchase.created_at, Purchase.id) < tuple_(*cursor))
+        rows = db.session.execute(query).all()
+
+        # same shape as Purchase.to_dict(), timestamps formatted in one pass
+        created = format_datetimes([r.created_at for r in rows])
+        purchases = [
+            {
+                "id": r.id,
+                "product_id": r.product_id,
+                "quantity": r.quantity,
+                "created_at": created_at,
+                "product": {
+                    "id": r.p_id,
+                    "name": r.name,
+                    "buying_price": r.buying_price,
+                    "selling_price": r.selling_price
+                } if r.p_id is not None else None
+            }
+            for r, created_at in zip(rows, created)
+        ]
+
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        return add_next_page_headers(jsonify(purchases), request, next_cursor), 200
+    elif request.method == "POST":
+        data_p = request.get_json(silent=True)
+        body, errors = PURCHASE_BODY.validate(data_p)
+        if errors:
+            return jsonify(error_body(errors)), 400
+
+        purch = Purchase(product_id=body["product_id"], quantity=body["quantity"])
+        adjust_stock(purch.product_id, purch.quantity)
+        db.session.add(purch)
+        bump_versions("purchases", "stock")
+        db.session.commit()
+        current_app.extensions["dashboard_cache"].clear()
+        data_p["id"] = purch.id
+        data_p["created_at"] = purch.created_at.strftime("%Y-%m-%d %H:%M")
+        # purchases_list.append(purchase) # commented out replaced by above five lines
+    
+        return jsonify(data_p), 201
+    else:
+        return jsonify({"error": "Method not allowed"}), 405
+    
+# Restock from a supplier file: product_id,quantity rows as CSV (with a header) or NDJSON,
+# uploaded as multipart "file" or as the raw request body. All rows go in one
+# transaction; if any row is invalid nothing is imported and every bad row is reported.
+@bp.route("/api/purchases/import", methods=["POST"])
+@jwt_required()
+def import_purchases_file():
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename, mimetype = upload.stream, upload.filename, upload.mimetype
+    else:
+        stream, filename, mimetype = request.stream, None, request.mimetype
+    fmt = detect_format(request.args.get("format"), filename, mimetype)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(IMPORT_FORMATS)}"}), 400
+
+    try:
+        rows, error_count, errors = validate_records(read_records(stream, fmt))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": str(e)}), 400
+    if error_count:
+        return jsonify({
+            "error": f"{error_count} invalid rows, nothing imported",
+            "error_count": error_count,
+            "errors": errors
+        }), 422
+    if not rows:
+        return jsonify({"error": "No purchase rows provided"}), 400
+
+    try:
+        totals = import_purchases(rows)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    current_app.extensions["dashboard_cache"].clear()
+
+    return jsonify({
+        "message": f"{len(rows)} purchases imported successfully!",
+        "imported": len(rows),
+        "products": len(totals)
+    }), 201
+
+
+# Full history exports for accounting, streamed oldest first.
+# ?format=csv|ndjson&from=2025-01-01&to=2025-12-31&product_id=3, gzipped for Accept-Encoding: gzip
+@bp.route("/api/purchases/export", methods=["GET"])
+@jwt_required()
+def export_purchases():
+    try:
+        fmt, date_from, date_to = parse_export_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    product_id = request.args.get("product_id")
+    if product_id is not None and not is_int(product_id):
+        return jsonify({"error": "product_id must be an int"}), 400
+
+    rows = stream_rows(purchases_query(date_from, date_to, int(product_id) if product_id is not None else None))
+    return export_response("purchases", fmt, PURCHASE_COLUMNS, rows, purchases_csv_rows, purchases_records)
@@ -0,0 +1,83 @@
+#reporting routes - dashboard, stock, sales analytics and the metrics scrape
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request, Response, current_app, g
+from flask_jwt_extended import jwt_required
+from utilities.validators import is_int
+from utilities.pagination import parse_date
+from utilities.database import read_session
+from utilities.versions import conditional
+from utilities.catalog import all_products
+from utilities.rollups import sales_summary, GRANULARITIES
+from utilities.reports import stock_query, stock_payload, dashboard_query, dashboard_payload
+
+bp = Blueprint("reporting", __name__)
+
+# Longest range GET /api/analytics/sales serves by the hour
+MAX_HOURLY_DAYS = 31
+
+
+@bp.route("/",methods=['GET'])
+def home():
+     res = {"flask api version": "2.0.0"}
+     return jsonify(res), 200
+
+
+# Dashboard payload, cached in app.extensions["dashboard_cache"]; read from the read bind
+def build_dashboard():
+    return dashboard_payload(read_session().execute(dashboard_query()))
+
+@bp.route("/api/dashboard", methods=["GET"])
+@jwt_required()
+@conditional("dashboard", "products", "stock", "sales")
+def dashboard():
+    if request.method == "GET":
+        # keyed by the ETag, so a write on another worker is never answered from this cache
+        return jsonify(current_app.extensions["dashboard_cache"].get_or_compute(g.etag, build_dashboard)), 200
+    else:
+        error = {"error": "Method not allowed"}
+        return jsonify(error), 405
+
+
+# Sales totals per hour/day/week/month, served from the rollup tables
+@bp.route("/api/analytics/sales", methods=["GET"])
+@jwt_required()
+def sales_analytics():
+    # ?from=2025-01-01&to=2025-01-31&granularity=hour|day|week|month&product_id=3
+    # (defaults: the last 30 days, by day)
+    granularity = request.args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    try:
+        date_to = parse_date(request.args.get("to"), "to", end=True) or datetime.now()
+        date_from = parse_date(request.args.get("from"), "from") or date_to - timedelta(days=30)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if date_from >= date_to:
+        return jsonify({"error": "from must be before to"}), 400
+    if granularity == "hour" and date_to - date_from > timedelta(days=MAX_HOURLY_DAYS):
+        return jsonify({"error": f"hourly ranges are limited to {MAX_HOURLY_DAYS} days"}), 400
+    product_id = request.args.get("product_id")
+    if product_id is not None and not is_int(product_id):
+        return jsonify({"error": "product_id must be an int"}), 400
+
+    summary = sales_summary(
+        date_from, date_to, granularity,
+        product_id=int(product_id) if product_id is not None else None,
+        session=read_session()
+    )
+    return jsonify(summary), 200
+
+
+@bp.route("/api/stock", methods=["GET"])
+@conditional("stock", "products", "stock")
+def stock_summary():
+    # --- Available stock per product, served from the stock ledger and the catalog cache ---
+    session = read_session()
+    stock = stock_payload(all_products(session), session.execute(stock_query()))
+    return jsonify(stock), 200
+
+
+# Prometheus scrape endpoint
+@bp.route("/api/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(current_app.extensions["metrics"].render(), mimetype="text/plain; version=0.0.4")
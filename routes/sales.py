@@ -0,0 +1,162 @@
+#sales routes - sale pages, single and basket sales, and the sales export
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required
+from sqlalchemy import insert
+from models import db, Sale, SalesDetails
+from utilities.schemas import Schema, List, Int, Number, error_body
+from utilities.stock import reserve_stock, OutOfStock
+from utilities.pagination import parse_limit, parse_date, decode_cursor, add_next_page_headers
+from utilities.database import read_session
+from utilities.versions import bump_versions
+from utilities.rollups import record_sale
+from utilities.catalog import products_by_id
+from utilities.reports import sales_page_query, sales_page_product_ids, sales_page_payload
+from utilities.exports import SALES_COLUMNS, parse_export_args, stream_rows, sales_query, sales_csv_rows, sales_records, export_response
+
+bp = Blueprint("sales", __name__)
+
+SALE_BODY = Schema({"product_id": Int(), "quantity": Number()})
+BASKET_BODY = Schema({"items": List(SALE_BODY, min_items=1)})
+
+
+@bp.route("/api/sales", methods=["GET", "POST"])
+@jwt_required()
+def sales():
+    if request.method == "GET":
+        # ?limit=100&cursor=<X-Next-Cursor of previous page>&from=2025-01-01&to=2025-01-31
+        try:
+            limit = parse_limit(request.args.get("limit"))
+            cursor = decode_cursor(request.args.get("cursor"))
+            date_from = parse_date(request.args.get("from"), "from")
+            date_to = parse_date(request.args.get("to"), "to", end=True)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        session = read_session()
+        rows = session.execute(sales_page_query(limit, cursor, date_from, date_to)).all()
+        products = products_by_id(sales_page_product_ids(rows), session)
+        response, next_cursor = sales_page_payload(rows, limit, products)
+        return add_next_page_headers(jsonify(response), request, next_cursor), 200
+        
+
+    elif request.method == "POST":
+        data = request.get_json(silent=True)
+
+        # --- Handle bulk sales: { "items": [ { "product_id": 1, "quantity": 2 }, ... ] } ---
+        if isinstance(data, dict) and "items" in data:
+            # --- Validate every line before touching the database, all errors at once ---
+            body, errors = BASKET_BODY.validate(data)
+            if errors:
+                return jsonify(error_body(errors)), 400
+            items = body["items"]  # [{"product_id": int, "quantity": float}, ...]
+
+            try:
+                # --- Merge repeated products so each is checked against its basket total ---
+                wanted = {}
+                for item in items:
+                    wanted[item["product_id"]] = wanted.get(item["product_id"], 0) + item["quantity"]
+
+                # --- Check and take stock for the whole basket in one step per product ---
+                try:
+                    stock = reserve_stock(wanted)
+                except OutOfStock as e:
+                    db.session.rollback()
+                    if e.available <= 0:
+                        return jsonify({"error": f"No stock available for product {e.product_id}"}), 400
+                    return jsonify({"error": f"Only {e.available} items left for product {e.product_id}"}), 400
+
+                new_sale = Sale()
+                db.session.add(new_sale)
+                db.session.flush()  # get new_sale.id
+
+                # --- Create all sale details in one bulk insert ---
+                db.session.execute(
+                    insert(SalesDetails),
+                    [{"sale_id": new_sale.id, **item} for item in items]
+                )
+
+                # available_stock per line is what was left before that line was taken
+                responses = []
+                for item in items:
+                    product_id, quantity = item["product_id"], item["quantity"]
+                    responses.append({
+                        "product_id": product_id,
+                        "quantity": quantity,
+                        "available_stock": stock[product_id]
+                    })
+                    stock[product_id] -= quantity
+
+                record_sale(wanted, new_sale.created_at)
+                bump_versions("sales", "stock")
+                db.session.commit()
+                current_app.extensions["dashboard_cache"].clear()
+
+                return jsonify({
+                    "message": f"{len(items)} sales recorded successfully!",
+                    "sale_id": new_sale.id,
+                    "items": responses
+                }), 201
+
+            except Exception as e:
+                db.session.rollback()
+                return jsonify({"error": str(e)}), 500
+
+        # --- Handle single sale: { "product_id": 1, "quantity": 2 } ---
+        else:
+            body, errors = SALE_BODY.validate(data)
+            if errors:
+                return jsonify(error_body(errors)), 400
+            product_id = body["product_id"]
+            quantity = body["quantity"]
+
+            try:
+                available_stock = reserve_stock({product_id: quantity})[product_id]
+            except OutOfStock as e:
+                db.session.rollback()
+                if e.available <= 0:
+                    return jsonify({"error": "No stock available"}), 400
+                return jsonify({"error": f"Only {e.available} items left"}), 400
+
+            try:
+                new_sale = Sale()
+                db.session.add(new_sale)
+                db.session.flush()
+
+                sale_detail = SalesDetails(
+                    sale_id=new_sale.id,
+                    product_id=product_id,
+                    quantity=quantity
+                )
+                db.session.add(sale_detail)
+                record_sale({product_id: quantity}, new_sale.created_at)
+                bump_versions("sales", "stock")
+                db.session.commit()
+                current_app.extensions["dashboard_cache"].clear()
+
+                return jsonify({
+                    "id": new_sale.id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "created_at": new_sale.created_at.strftime("%Y-%m-%d %H:%M"),
+                    "available_stock": available_stock
+                }), 201
+            except Exception as e:
+                db.session.rollback()
+                return jsonify({"error": str(e)}), 500
+
+    else:
+        return jsonify({"error": "Invalid request format"}), 400
+
+
+# Full history exports for accounting, streamed oldest first.
+# ?format=csv|ndjson&from=2025-01-01&to=2025-12-31, gzipped for Accept-Encoding: gzip
+@bp.route("/api/sales/export", methods=["GET"])
+@jwt_required()
+def export_sales():
+    try:
+        fmt, date_from, date_to = parse_export_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = stream_rows(sales_query(date_from, date_to))
+    return export_response("sales", fmt, SALES_COLUMNS, rows, sales_csv_rows, sales_records)
@@ -0,0 +1,80 @@
+#JWT blocklist - revoked token ids (jti) kept in memory until the token would have expired
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+from models import db, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+
+# Checking a token is a dict lookup. Expired entries are dropped at most once per
+# `sync_interval` seconds, since flask-jwt-extended rejects expired tokens anyway.
+# With shared=True revocations are also written to the revoked_tokens table and
+# every worker pulls new rows from it at most once per `sync_interval` seconds,
+# so a logout reaches the other workers within that interval.
+# Rows are picked up by created_at, re-reading the last `overlap` seconds each time:
+# a row's created_at (and id) is taken before its transaction commits, so a slow
+# commit can become visible after newer rows were already read.
+class TokenBlocklist:
+    def __init__(self, shared=False, sync_interval=2.0, overlap=60.0):
+        self.shared = shared
+        self.sync_interval = sync_interval
+        self.overlap = timedelta(seconds=overlap)
+        self._revoked = {}  # jti -> exp (unix seconds)
+        self._next_maintenance = 0.0
+        self._synced_at = None  # datetime of the last sync, None = never synced
+        self._maintenance_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def revoke(self, jti, exp):
+        self._revoked[jti] = exp
+        if self.shared:
+            db.session.add(RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(exp)))
+            # expired rows are of no use to anyone, clear them while we are writing
+            db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.now()))
+            db.session.commit()
+
+    def is_revoked(self, jti):
+        if self.maintenance_due():
+            self.maintain()
+        return jti in self._revoked
+
+    def maintenance_due(self):
+        return time.time() >= self._next_maintenance
+
+    # Drop expired entries and pull other workers' revocations (a query when shared).
+    # One thread maintains at a time; the others keep answering from the dict meanwhile.
+    def maintain(self):
+        if self._maintenance_lock.acquire(blocking=False):
+            try:
+                self._maintain(time.time())
+            finally:
+                self._maintenance_lock.release()
+
+    def _maintain(self, now):
+        self._next_maintenance = now + self.sync_interval
+        # a copy: revoke() may add entries from other threads while we look
+        expired = [jti for jti, exp in list(self._revoked.items()) if exp <= now]
+        for jti in expired:
+            self._revoked.pop(jti, None)
+        if self.shared:
+            try:
+                self._sync()
+            except Exception as e:
+                # keep serving with what we have; the next interval tries again
+                db.session.rollback()
+                logger.warning("JWT blocklist sync failed: %s", e)
+
+    # Pull unexpired revocations other workers wrote since the last sync (less the overlap)
+    def _sync(self):
+        started = datetime.now()
+        query = db.select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > started)
+        if self._synced_at is not None:
+            query = query.where(RevokedToken.created_at >= self._synced_at - self.overlap)
+        for row in db.session.execute(query):
+            self._revoked[row.jti] = row.expires_at.timestamp()
+        self._synced_at = started
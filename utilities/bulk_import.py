@@ -0,0 +1,113 @@
+#bulk purchase import - parse and validate a supplier file in one pass, load it in one transaction
+import io
+import csv
+import json
+from datetime import datetime
+from sqlalchemy import select, insert
+from models import db, Product, Purchase
+from utilities.schemas import Schema, Int, Number, error_text
+from utilities.stock import get_available_stock_many, adjust_stock_many
+from utilities.versions import bump_versions
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_COLUMNS = ("product_id", "quantity")
+
+# Errors listed in the report (the count covers all of them), and rows per INSERT
+# batch where COPY isn't available
+MAX_REPORTED_ERRORS = 1000
+INSERT_BATCH_SIZE = 5000
+
+# One row of a supplier file: the body POST /api/purchases takes
+PURCHASE_RECORD = Schema({"product_id": Int(), "quantity": Number()})
+
+
+# Guess the format from ?format=, the upload's file name or its content type
+def detect_format(explicit, filename, mimetype):
+    if explicit:
+        return explicit
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or mimetype in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return "csv"
+
+
+# (row number, record) for each line of a binary upload. Row numbers are line
+# numbers in the file, so a CSV's first data row is 2. Unreadable lines give
+# (row number, None).
+def read_records(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        missing = [c for c in IMPORT_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV header must include: {', '.join(IMPORT_COLUMNS)}")
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+
+
+# Validate every record against PURCHASE_RECORD, plus that the product exists.
+# Returns ([(product_id, quantity)], error_count, [{"row", "error"}]) with a row's
+# first problem as its error.
+def validate_records(records):
+    known = set(db.session.execute(select(Product.id)).scalars())
+    rows = []
+    errors = []
+    error_count = 0
+    check = PURCHASE_RECORD.check
+    for number, record in records:
+        if record is None:
+            error = "row is not a JSON object"
+        else:
+            values, record_errors = check(record)
+            if record_errors:
+                error = error_text(record_errors[0], "row")
+            elif values["product_id"] not in known:
+                error = f"product {values['product_id']} does not exist"
+            else:
+                rows.append((values["product_id"], values["quantity"]))
+                continue
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": number, "error": error})
+    return rows, error_count, errors
+
+
+# COPY the rows into purchases on Postgres (psycopg2), batched INSERTs elsewhere.
+# Runs on the session's connection, so it commits or rolls back with the rest.
+def _load(rows, created_at):
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        stamp = created_at.isoformat(" ")
+        data = io.StringIO("".join(f"{product_id}\t{quantity!r}\t{stamp}\n" for product_id, quantity in rows))
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert("COPY purchases (product_id, quantity, created_at) FROM STDIN", data)
+        return
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(insert(Purchase), [
+            {"product_id": product_id, "quantity": quantity, "created_at": created_at}
+            for product_id, quantity in rows[start:start + INSERT_BATCH_SIZE]
+        ])
+
+
+# Insert every row as a purchase and add them to the stock ledger, one transaction.
+# Returns {product_id: total quantity added}.
+def import_purchases(rows):
+    totals = {}
+    for product_id, quantity in rows:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+
+    get_available_stock_many(totals.keys())  # seeds missing ledger rows before the insert
+    _load(rows, datetime.now())
+    adjust_stock_many(totals)
+    bump_versions("purchases", "stock")
+    db.session.commit()
+    return totals
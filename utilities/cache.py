@@ -0,0 +1,68 @@
+#small in-process caches shared by the read-heavy routes
+import time
+import threading
+
+
+# Key -> value cache whose entries expire after `ttl` seconds, holding at most
+# `max_size` of them (the oldest go first).
+# Writers call clear()/invalidate() after committing so readers never wait out the TTL.
+class TTLCache:
+    def __init__(self, ttl, max_size=64):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        # bumped by every invalidation so a slow compute can't store pre-write data
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    # Return the cached value, computing it once when missing or expired.
+    # Only one thread computes, the others wait for its result.
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._compute_lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            generation = self._generation
+            value = compute()
+            with self._lock:
+                if generation == self._generation:
+                    self._store(key, value)
+            return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    # Caller holds self._lock. Expired entries are dropped first so per-version keys
+    # don't pile up, then the oldest ones while the cache is full.
+    def _store(self, key, value):
+        now = time.monotonic()
+        entries = {k: e for k, e in self._entries.items() if e[0] > now and k != key}
+        while len(entries) >= self.max_size:
+            del entries[next(iter(entries))]
+        entries[key] = (now + self.ttl, value)
+        self._entries = entries
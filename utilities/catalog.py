@@ -0,0 +1,183 @@
+#product catalog cache - id -> name/prices, so the stock and sales reads don't join products
+import time
+import threading
+from collections import OrderedDict, namedtuple
+from flask import g, current_app
+from sqlalchemy import select
+from models import Product, TableVersion
+
+CatalogEntry = namedtuple("CatalogEntry", "name buying_price selling_price")
+
+# Ids per IN (...) when loading misses
+LOAD_BATCH = 1000
+
+
+# Bounded (least recently used entries go first), one per app in
+# app.extensions["product_catalog"].
+#
+# Writes in this worker go through put() (POST /api/products) or clear() (catalog
+# sync). Writes anywhere bump the "products" counter in table_versions, and sync()
+# drops every entry once it sees the counter move, so other workers stop serving a
+# changed product as soon as they next look: routes behind @conditional sync with the
+# version they just read, the others look it up at most every `sync_interval` seconds.
+class ProductCatalog:
+    def __init__(self, max_size=10000, sync_interval=2.0):
+        self.max_size = max_size
+        self.sync_interval = sync_interval
+        self._entries = OrderedDict()
+        self._complete = False  # every product is in _entries (see store_all)
+        self._lock = threading.Lock()
+        # bumped by every write/invalidation so a slow load can't store pre-write rows
+        self._generation = 0
+        self._version = None
+        self._next_sync = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- cross-worker invalidation ---
+
+    def sync_due(self):
+        return time.monotonic() >= self._next_sync
+
+    # `version`: the "products" counter as just read from table_versions
+    def sync(self, version):
+        with self._lock:
+            self._next_sync = time.monotonic() + self.sync_interval
+            if self._version is not None and version != self._version:
+                self._drop()
+            self._version = version
+
+    # --- reads ---
+
+    # ({id: CatalogEntry} cached, [ids to load], generation to hand to store())
+    def lookup(self, ids):
+        found = {}
+        missing = []
+        with self._lock:
+            entries = self._entries
+            for product_id in ids:
+                entry = entries.get(product_id)
+                if entry is None:
+                    missing.append(product_id)
+                else:
+                    entries.move_to_end(product_id)
+                    found[product_id] = entry
+            self.hits += len(found)
+            self.misses += len(missing)
+            return found, missing, self._generation
+
+    # ({id: CatalogEntry} for every product, generation), or (None, generation) when
+    # they aren't all cached: load all_products_query() and hand it to store_all()
+    def all(self):
+        with self._lock:
+            if not self._complete:
+                self.misses += 1
+                return None, self._generation
+            self.hits += 1
+            return dict(self._entries), self._generation
+
+    # Cache rows of catalog_query()/all_products_query() loaded since lookup()/all()
+    # returned `generation`; returns them as {id: CatalogEntry} either way
+    def store(self, rows, generation):
+        loaded = {row.id: CatalogEntry(row.name, row.buying_price, row.selling_price) for row in rows}
+        with self._lock:
+            if generation == self._generation:
+                self._entries.update(loaded)
+                self._evict()
+        return loaded
+
+    # store() for every product: afterwards all() is served from memory, if they fit
+    def store_all(self, rows, generation):
+        loaded = {row.id: CatalogEntry(row.name, row.buying_price, row.selling_price) for row in rows}
+        with self._lock:
+            if generation == self._generation and len(loaded) <= self.max_size:
+                self._entries = OrderedDict(loaded)
+                self._complete = True
+        return loaded
+
+    # --- writes in this worker ---
+
+    # Write-through of a committed product. `version` is the "products" counter read
+    # after the commit: one more than the last one seen means no other worker wrote
+    # in between, so nothing else needs dropping.
+    def put(self, product_id, entry, version=None):
+        with self._lock:
+            self._generation += 1
+            if version is not None and self._version is not None and version != self._version + 1:
+                self._drop()
+            if version is not None:
+                self._version = version
+            self._entries[product_id] = entry
+            self._entries.move_to_end(product_id)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._drop()
+
+    # --- internals, called with the lock held ---
+
+    def _drop(self):
+        self._generation += 1
+        self._entries.clear()
+        self._complete = False
+        self.invalidations += 1
+
+    def _evict(self):
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._complete = False
+
+
+def catalog_query(ids):
+    return select(Product.id, Product.name, Product.buying_price, Product.selling_price).where(Product.id.in_(ids))
+
+
+def all_products_query():
+    return select(Product.id, Product.name, Product.buying_price, Product.selling_price)
+
+
+def products_version_query():
+    return select(TableVersion.version).where(TableVersion.name == "products")
+
+
+def _sync(catalog, session):
+    # @conditional already read the counter for this request
+    version = g.get("table_versions", {}).get("products")
+    if version is None and catalog.sync_due():
+        version = session.execute(products_version_query()).scalar() or 0
+    if version is not None:
+        catalog.sync(version)
+
+
+# {id: CatalogEntry} for `ids`, misses loaded from `session`
+def products_by_id(ids, session):
+    catalog = current_app.extensions["product_catalog"]
+    _sync(catalog, session)
+    found, missing, generation = catalog.lookup(ids)
+    for start in range(0, len(missing), LOAD_BATCH):
+        found.update(catalog.store(session.execute(catalog_query(missing[start:start + LOAD_BATCH])), generation))
+    return found
+
+
+# {id: CatalogEntry} for every product
+def all_products(session):
+    catalog = current_app.extensions["product_catalog"]
+    _sync(catalog, session)
+    products, generation = catalog.all()
+    if products is None:
+        products = catalog.store_all(session.execute(all_products_query()), generation)
+    return products
+
+
+# After committing a new/changed product: cache it in this worker
+def cache_product(session, product):
+    current_app.extensions["product_catalog"].put(
+        product.id,
+        CatalogEntry(product.name, product.buying_price, product.selling_price),
+        version=session.execute(products_version_query()).scalar()
+    )
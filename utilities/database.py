@@ -0,0 +1,96 @@
+#database engines - pool settings from config and an optional read-replica bind
+from flask import g, current_app
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from models import db
+
+READ_BIND = "read"
+
+# asyncio drivers for the async read path (asgi.py)
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+# SQLAlchemy create_engine() options for one database URI, built from the DB_* config keys.
+# SQLite has no server-side pool to size and no statement timeout, so it only gets pre-ping.
+def engine_options(uri, config):
+    options = {"pool_pre_ping": config["DB_POOL_PRE_PING"]}
+    backend = make_url(uri).get_backend_name()
+    if backend == "sqlite":
+        return options
+
+    options.update(
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_recycle=config["DB_POOL_RECYCLE"]
+    )
+    if backend == "postgresql" and config["DB_STATEMENT_TIMEOUT_MS"]:
+        # set per connection, so a runaway query is cancelled by the server
+        options["connect_args"] = {"options": f"-c statement_timeout={int(config['DB_STATEMENT_TIMEOUT_MS'])}"}
+    return options
+
+
+# Fill in engine options (explicit SQLALCHEMY_ENGINE_OPTIONS still win), add the
+# "read" bind when SQLALCHEMY_READ_DATABASE_URI is set, then initialise Flask-SQLAlchemy.
+# `db` is shared by every app: init_app() registers a metadata per bind key on it, and
+# db.create_all() on an app without a read bind would then fail on "read". No model
+# lives on the read bind (it holds the same tables), so that metadata is dropped again.
+def init_database(app):
+    config = app.config
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **engine_options(config["SQLALCHEMY_DATABASE_URI"], config),
+        **(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    }
+
+    read_uri = config.get("SQLALCHEMY_READ_DATABASE_URI")
+    if read_uri:
+        binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+        binds[READ_BIND] = {"url": read_uri, **engine_options(read_uri, config)}
+        config["SQLALCHEMY_BINDS"] = binds
+
+    db.init_app(app)
+    if READ_BIND in db.metadatas and not db.metadatas[READ_BIND].tables:
+        del db.metadatas[READ_BIND]
+    app.teardown_appcontext(_close_read_session)
+
+
+# Session for read-only queries. Goes to the read bind when one is configured
+# (one session per app context, closed at teardown), otherwise it is db.session.
+# Replicas lag the primary a little: anything that must see a write the same
+# request made has to keep using db.session.
+def read_session():
+    if READ_BIND not in current_app.config.get("SQLALCHEMY_BINDS", {}):
+        return db.session
+    if "read_session" not in g:
+        g.read_session = Session(bind=db.engines[READ_BIND])
+    return g.read_session
+
+
+def _close_read_session(exc):
+    session = g.pop("read_session", None)
+    if session is not None:
+        session.close()
+
+
+# The same database through its asyncio driver: postgresql:// -> postgresql+asyncpg://
+def async_database_uri(uri):
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"no async driver configured for {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+# AsyncEngine for the async read path: ASYNC_DATABASE_URI when set, otherwise the
+# read replica (or the primary) through its async driver, with the same DB_* pool settings.
+def init_async_engine(config):
+    # only asgi.py needs asyncio support, WSGI workers never load it
+    from sqlalchemy.ext.asyncio import create_async_engine
+    uri = config.get("ASYNC_DATABASE_URI") or async_database_uri(
+        config.get("SQLALCHEMY_READ_DATABASE_URI") or config["SQLALCHEMY_DATABASE_URI"]
+    )
+    options = engine_options(uri, config)
+    if make_url(uri).get_driver_name() == "asyncpg" and config["DB_STATEMENT_TIMEOUT_MS"]:
+        # asyncpg takes server settings instead of libpq's "options"
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(int(config["DB_STATEMENT_TIMEOUT_MS"]))}}
+    return create_async_engine(uri, **options)
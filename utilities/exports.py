@@ -0,0 +1,208 @@
+#streaming CSV / NDJSON exports - rows go from a server-side cursor to the client in batches, never all in memory
+import csv
+import io
+import zlib
+from itertools import groupby
+from flask import current_app, request, stream_with_context
+from sqlalchemy import select
+from models import db, Product, Sale, SalesDetails, Purchase
+from utilities.database import READ_BIND
+from utilities.pagination import parse_date
+from utilities.serialization import encode_json
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+# Rows fetched per round trip, and roughly how many bytes are gathered before a chunk goes out
+EXPORT_BATCH_SIZE = 2000
+CHUNK_BYTES = 64 * 1024
+
+SALES_COLUMNS = ["sale_id", "created_at", "product_id", "product_name", "quantity", "unit_selling_price", "subtotal"]
+PURCHASE_COLUMNS = ["id", "created_at", "product_id", "product_name", "quantity", "buying_price", "selling_price"]
+
+
+# Exports are long reads, send them to the replica when there is one
+def _engine():
+    if READ_BIND in current_app.config.get("SQLALCHEMY_BINDS", {}):
+        return db.engines[READ_BIND]
+    return db.engine
+
+
+# Rows of `query`, oldest first, through a server-side cursor (Postgres) fetching
+# `batch_size` rows at a time. Uses its own connection so the export doesn't hold
+# the request's session open, and returns it to the pool when the stream ends.
+def stream_rows(query, batch_size=EXPORT_BATCH_SIZE):
+    with _engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for partition in result.partitions():
+            yield from partition
+
+
+def _filter_range(query, column, date_from, date_to):
+    if date_from is not None:
+        query = query.where(column >= date_from)
+    if date_to is not None:
+        query = query.where(column < date_to)
+    return query
+
+
+# One row per sale line, ordered by sale (created_at, id) so lines of a sale are consecutive
+def sales_query(date_from=None, date_to=None):
+    query = (
+        select(
+            Sale.id.label("sale_id"), Sale.created_at, SalesDetails.product_id,
+            Product.name.label("product_name"), SalesDetails.quantity, Product.selling_price
+        )
+        .join(SalesDetails, SalesDetails.sale_id == Sale.id)
+        .join(Product, Product.id == SalesDetails.product_id)
+        .order_by(Sale.created_at, Sale.id, SalesDetails.id)
+    )
+    return _filter_range(query, Sale.created_at, date_from, date_to)
+
+
+def purchases_query(date_from=None, date_to=None, product_id=None):
+    query = (
+        select(
+            Purchase.id, Purchase.created_at, Purchase.product_id, Product.name.label("product_name"),
+            Purchase.quantity, Product.buying_price, Product.selling_price
+        )
+        .outerjoin(Product, Product.id == Purchase.product_id)
+        .order_by(Purchase.created_at, Purchase.id)
+    )
+    if product_id is not None:
+        query = query.where(Purchase.product_id == product_id)
+    return _filter_range(query, Purchase.created_at, date_from, date_to)
+
+
+def _timestamp(value):
+    return value.strftime("%Y-%m-%d %H:%M") if value is not None else None
+
+
+# --- record builders: (csv_rows, ndjson_records) from database rows ---
+
+def sales_csv_rows(rows):
+    for r in rows:
+        yield (r.sale_id, _timestamp(r.created_at), r.product_id, r.product_name,
+               r.quantity, r.selling_price, r.quantity * r.selling_price)
+
+
+# One object per sale, the same shape as GET /api/sales
+def sales_records(rows):
+    for sale_id, lines in groupby(rows, key=lambda r: r.sale_id):
+        items = []
+        created_at = None
+        total = 0
+        for r in lines:
+            created_at = r.created_at
+            subtotal = r.quantity * r.selling_price
+            total += subtotal
+            items.append({
+                "product_id": r.product_id,
+                "product_name": r.product_name,
+                "quantity": r.quantity,
+                "unit_selling_price": r.selling_price,
+                "subtotal": subtotal
+            })
+        yield {"sale_id": sale_id, "created_at": _timestamp(created_at), "total_sale": total, "items": items}
+
+
+def purchases_csv_rows(rows):
+    for r in rows:
+        yield (r.id, _timestamp(r.created_at), r.product_id, r.product_name,
+               r.quantity, r.buying_price, r.selling_price)
+
+
+# The same shape as GET /api/purchases
+def purchases_records(rows):
+    for r in rows:
+        yield {
+            "id": r.id,
+            "product_id": r.product_id,
+            "quantity": r.quantity,
+            "created_at": _timestamp(r.created_at),
+            "product": {
+                "id": r.product_id,
+                "name": r.product_name,
+                "buying_price": r.buying_price,
+                "selling_price": r.selling_price
+            } if r.product_name is not None else None
+        }
+
+
+# --- encoders: iterables of bytes chunks ---
+
+def csv_chunks(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    # the header goes out before the query runs, so clients see bytes straight away
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(records):
+    provider = current_app.json
+    parts = []
+    size = 0
+    for record in records:
+        line = encode_json(provider, record)
+        parts.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_BYTES:
+            yield b"\n".join(parts) + b"\n"
+            parts = []
+            size = 0
+    if parts:
+        yield b"\n".join(parts) + b"\n"
+
+
+# gzip each chunk as it comes; the sync flush sends it now instead of when zlib's buffer fills
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+# (format, from, to) of an export request:
+# ?format=csv|ndjson&from=2025-01-01&to=2025-12-31; ValueError for bad values
+def parse_export_args():
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return (
+        fmt,
+        parse_date(request.args.get("from"), "from"),
+        parse_date(request.args.get("to"), "to", end=True)
+    )
+
+
+# Streamed response for an export: `name` is the download's base name, `rows` the
+# database rows, `to_csv` / `to_records` turn them into CSV rows / NDJSON objects.
+# Gzipped when the client sends Accept-Encoding: gzip.
+def export_response(name, fmt, columns, rows, to_csv, to_records):
+    if fmt == "csv":
+        chunks = csv_chunks(columns, to_csv(rows))
+        mimetype = "text/csv"
+    else:
+        chunks = ndjson_chunks(to_records(rows))
+        mimetype = "application/x-ndjson"
+
+    compress = request.accept_encodings["gzip"] > 0
+    if compress:
+        chunks = gzip_chunks(chunks)
+
+    response = current_app.response_class(stream_with_context(chunks), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{name}.{fmt}"'
+    response.headers["Vary"] = "Accept-Encoding"
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
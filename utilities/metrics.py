@@ -0,0 +1,164 @@
+#per-request timing + SQL instrumentation, exposed in Prometheus text format
+import time
+import logging
+import threading
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from models import db
+
+logger = logging.getLogger("slow_requests")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+# Cumulative histogram with Prometheus-style `le` buckets
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+
+# Records, per route template and method:
+#   - request latency, time spent in the database and the rest (Python + serialization)
+#   - SQL statements per request and response size
+#   - request count by status code
+# SLOW_REQUEST_MS > 0 logs requests slower than that, with the SQL they ran.
+class RequestMetrics:
+    families = (
+        ("http_request_duration_seconds", "Time to handle the request", LATENCY_BUCKETS),
+        ("http_request_db_seconds", "Time spent executing SQL during the request", LATENCY_BUCKETS),
+        ("http_request_app_seconds", "Request time outside the database (Python, serialization)", LATENCY_BUCKETS),
+        ("http_request_sql_statements", "SQL statements executed per request", STATEMENT_BUCKETS),
+        ("http_response_size_bytes", "Response body size", SIZE_BUCKETS),
+    )
+
+    def __init__(self, app=None, slow_request_ms=0):
+        self.slow_request_ms = slow_request_ms
+        self._histograms = {}  # (family, method, route) -> Histogram
+        self._requests = {}    # (method, route, status) -> count
+        self._gauges = []      # (name, help, fn, kind)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.slow_request_ms = app.config.get("SLOW_REQUEST_MS", self.slow_request_ms)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # Extra values read at scrape time, e.g. queue depth (gauge) or cache hits (counter)
+    def add_gauge(self, name, help_text, fn, kind="gauge"):
+        self._gauges.append((name, help_text, fn, kind))
+
+    # --- hooks ---
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_sql = [] if self.slow_request_ms else None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # statements on one connection run one at a time, so a single slot is enough
+        conn.info["metrics_query_started"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("metrics_query_started", None)
+        # background threads (STK queue, callback writer) have no request to charge
+        if started is None or not has_request_context() or "metrics_started" not in g:
+            return
+        elapsed = time.perf_counter() - started
+        g.metrics_sql_count += 1
+        g.metrics_sql_time += elapsed
+        if g.metrics_sql is not None:
+            g.metrics_sql.append((elapsed, statement))
+
+    def _after_request(self, response):
+        if "metrics_started" not in g:
+            return response
+        duration = time.perf_counter() - g.metrics_started
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        method = request.method
+        # a streamed body is still unsent here, measuring it would read the whole stream
+        # into memory first; those count their Content-Length if they set one
+        size = response.content_length if response.is_streamed else response.calculate_content_length()
+        size = size or 0
+
+        with self._lock:
+            self._observe("http_request_duration_seconds", method, route, duration)
+            self._observe("http_request_db_seconds", method, route, g.metrics_sql_time)
+            self._observe("http_request_app_seconds", method, route, max(duration - g.metrics_sql_time, 0))
+            self._observe("http_request_sql_statements", method, route, g.metrics_sql_count)
+            self._observe("http_response_size_bytes", method, route, size)
+            key = (method, route, response.status_code)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+        if self.slow_request_ms and duration * 1000 >= self.slow_request_ms:
+            lines = [f"  {elapsed * 1000:8.2f}ms  {' '.join(statement.split())[:500]}" for elapsed, statement in g.metrics_sql]
+            logger.warning(
+                "slow request %s %s -> %s in %.1fms (%d SQL statements, %.1fms in db)\n%s",
+                method, request.full_path, response.status_code, duration * 1000,
+                g.metrics_sql_count, g.metrics_sql_time * 1000, "\n".join(lines)
+            )
+        return response
+
+    def _observe(self, family, method, route, value):
+        key = (family, method, route)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            buckets = next(b for name, _, b in self.families if name == family)
+            histogram = self._histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    # --- exposition ---
+
+    def render(self):
+        out = []
+        with self._lock:
+            out.append("# HELP http_requests_total Requests handled, by status code")
+            out.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in sorted(self._requests.items()):
+                out.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+
+            for family, help_text, _ in self.families:
+                out.append(f"# HELP {family} {help_text}")
+                out.append(f"# TYPE {family} histogram")
+                for (name, method, route), h in sorted(self._histograms.items()):
+                    if name != family:
+                        continue
+                    labels = _labels(method=method, route=route)
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        out.append(f'{family}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    out.append(f'{family}_bucket{{{labels},le="+Inf"}} {h.count}')
+                    out.append(f"{family}_sum{{{labels}}} {h.sum}")
+                    out.append(f"{family}_count{{{labels}}} {h.count}")
+
+        for name, help_text, fn, kind in self._gauges:
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.append(f"{name} {fn()}")
+        return "\n".join(out) + "\n"
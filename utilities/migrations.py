@@ -0,0 +1,116 @@
+#versioned schema migrations - numbered modules in migrations/, applied in order and recorded in schema_migrations
+import pkgutil
+import importlib
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, String, DateTime, inspect, select, insert, text
+from sqlalchemy.schema import CreateColumn
+
+import migrations
+
+# Every migration module is named <version>_<name>.py and defines upgrade(conn).
+# Steps check what already exists, so databases made by db.create_all() at any
+# point in the past can be upgraded too. A module that sets TRANSACTIONAL = False
+# runs in autocommit mode (needed for CREATE INDEX CONCURRENTLY on Postgres).
+ledger = Table(
+    "schema_migrations", MetaData(),
+    Column("version", String(16), primary_key=True),
+    Column("name", String(120), nullable=False),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+
+# [(version, name, module)] sorted by version
+def available():
+    found = []
+    for info in pkgutil.iter_modules(migrations.__path__):
+        version, _, name = info.name.partition("_")
+        if version.isdigit():
+            found.append((version, name, importlib.import_module(f"migrations.{info.name}")))
+    return sorted(found, key=lambda m: m[0])
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        ledger.create(conn, checkfirst=True)
+        return {row.version: row.applied_at for row in conn.execute(select(ledger))}
+
+
+# Apply every migration not recorded yet (up to `target` when given).
+# Returns the versions applied, in order.
+def upgrade(engine, target=None):
+    done = applied_versions(engine)
+    applied = []
+    for version, name, module in available():
+        if target is not None and version > target:
+            break
+        if version in done:
+            continue
+        if getattr(module, "TRANSACTIONAL", True):
+            with engine.begin() as conn:
+                module.upgrade(conn)
+                conn.execute(insert(ledger).values(version=version, name=name, applied_at=datetime.now()))
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                module.upgrade(conn)
+                conn.execute(insert(ledger).values(version=version, name=name, applied_at=datetime.now()))
+        applied.append(version)
+    return applied
+
+
+# [(version, name, applied_at or None)] for every known migration
+def status(engine):
+    done = applied_versions(engine)
+    return [(version, name, done.get(version)) for version, name, _ in available()]
+
+
+# --- helpers for migration modules ---
+
+def has_table(conn, table):
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table, column):
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def has_unique(conn, table, columns):
+    columns = list(columns)
+    uniques = inspect(conn).get_unique_constraints(table)
+    indexes = [i for i in inspect(conn).get_indexes(table) if i.get("unique")]
+    return any(u["column_names"] == columns for u in uniques + indexes)
+
+
+def add_column(conn, table, column):
+    if not has_column(conn, table, column.name):
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+
+# CREATE INDEX, without blocking writes on Postgres when the connection is in autocommit
+def create_index(conn, name, table, columns, unique=False):
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    concurrently = ""
+    if conn.dialect.name == "postgresql" and conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT":
+        concurrently = "CONCURRENTLY "
+        # an interrupted CONCURRENTLY build leaves an invalid index behind, start over
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+    conn.execute(text(f"CREATE {kind} {concurrently}IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+# SQLite can't ALTER constraints (NOT NULL, foreign keys). Rebuild the table from
+# `table` (its new definition) and copy the rows over, the recipe from the SQLite docs.
+def rebuild_sqlite_table(conn, table):
+    old_columns = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    columns = ", ".join(c.name for c in table.columns if c.name in old_columns)
+    temp = f"_old_{table.name}"
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {temp}"))
+    for index in inspect(conn).get_indexes(temp):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    table.create(conn)
+    conn.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {temp}"))
+    conn.execute(text(f"DROP TABLE {temp}"))
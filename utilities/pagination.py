@@ -0,0 +1,67 @@
+#keyset (cursor) pagination helpers shared by the list endpoints
+import base64
+from urllib.parse import urlencode
+from datetime import datetime, timedelta
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+# Read ?limit= and clamp it to 1..MAX_PAGE_SIZE
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if value is None or value == "":
+        return default
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise ValueError("limit must be an int")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, maximum)
+
+
+# Read ?from= / ?to= as "YYYY-MM-DD" or an ISO datetime.
+# A bare date used as an upper bound covers the whole day (returned bound is exclusive).
+def parse_date(value, name, end=False):
+    if value is None or value == "":
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD) or ISO datetime")
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+# The cursor is the (created_at, id) of the last row on the page, opaque to clients
+def encode_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode("ascii")
+
+
+def decode_cursor(cursor):
+    if cursor is None or cursor == "":
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeError):
+        raise ValueError("cursor is invalid")
+
+
+# Link header value for the next page: the same URL and query with the new cursor
+def next_page_link(base_url, args, next_cursor):
+    args = dict(args)
+    args["cursor"] = next_cursor
+    return f'<{base_url}?{urlencode(args)}>; rel="next"'
+
+
+# Attach the next-page cursor as headers so the JSON body stays a plain list
+def add_next_page_headers(response, request, next_cursor):
+    if next_cursor is None:
+        return response
+    response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Link"] = next_page_link(request.base_url, request.args.to_dict(), next_cursor)
+    return response
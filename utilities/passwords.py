@@ -0,0 +1,79 @@
+#password hashing - slow PBKDF2 hashes computed on a bounded thread pool
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Prefixes of hashes werkzeug produces; anything else is a legacy plaintext password
+HASH_PREFIXES = ("pbkdf2:", "scrypt:")
+
+
+class HasherBusy(Exception):
+    pass
+
+
+# PBKDF2-SHA256 with a configurable iteration count (the cost factor).
+# hashlib releases the GIL while hashing, so a small pool of threads does the
+# work in parallel while request threads only wait. At most `workers + max_pending`
+# hashes can be queued or running; past that callers get HasherBusy instead of piling
+# up. A caller that waited `timeout` seconds gets HasherBusy too, while its hash keeps
+# its slot until it finishes.
+class PasswordHasher:
+    def __init__(self, iterations=600000, workers=4, max_pending=64, timeout=10):
+        self.iterations = iterations
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._dummy = None
+
+    @property
+    def method(self):
+        return f"pbkdf2:sha256:{self.iterations}"
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Too many logins in progress, try again shortly")
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hasher")
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # the slot is free once the hash is, not when the caller stops waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy("Password check is taking too long, try again shortly") from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    # True if `password` matches the stored value (hashed or legacy plaintext).
+    # With stored=None (unknown email) a dummy hash is checked so the response
+    # takes as long as for a real account.
+    def verify(self, stored, password):
+        if stored is None:
+            if self._dummy is None or self.needs_rehash(self._dummy):
+                self._dummy = self.hash("not-a-real-password")
+            self._run(_check, self._dummy, password)
+            return False
+        return self._run(_check, stored, password)
+
+    # Legacy plaintext and hashes made with a different cost get re-hashed on login
+    def needs_rehash(self, stored):
+        return not stored.startswith(self.method + "$")
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_PREFIXES)
+
+
+def _check(stored, password):
+    if is_hashed(stored):
+        return check_password_hash(stored, password)
+    return hmac.compare_digest(stored.encode(), password.encode())
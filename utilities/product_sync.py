@@ -0,0 +1,103 @@
+#catalog sync - insert new products and reprice existing ones in one upsert, keyed by sku
+from sqlalchemy import select, update, bindparam, exists
+from models import db, Product, Purchase, SalesDetails, Stock
+from utilities.schemas import Schema, Number, String, error_text
+from utilities.sql import dialect_insert
+from utilities.versions import bump_versions
+
+MAX_SKU_LENGTH = 64
+MAX_NAME_LENGTH = 80
+MAX_REPORTED_ERRORS = 1000
+
+CATALOG_ITEM = Schema({
+    "sku": String(max_length=MAX_SKU_LENGTH, blank=False),
+    "name": String(max_length=MAX_NAME_LENGTH, blank=False),
+    "buying_price": Number(),
+    "selling_price": Number()
+})
+
+
+# Check a catalog list [{"sku", "name", "buying_price", "selling_price"}] against
+# CATALOG_ITEM. Returns ({sku: row}, error_count, [{"index", "sku", "error"}]) with
+# an item's first problem as its error; a sku listed twice keeps its last entry.
+def validate_catalog(items):
+    rows = {}
+    errors = []
+    error_count = 0
+    for index, item in enumerate(items):
+        row, item_errors = CATALOG_ITEM.check(item)
+        if not item_errors:
+            rows[row["sku"]] = row
+            continue
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            sku = item.get("sku") if isinstance(item, dict) else None
+            errors.append({"index": index, "sku": sku if isinstance(sku, str) else None, "error": error_text(item_errors[0], "item")})
+    return rows, error_count, errors
+
+
+# Products from before SKUs existed: give an unknown sku to the (oldest) product
+# without a sku that has the same name, so the sync updates it instead of adding
+# a duplicate. Returns the skus handed out.
+def _adopt_by_name(rows, known):
+    unknown = [row for sku, row in rows.items() if sku not in known]
+    if not unknown:
+        return set()
+    unkeyed = {}
+    for product_id, name in db.session.execute(
+        select(Product.id, Product.name).where(Product.sku.is_(None)).order_by(Product.id.desc())
+    ):
+        unkeyed[name] = product_id
+    adopted = []
+    for row in unknown:
+        product_id = unkeyed.pop(row["name"], None)
+        if product_id is not None:
+            adopted.append({"pid": product_id, "new_sku": row["sku"]})
+    if adopted:
+        products = Product.__table__
+        db.session.execute(
+            update(products).where(products.c.id == bindparam("pid")).values(sku=bindparam("new_sku")),
+            adopted
+        )
+    return {row["new_sku"] for row in adopted}
+
+
+# Upsert the validated rows: one INSERT ... ON CONFLICT (sku) DO UPDATE executed for
+# the whole list, then an empty stock ledger row for every product with no ledger
+# row and no purchases or sales (the new ones).
+# Returns {"inserted", "updated"}.
+def upsert_products(rows):
+    known = set(db.session.execute(select(Product.sku).where(Product.sku.is_not(None))).scalars())
+    known |= _adopt_by_name(rows, known)
+    inserted = sum(1 for sku in rows if sku not in known)
+
+    stmt = dialect_insert(Product)
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Product.sku],
+            set_={
+                "name": stmt.excluded.name,
+                "buying_price": stmt.excluded.buying_price,
+                "selling_price": stmt.excluded.selling_price
+            }
+        ),
+        list(rows.values())
+    )
+
+    # products with history keep theirs: _ensure_stock_row seeds them from the raw tables
+    fresh = (
+        select(Product.id, 0)
+        .outerjoin(Stock, Stock.product_id == Product.id)
+        .where(
+            Stock.product_id.is_(None),
+            ~exists().where(Purchase.product_id == Product.id),
+            ~exists().where(SalesDetails.product_id == Product.id)
+        )
+    )
+    db.session.execute(
+        dialect_insert(Stock).from_select(["product_id", "quantity"], fresh).on_conflict_do_nothing()
+    )
+
+    bump_versions("products", "stock")
+    db.session.commit()
+    return {"inserted": inserted, "updated": len(rows) - inserted}
@@ -0,0 +1,154 @@
+#read-only reporting queries (stock, dashboard, sales pages) - shared by the Flask routes and the async app in asgi.py
+from itertools import groupby
+from sqlalchemy import select, func, exists, tuple_
+from models import Product, Sale, SalesDetails, Stock
+from utilities.pagination import encode_cursor
+
+# Each report is a statement plus a function turning its rows into the JSON payload,
+# so the sync (Session) and async (AsyncConnection) paths run exactly the same SQL.
+# Stock and sales pages take product names/prices from the product catalog cache
+# (utilities/catalog.py, {id: CatalogEntry}) instead of joining products.
+
+
+# --- GET /api/stock: available stock per product, from the stock ledger ---
+
+def stock_query():
+    return select(Stock.product_id, Stock.quantity)
+
+
+# `products`: every product (catalog.all_products); one without a ledger row has 0
+def stock_payload(products, rows):
+    quantities = {r.product_id: r.quantity for r in rows}
+    return [
+        {
+            "product_id": product_id,
+            "name": product.name,
+            "available_quantity": float(quantities.get(product_id) or 0)
+        }
+        for product_id, product in sorted(products.items(), key=lambda item: (item[1].name, item[0]))
+    ]
+
+
+# --- GET /api/dashboard: stock, units sold and profit per product ---
+
+def dashboard_query():
+    # Total sold per product, aggregated once before joining (no purchase x sale fan-out)
+    sold_subq = (
+        select(
+            SalesDetails.product_id,
+            func.sum(SalesDetails.quantity).label("total_sold")
+        )
+        .group_by(SalesDetails.product_id)
+        .subquery()
+    )
+
+    # One pass over products: remaining stock from the ledger, sold quantity and profit from the subquery
+    return (
+        select(
+            Product.id,
+            Product.name,
+            func.coalesce(Stock.quantity, 0).label("remaining_stock"),
+            sold_subq.c.total_sold,
+            ((Product.selling_price - Product.buying_price) * sold_subq.c.total_sold).label("total_profit")
+        )
+        .outerjoin(Stock, Product.id == Stock.product_id)
+        .outerjoin(sold_subq, Product.id == sold_subq.c.product_id)
+        .order_by(Product.id)
+    )
+
+
+def dashboard_payload(rows):
+    # bar chart - remaining stock per product
+    data = []
+    labels = []
+    # pie chart - sale per product in quantity, donut - profit per product (only products that sold)
+    sales_labels = []
+    sales_values = []
+    donutLabels = []
+    donutData = []
+    for r in rows:
+        data.append(r.remaining_stock)
+        labels.append(r.name)
+        if r.total_sold is not None:
+            sales_labels.append(r.name)
+            sales_values.append(r.total_sold)
+            donutLabels.append(r.name)
+            donutData.append(r.total_profit)
+
+    # keys return are used in Vue.
+    return {"data":data, "labels":labels, "sales_labels": sales_labels,"sales_data": sales_values,"donut_data":donutData,"donut_label":donutLabels}
+
+
+# --- GET /api/sales: one page of sales with their line items, newest first ---
+
+def sales_page_query(limit, cursor=None, date_from=None, date_to=None):
+    # 1) One page of sales, newest first, seeking past the cursor (keyset on created_at, id)
+    page = (
+        select(Sale.id, Sale.created_at)
+        .where(exists().where(SalesDetails.sale_id == Sale.id))
+        .order_by(Sale.created_at.desc(), Sale.id.desc())
+        .limit(limit)
+    )
+    if date_from is not None:
+        page = page.where(Sale.created_at >= date_from)
+    if date_to is not None:
+        page = page.where(Sale.created_at < date_to)
+    if cursor is not None:
+        page = page.where(tuple_(Sale.created_at, Sale.id) < tuple_(*cursor))
+    page = page.subquery()
+
+    # 2) Line items of that page; names and prices come from the catalog, so the
+    #    subtotals and total_sale are summed in sales_page_payload rather than by a
+    #    window SUM over a products join (the catalog cache exists to skip that join)
+    return (
+        select(
+            page.c.id.label("sale_id"),
+            page.c.created_at,
+            SalesDetails.product_id,
+            SalesDetails.quantity
+        )
+        .join(SalesDetails, SalesDetails.sale_id == page.c.id)
+        .order_by(page.c.created_at.desc(), page.c.id.desc(), SalesDetails.id)
+    )
+
+
+# Product ids to look up in the catalog for rows of sales_page_query()
+def sales_page_product_ids(rows):
+    return list({r.product_id for r in rows})
+
+
+# (sales, next cursor or None) from the rows of sales_page_query() and their
+# products ({id: CatalogEntry}); lines of products that no longer exist are left out
+def sales_page_payload(rows, limit, products):
+    # 3) Rows arrive ordered by sale, so consecutive rows belong to the same sale
+    sales = []
+    page_size = 0
+    for sale_id, grouped in groupby(rows, key=lambda r: r.sale_id):
+        page_size += 1
+        items = []
+        created_at = None
+        for r in grouped:
+            created_at = r.created_at
+            product = products.get(r.product_id)
+            if product is None:
+                continue
+            items.append({
+                "product_id": r.product_id,
+                "product_name": product.name,
+                "quantity": r.quantity,
+                "unit_selling_price": product.selling_price,
+                "subtotal": r.quantity * product.selling_price
+            })
+        if items:
+            sales.append({
+                "sale_id": sale_id,
+                "created_at": created_at.strftime("%Y-%m-%d %H:%M"),
+                "total_sale": sum(item["subtotal"] for item in items),
+                "items": items
+            })
+
+    # 4) A full page means there may be more, hand out the cursor of the last sale
+    next_cursor = None
+    if page_size == limit:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].sale_id)
+    return sales, next_cursor
@@ -0,0 +1,137 @@
+#hourly / daily sales rollups - quantity, revenue and profit per product per time bucket
+from datetime import timedelta
+from sqlalchemy import select, delete, insert, func, literal_column
+from models import db, Product, Sale, SalesDetails, SalesHourly, SalesDaily
+from utilities.sql import dialect_insert
+from utilities.versions import bump_versions
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+
+def bucket_start(moment, unit):
+    if unit == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "day":
+        return day
+    if unit == "week":  # weeks start on Monday
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return day.replace(day=1)
+    raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+
+# Add one sale to both rollups in the current transaction: {product_id: quantity}.
+# Revenue and profit use the prices at the time of the sale.
+def record_sale(quantities, sold_at):
+    prices = {
+        row.id: row for row in db.session.execute(
+            select(Product.id, Product.buying_price, Product.selling_price).where(Product.id.in_(quantities.keys()))
+        )
+    }
+    # in product id order, like the stock rows, so concurrent baskets lock rollup rows in one order
+    lines = [(product_id, quantity, prices[product_id]) for product_id, quantity in sorted(quantities.items()) if product_id in prices]
+    if not lines:
+        return
+    for model, unit in ((SalesHourly, "hour"), (SalesDaily, "day")):
+        bucket = bucket_start(sold_at, unit)
+        stmt = dialect_insert(model)
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[model.bucket, model.product_id],
+                set_={
+                    "quantity": model.quantity + stmt.excluded.quantity,
+                    "revenue": model.revenue + stmt.excluded.revenue,
+                    "profit": model.profit + stmt.excluded.profit
+                }
+            ),
+            [
+                {
+                    "bucket": bucket,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "revenue": quantity * price.selling_price,
+                    "profit": quantity * (price.selling_price - price.buying_price)
+                }
+                for product_id, quantity, price in lines
+            ]
+        )
+
+
+# SQL expression truncating sales.created_at to the start of its hour/day
+# (literals, not bind parameters, so SELECT and GROUP BY render the same expression)
+def _truncate(unit):
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(literal_column(f"'{unit}'"), Sale.created_at)
+    # SQLite stores DateTime as text in SQLAlchemy's format, keep that format
+    pattern = "%Y-%m-%d %H:00:00.000000" if unit == "hour" else "%Y-%m-%d 00:00:00.000000"
+    return func.strftime(literal_column(f"'{pattern}'"), Sale.created_at)
+
+
+# Recompute both rollups from every recorded sale at today's prices (run while tills
+# are quiet, like `stock rebuild`). Returns the number of (bucket, product) rows written.
+def rebuild_rollups():
+    written = 0
+    for model, unit in ((SalesHourly, "hour"), (SalesDaily, "day")):
+        bucket = _truncate(unit)
+        quantity = func.sum(SalesDetails.quantity)
+        grouped = (
+            select(
+                bucket.label("bucket"),
+                SalesDetails.product_id,
+                quantity.label("quantity"),
+                (quantity * Product.selling_price).label("revenue"),
+                (quantity * (Product.selling_price - Product.buying_price)).label("profit")
+            )
+            .join(Sale, Sale.id == SalesDetails.sale_id)
+            .join(Product, Product.id == SalesDetails.product_id)
+            .group_by(bucket, SalesDetails.product_id, Product.selling_price, Product.buying_price)
+        )
+        db.session.execute(delete(model))
+        result = db.session.execute(
+            insert(model).from_select(["bucket", "product_id", "quantity", "revenue", "profit"], grouped)
+        )
+        written += result.rowcount
+    bump_versions("sales")
+    db.session.commit()
+    return written
+
+
+# Totals per bucket and per product between date_from (inclusive) and date_to (exclusive).
+# Hours come from the hourly rollup, everything else from the daily one; the
+# database sums the products in each hour/day, weeks and months are then folded
+# from those (a few hundred rows at most).
+def sales_summary(date_from, date_to, granularity="day", product_id=None, session=None):
+    session = session or db.session
+    model = SalesHourly if granularity == "hour" else SalesDaily
+    totals = (func.sum(model.quantity), func.sum(model.revenue), func.sum(model.profit))
+    conditions = [
+        model.bucket >= bucket_start(date_from, "hour" if granularity == "hour" else "day"),
+        model.bucket < date_to
+    ]
+    if product_id is not None:
+        conditions.append(model.product_id == product_id)
+
+    buckets = {}
+    for bucket, quantity, revenue, profit in session.execute(
+        select(model.bucket, *totals).where(*conditions).group_by(model.bucket).order_by(model.bucket)
+    ):
+        entry = buckets.setdefault(bucket_start(bucket, granularity), {"quantity": 0, "revenue": 0, "profit": 0})
+        entry["quantity"] += quantity
+        entry["revenue"] += revenue
+        entry["profit"] += profit
+
+    products = session.execute(
+        select(model.product_id, *totals).where(*conditions).group_by(model.product_id).order_by(model.product_id)
+    )
+
+    return {
+        "granularity": granularity,
+        "from": date_from.strftime("%Y-%m-%d %H:%M"),
+        "to": date_to.strftime("%Y-%m-%d %H:%M"),
+        "buckets": [{"bucket": k.strftime("%Y-%m-%d %H:%M"), **v} for k, v in buckets.items()],
+        "products": [
+            {"product_id": p, "quantity": quantity, "revenue": revenue, "profit": profit}
+            for p, quantity, revenue, profit in products
+        ]
+    }
@@ -0,0 +1,191 @@
+#declarative request body schemas - built once at import, validate and coerce a whole body in one pass
+#
+#   SALE = Schema({"product_id": Int(), "quantity": Number()})
+#   values, errors = SALE.validate(request.get_json(silent=True))
+#
+# `values` holds the declared fields converted (int/float/str), `errors` every problem
+# found as [{"field": "items[3].quantity", "error": "must be a number"}]; the handler
+# answers 400 with error_body(errors) when it isn't empty. Int and Number accept what
+# is_int / is_number in utilities/validators.py accept.
+
+
+class Field:
+    message = "is invalid"
+
+    def __init__(self, required=True):
+        self.required = required
+
+    # Converted value, or raise ValueError/TypeError
+    def coerce(self, value):
+        return value
+
+
+# The builtins themselves: no Python frame per value, and they accept exactly
+# what is_int() / is_number() do
+class Int(Field):
+    message = "must be an int"
+    coerce = staticmethod(int)
+
+
+class Number(Field):
+    message = "must be a number"
+    coerce = staticmethod(float)
+
+
+class String(Field):
+    def __init__(self, required=True, max_length=None, numbers=False, blank=True):
+        super().__init__(required)
+        self.max_length = max_length
+        self.numbers = numbers  # also take ints and floats, as their text (phone numbers)
+        self.blank = blank  # False: "" and whitespace-only strings are refused
+        self.message = (
+            ("must be a string" if blank else "must be a non-empty string")
+            + (f" of at most {max_length} characters" if max_length else "")
+        )
+
+    def coerce(self, value):
+        if self.numbers and type(value) in (int, float):
+            value = str(value)
+        if type(value) is not str or (self.max_length is not None and len(value) > self.max_length):
+            raise ValueError(value)
+        if not self.blank and not value.strip():
+            raise ValueError(value)
+        return value
+
+
+# What a coerce raises for a bad value
+COERCE_ERRORS = (ValueError, TypeError, OverflowError)
+
+# What the flat pass raises for anything the field-by-field pass reports: a missing
+# key, a null (no scalar coerce takes None) or a bad value, or an item that isn't an object
+FLAT_ERRORS = (KeyError,) + COERCE_ERRORS
+
+
+# "items" + "[3].quantity" -> "items[3].quantity"; "" is the value itself
+def _join(prefix, field):
+    if not field:
+        return prefix
+    return prefix + field if field[0] == "[" else f"{prefix}.{field}"
+
+
+# A JSON object with the given fields; also usable as a field or a list item
+class Schema(Field):
+    message = "must be a JSON object"
+
+    def __init__(self, fields, required=True):
+        super().__init__(required)
+        # looked up once: (name, required, coerce, message, nested Schema/List or None)
+        self._fields = tuple(
+            (name, field.required, field.coerce, field.message, field if isinstance(field, (Schema, List)) else None)
+            for name, field in fields.items()
+        )
+        # objects of required scalars only: (name, coerce) pairs, so valid data takes
+        # one try around a plain loop instead of a required/nested/try step per field
+        self._flat = None
+        if all(field.required and isinstance(field, (Int, Number, String)) for field in fields.values()):
+            self._flat = tuple((name, field.coerce) for name, field in fields.items())
+
+    # (values, errors) for a request body; errors name fields from the top ("items[3].quantity")
+    def validate(self, data):
+        values, errors = self.check(data)
+        return values, [{"field": e["field"] or "body", "error": e["error"]} for e in errors]
+
+    # (values, errors) with field names relative to this object; errors is () when
+    # there are none, so valid list items cost no allocations for error bookkeeping
+    def check(self, data):
+        if type(data) is not dict:
+            return None, [{"field": "", "error": self.message}]
+        if self._flat is not None:
+            try:
+                values = {}
+                for name, coerce in self._flat:
+                    values[name] = coerce(data[name])
+                return values, ()
+            except FLAT_ERRORS:
+                pass  # the pass below says which fields are wrong
+        values = {}
+        errors = ()
+        for name, required, coerce, message, nested in self._fields:
+            value = data.get(name)
+            if value is None:
+                if required:
+                    errors = errors or []
+                    errors.append({"field": name, "error": "is required"})
+                continue
+            if nested is not None:
+                values[name], nested_errors = nested.check(value)
+                if nested_errors:
+                    errors = errors or []
+                    errors.extend({"field": _join(name, e["field"]), "error": e["error"]} for e in nested_errors)
+                continue
+            try:
+                values[name] = coerce(value)
+            except COERCE_ERRORS:
+                errors = errors or []
+                errors.append({"field": name, "error": message})
+        return values, errors
+
+
+class List(Field):
+    message = "must be a list"
+
+    def __init__(self, item, required=True, min_items=0, max_items=None):
+        super().__init__(required)
+        self.item = item
+        self.min_items = min_items
+        self.max_items = max_items
+
+    def check(self, data):
+        if type(data) is not list:
+            return None, [{"field": "", "error": self.message}]
+        if len(data) < self.min_items:
+            return None, [{"field": "", "error": "must not be empty" if self.min_items == 1 else f"must have at least {self.min_items} items"}]
+        if self.max_items is not None and len(data) > self.max_items:
+            return None, [{"field": "", "error": f"must have at most {self.max_items} items"}]
+
+        item = self.item
+        flat = item._flat if isinstance(item, Schema) else None
+        if flat is not None:
+            try:
+                values = []
+                for entry in data:
+                    value = {}
+                    for name, coerce in flat:
+                        value[name] = coerce(entry[name])
+                    values.append(value)
+                return values, ()
+            except FLAT_ERRORS:
+                pass  # at least one bad item: check them one by one for the error list
+
+        values = []
+        errors = ()
+        if isinstance(item, (Schema, List)):
+            check = item.check
+            for index, entry in enumerate(data):
+                value, item_errors = check(entry)
+                values.append(value)
+                if item_errors:
+                    errors = errors or []
+                    errors.extend({"field": _join(f"[{index}]", e["field"]), "error": e["error"]} for e in item_errors)
+        else:
+            coerce = item.coerce
+            for index, entry in enumerate(data):
+                try:
+                    values.append(coerce(entry))
+                except COERCE_ERRORS:
+                    values.append(None)
+                    errors = errors or []
+                    errors.append({"field": f"[{index}]", "error": item.message})
+        return values, errors
+
+
+# One error as text, "items[1].product_id must be an int"; `subject` names the value
+# itself for errors from check() (validate() already calls it "body")
+def error_text(error, subject="body"):
+    return f"{error['field'] or subject} {error['error']}"
+
+
+# JSON body for a 400: the first problem as "error" (what clients already show),
+# every problem under "errors"
+def error_body(errors):
+    return {"error": error_text(errors[0]), "errors": errors}
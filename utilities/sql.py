@@ -0,0 +1,13 @@
+#dialect helpers for statements that plain SQLAlchemy Core can't express portably
+from importlib import import_module
+from models import db
+
+
+# INSERT that supports .on_conflict_do_nothing() / .on_conflict_do_update()
+# on the databases we run (PostgreSQL in production, SQLite in tests/benchmarks)
+def dialect_insert(model):
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        # the engine has already loaded its own dialect; the other one is never imported
+        return import_module(f"sqlalchemy.dialects.{dialect}").insert(model)
+    raise NotImplementedError(f"ON CONFLICT inserts are not supported on {dialect}")
@@ -0,0 +1,165 @@
+#stock ledger helpers - keep the stock table in step with purchases and sales
+from sqlalchemy import func, update, delete, insert, select, bindparam
+from models import db, Product, Purchase, SalesDetails, Stock
+from utilities.versions import bump_versions
+
+
+# Total purchased minus total sold for one product, straight from the raw tables
+def _raw_stock(product_id):
+    total_purchased = db.session.query(func.sum(Purchase.quantity)).filter_by(product_id=product_id).scalar() or 0
+    total_sold = db.session.query(func.sum(SalesDetails.quantity)).filter_by(product_id=product_id).scalar() or 0
+    return total_purchased - total_sold
+
+
+# Make sure a ledger row exists for the product (None if the product does not exist).
+# Rows missing from before the ledger existed are seeded once from the raw tables,
+# so this must run before the new Purchase/SalesDetails row is added to the session.
+def _ensure_stock_row(product_id):
+    row = db.session.get(Stock, product_id)
+    if row is None:
+        if db.session.get(Product, product_id) is None:
+            return None
+        row = Stock(product_id=product_id, quantity=_raw_stock(product_id))
+        db.session.add(row)
+        db.session.flush()
+    return row
+
+
+# O(1) lookup of the available stock for a product
+def get_available_stock(product_id):
+    row = _ensure_stock_row(product_id)
+    return row.quantity if row is not None else 0
+
+
+# Available stock for a whole basket in one query: {product_id: quantity}
+def get_available_stock_many(product_ids):
+    product_ids = list(product_ids)
+    stock = dict(
+        db.session.execute(
+            select(Stock.product_id, Stock.quantity).where(Stock.product_id.in_(product_ids))
+        ).all()
+    )
+    for product_id in product_ids:
+        if product_id not in stock:
+            stock[product_id] = get_available_stock(product_id)
+    return stock
+
+
+# Add (purchase) or remove (sale, negative delta) stock in the current transaction.
+# The caller commits together with the Purchase/SalesDetails insert.
+def adjust_stock(product_id, delta):
+    _ensure_stock_row(product_id)
+    db.session.execute(
+        update(Stock)
+        .where(Stock.product_id == product_id)
+        .values(quantity=Stock.quantity + delta)
+    )
+
+
+# Apply {product_id: delta} in one executemany UPDATE.
+# Ledger rows must already exist (get_available_stock_many makes sure of that).
+# Rows are updated in product id order, the same order reserve_stock locks them in.
+def adjust_stock_many(deltas):
+    stock = Stock.__table__
+    db.session.execute(
+        update(stock)
+        .where(stock.c.product_id == bindparam("pid"))
+        .values(quantity=stock.c.quantity + bindparam("delta")),
+        [{"pid": product_id, "delta": deltas[product_id]} for product_id in sorted(deltas)]
+    )
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, available):
+        super().__init__(f"Only {available} items left for product {product_id}")
+        self.product_id = product_id
+        self.available = available
+
+
+# Remaining stock after taking `quantity`, or None when there isn't that much.
+# Check and decrement are one statement, so two tills can't both take the last unit.
+def _take(product_id, quantity):
+    stock = Stock.__table__
+    return db.session.execute(
+        update(stock)
+        .where(stock.c.product_id == product_id, stock.c.quantity > 0, stock.c.quantity >= quantity)
+        .values(quantity=stock.c.quantity - quantity)
+        .returning(stock.c.quantity)
+    ).scalar()
+
+
+# Take {product_id: quantity} from the ledger in the current transaction, or raise
+# OutOfStock for the first product short of stock (the caller rolls back).
+# Each decrement row-locks that product's ledger row until commit. Taking them in
+# product id order means two baskets sharing products queue instead of deadlocking,
+# and baskets with no product in common never wait on each other: the sale's other
+# writes are per product too (rollups) and the table version counters every sale
+# moves are bumped after the commit (utilities/versions.py).
+# Returns {product_id: stock available before this basket}.
+def reserve_stock(wanted):
+    available = {}
+    for product_id in sorted(wanted):
+        quantity = wanted[product_id]
+        left = _take(product_id, quantity)
+        if left is None and db.session.get(Stock, product_id) is None:
+            # no ledger row yet: seed it from the raw tables and try again
+            _ensure_stock_row(product_id)
+            left = _take(product_id, quantity)
+        if left is None:
+            raise OutOfStock(product_id, get_available_stock(product_id))
+        available[product_id] = left + quantity
+    return available
+
+
+def _raw_stock_query():
+    purchase_subq = (
+        select(Purchase.product_id, func.sum(Purchase.quantity).label("total_purchased"))
+        .group_by(Purchase.product_id)
+        .subquery()
+    )
+    sales_subq = (
+        select(SalesDetails.product_id, func.sum(SalesDetails.quantity).label("total_sold"))
+        .group_by(SalesDetails.product_id)
+        .subquery()
+    )
+    return (
+        select(
+            Product.id.label("product_id"),
+            (
+                func.coalesce(purchase_subq.c.total_purchased, 0)
+                - func.coalesce(sales_subq.c.total_sold, 0)
+            ).label("quantity")
+        )
+        .outerjoin(purchase_subq, Product.id == purchase_subq.c.product_id)
+        .outerjoin(sales_subq, Product.id == sales_subq.c.product_id)
+    )
+
+
+# Recompute the whole ledger from purchases and sales (run while tills are quiet).
+# Returns the number of products written.
+def rebuild_stock():
+    raw = _raw_stock_query().subquery()
+    db.session.execute(delete(Stock))
+    result = db.session.execute(
+        insert(Stock).from_select(["product_id", "quantity"], select(raw.c.product_id, raw.c.quantity))
+    )
+    bump_versions("stock")
+    db.session.commit()
+    return result.rowcount
+
+
+# Compare the ledger against the raw tables.
+# Returns a list of {"product_id", "ledger", "expected"} for every product that disagrees.
+def verify_stock(tolerance=1e-6):
+    raw = _raw_stock_query().subquery()
+    rows = db.session.execute(
+        select(raw.c.product_id, Stock.quantity.label("ledger"), raw.c.quantity.label("expected"))
+        .outerjoin(Stock, Stock.product_id == raw.c.product_id)
+        .order_by(raw.c.product_id)
+    ).all()
+
+    mismatches = []
+    for r in rows:
+        if r.ledger is None or abs(r.ledger - r.expected) > tolerance:
+            mismatches.append({"product_id": r.product_id, "ledger": r.ledger, "expected": r.expected})
+    return mismatches
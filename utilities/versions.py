@@ -0,0 +1,203 @@
+#per-table write counters -> strong ETags / Last-Modified and 304s for the polled GET routes
+import time
+import logging
+import itertools
+import threading
+from functools import wraps
+from datetime import datetime, timezone
+from flask import g, request, current_app, make_response
+from sqlalchemy import select, event
+from werkzeug.http import is_resource_modified
+from models import db, TableVersion
+from utilities.sql import dialect_insert
+from utilities.database import read_session
+
+logger = logging.getLogger(__name__)
+
+# session.info key: tables written by the session's open transaction
+PENDING_BUMPS = "table_version_bumps"
+# tries per bump before its tables are left to the next commit or read
+BUMP_ATTEMPTS = 2
+
+# suffixes for the tags of tables with a write their counter is still missing
+_unique = itertools.count(1)
+
+
+def _utcnow():
+    # stored naive, in UTC, so Last-Modified is right whatever the server timezone
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Count a write to each table by the current transaction. The counters move once it
+# commits, in a short transaction of their own (_bump_committed), and not at all if
+# it rolls back. Every sale writes "sales" and "stock": bumped inside the sale's
+# transaction those two rows stayed locked until its commit, so Postgres queued
+# every checkout behind the one before it, disjoint baskets included.
+def bump_versions(*tables):
+    db.session.info.setdefault(PENDING_BUMPS, set()).update(tables)
+
+
+# Add one to each table's counter in a transaction of its own. The first write to a
+# table creates its row.
+def _bump(tables):
+    stmt = dialect_insert(TableVersion)
+    now = _utcnow()
+    # one order for everyone, so two bumps never wait on each other's rows
+    with db.engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # don't hold the counter rows through a WAL flush: a bump lost to a crash
+            # only leaves these tags stale until the next write
+            conn.exec_driver_sql("SET LOCAL synchronous_commit TO OFF")
+        for table in sorted(tables):
+            conn.execute(
+                stmt.values(name=table, version=1, updated_at=now)
+                .on_conflict_do_update(
+                    index_elements=[TableVersion.name],
+                    set_={"version": TableVersion.version + 1, "updated_at": now}
+                )
+            )
+
+
+# Bump `tables` plus any left over from a failed bump on this worker. If it keeps
+# failing they are handed back to the snapshot, which keeps their tags from matching
+# (no 304s, no cache hits) until a later commit or read gets them bumped.
+def _bump_or_defer(snapshot, tables):
+    tables = set(tables) | snapshot.take_unbumped()
+    if not tables:
+        return
+    for attempt in range(BUMP_ATTEMPTS):
+        try:
+            _bump(tables)
+            break
+        except Exception as e:
+            if attempt == BUMP_ATTEMPTS - 1:
+                logger.warning("table_versions bump for %s failed: %s", ", ".join(sorted(tables)), e)
+                snapshot.defer(tables)
+    snapshot.invalidate()
+
+
+# Readers may see the committed rows under the old tag for the moment in between,
+# never old rows under a new tag.
+@event.listens_for(db.session, "after_commit")
+def _bump_committed(session):
+    tables = session.info.pop(PENDING_BUMPS, None)
+    if tables:
+        _bump_or_defer(current_app.extensions["table_versions"], tables)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(PENDING_BUMPS, None)
+
+
+# This worker's copy of table_versions (a handful of rows), in
+# app.extensions["table_versions"]. @conditional answers from it for up to
+# `sync_interval` seconds before reading the table again, so a 304 or a cached
+# dashboard costs no query. This worker's own writes drop it straight away;
+# another worker's write shows up within the interval (0 = read every time).
+# It also holds the tables whose counters missed one of this worker's commits.
+class VersionSnapshot:
+    def __init__(self, sync_interval=1.0):
+        self.sync_interval = sync_interval
+        self._state = None  # (expires, rows)
+        # bumped by every invalidation so a read from before a bump can't be stored after it
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.unbumped = frozenset()
+
+    # (rows of versions_query() or None when stale, generation to hand to store())
+    def lookup(self):
+        state = self._state
+        if state is not None and time.monotonic() < state[0]:
+            return state[1], self._generation
+        return None, self._generation
+
+    def store(self, rows, generation):
+        rows = list(rows)
+        if self.sync_interval > 0 and generation == self._generation:
+            self._state = (time.monotonic() + self.sync_interval, rows)
+        return rows
+
+    def invalidate(self):
+        self._generation += 1
+        self._state = None
+
+    def defer(self, tables):
+        with self._lock:
+            self.unbumped = self.unbumped | frozenset(tables)
+
+    def take_unbumped(self):
+        with self._lock:
+            tables, self.unbumped = self.unbumped, frozenset()
+        return tables
+
+
+# Every counter when `tables` is None
+def versions_query(tables=None):
+    query = select(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+    if tables is not None:
+        query = query.where(TableVersion.name.in_(tables))
+    return query
+
+
+# Rows of versions_query() for every table, from the snapshot while it is fresh.
+# Counters a failed bump left behind are bumped first.
+def current_versions():
+    snapshot = current_app.extensions["table_versions"]
+    if snapshot.unbumped:
+        _bump_or_defer(snapshot, ())
+    rows, generation = snapshot.lookup()
+    if rows is None:
+        rows = snapshot.store(read_session().execute(versions_query()), generation)
+    return rows
+
+
+# {table: counter} for `tables` from rows of versions_query(), 0 for tables never written
+def versions_from_rows(tables, rows):
+    versions = dict.fromkeys(tables, 0)
+    versions.update((row.name, row.version) for row in rows if row.name in versions)
+    return versions
+
+
+# (etag, last_modified) for `tables` from rows of versions_query(). While one of them
+# is in `unbumped` the tag is new on every call and there is no last_modified, so
+# the write its counter missed is never answered with a 304 or from a cache.
+def fingerprint_from_rows(tag, tables, rows, unbumped=frozenset()):
+    if not unbumped.isdisjoint(tables):
+        return f"{tag}-unbumped-{next(_unique)}", None
+    rows = dict((row.name, row) for row in rows if row.name in tables)
+    versions = ".".join(str(rows[t].version) if t in rows else "0" for t in tables)
+    changed = [row.updated_at for row in rows.values()]
+    last_modified = max(changed).replace(tzinfo=timezone.utc, microsecond=0) if changed else None
+    # the timestamp keeps tags unique if the counters ever start again from zero
+    epoch = int(last_modified.timestamp()) if last_modified else 0
+    return f"{tag}-{versions}-{epoch}", last_modified
+
+
+# GET handlers whose output depends only on `tables`: answer 304 while the
+# client's If-None-Match / If-Modified-Since still match, before the view (and
+# its queries) runs; otherwise tag the fresh response. Other methods pass through.
+# The view can read the tag as g.etag, e.g. to key a cache by it, and the counters
+# as g.table_versions (the product catalog syncs with them).
+def conditional(tag, *tables):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return view(*args, **kwargs)
+            rows = current_versions()
+            etag, last_modified = fingerprint_from_rows(tag, tables, rows, current_app.extensions["table_versions"].unbumped)
+            g.etag = etag
+            g.table_versions = versions_from_rows(tables, rows)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True  # keep revalidating, never serve blind
+            return response
+        return wrapper
+    return decorator